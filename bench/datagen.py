@@ -0,0 +1,133 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : datagen.py
+@Author  : admin1
+@Date    : 2026/10/17 22:30
+@Description : 基准测试用的合成数据（题库、用户、多年答题历史），同一参数和种子生成的数据完全相同
+"""
+import csv
+import random
+from datetime import datetime, timedelta
+
+from src.scheduler import ReviewScheduler
+
+CATEGORIES = ["Python", "MySQL", "Redis", "网络", "操作系统", "算法", "分布式", "前端", "Linux", "设计模式",
+              "Java", "Go", "消息队列", "容器", "安全", "测试"]
+DIFFICULTIES = ["简单", "中等", "困难"]
+DIFFICULTY_WEIGHTS = [3, 5, 2]
+WORDS = ["索引", "事务", "锁", "缓存", "线程", "进程", "协程", "内存", "垃圾回收", "哈希", "红黑树", "B+树",
+         "一致性", "分区", "副本", "选举", "连接池", "TCP", "HTTP", "TLS", "DNS", "负载均衡", "限流", "熔断",
+         "幂等", "序列化", "装饰器", "生成器", "迭代器", "闭包", "元类", "GIL", "死锁", "隔离级别", "MVCC",
+         "回表", "覆盖索引", "慢查询", "主从复制", "持久化", "过期策略", "布隆过滤器", "调度", "虚拟内存",
+         "页表", "文件描述符", "epoll", "零拷贝", "快排", "堆", "动态规划", "二分", "拓扑排序", "并查集"]
+# 基准时间点固定，生成的时间戳不随运行日期变化
+EPOCH = datetime(2026, 1, 1)
+
+
+def category_weights(skew):
+    """分类按 Zipf 分布倾斜：第 k 个分类的权重为 1/k^skew，skew=0 时均匀"""
+    return [1 / (rank ** skew) for rank in range(1, len(CATEGORIES) + 1)]
+
+
+def make_question(rng, index, category):
+    words = rng.sample(WORDS, 3)
+    question = f"[{category}] 如何理解{words[0]}与{words[1]}在{words[2]}场景下的取舍？（第 {index} 题）"
+    answer = "，".join(rng.choice(WORDS) for _ in range(rng.randint(20, 80)))
+    return question, answer
+
+
+def make_questions(rng, count, skew, start=0):
+    """生成 count 道题目 (question, answer, category, difficulty)"""
+    weights = category_weights(skew)
+    rows = []
+    for i in range(start, start + count):
+        category = rng.choices(CATEGORIES, weights)[0]
+        question, answer = make_question(rng, i, category)
+        rows.append((question, answer, category, rng.choices(DIFFICULTIES, DIFFICULTY_WEIGHTS)[0]))
+    return rows
+
+
+def write_csv(path, rows):
+    """写成 import_from_csv 能读取的 CSV"""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["question", "answer", "category", "difficulty"])
+        writer.writerows(rows)
+
+
+def generate(db, questions=20000, users=20, years=1.0, reviews_per_day=20, category_skew=1.0, seed=7,
+             chunk=5000, log=print):
+    """
+    向空库写入合成数据
+    - 题目：分类按 category_skew 倾斜，难度按固定比例
+    - 用户：共用同一个密码哈希，直接批量插入（逐个 create_user 会做 users 次密码哈希）
+    - 答题历史：每个用户在 years 年内平均每天 reviews_per_day 次，按时间顺序回放评分得到各题的复习状态，
+      题目选择偏向热门分类，与真实使用一样集中在少数题目上
+    :return: {'question_ids': [...], 'user_ids': [...], 'reviews': 记录数}
+    """
+    from werkzeug.security import generate_password_hash
+
+    rng = random.Random(seed)
+    log(f"生成 {questions} 道题目...")
+    for start in range(0, questions, chunk):
+        db.add_questions_bulk(make_questions(rng, min(chunk, questions - start), category_skew, start))
+    question_rows = db._query_all("SELECT id, category FROM questions ORDER BY id")
+    question_ids = [row['id'] for row in question_rows]
+    weights_by_category = dict(zip(CATEGORIES, category_weights(category_skew)))
+    question_weights = [weights_by_category.get(row['category'], 1.0) for row in question_rows]
+
+    password_hash = generate_password_hash("bench")
+
+    def insert_users(conn):
+        conn.begin()
+        conn.cursor().executemany("INSERT INTO users (username, password_hash) VALUES (%s, %s)",
+                                  [(f"bench_user_{i}", password_hash) for i in range(users)])
+        conn.commit()
+
+    db.pool.run(insert_users)
+    user_ids = [row['id'] for row in db._query_all("SELECT id FROM users ORDER BY id")]
+
+    span = int(timedelta(days=365 * years).total_seconds())
+    per_user = int(365 * years * reviews_per_day)
+    total = 0
+    log(f"生成 {users} 个用户 × {per_user} 条答题记录...")
+    for user_id in user_ids:
+        times = sorted(EPOCH - timedelta(seconds=rng.randrange(span)) for _ in range(per_user))
+        picks = rng.choices(question_ids, question_weights, k=per_user)
+        states = {}
+        reviews = []
+        for reviewed_at, question_id in zip(times, picks):
+            rating = rng.randint(1, 5)
+            level = ReviewScheduler.update_question_level(states.get(question_id, (0,))[0], rating)
+            interval = ReviewScheduler.interval
+            next_review = reviewed_at + timedelta(days=interval[level]) if level < len(interval) else None
+            states[question_id] = (level, reviewed_at, next_review)
+            reviews.append((question_id, "", rating, reviewed_at, user_id, rng.randint(5, 600)))
+        for start in range(0, len(reviews), chunk):
+            batch = reviews[start:start + chunk]
+
+            def insert_reviews(conn):
+                conn.begin()
+                conn.cursor().executemany('''
+                INSERT INTO review_records (question_id, user_answer, rating, reviewed_at, user_id, duration_seconds)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ''', batch)
+                conn.commit()
+
+            db.pool.run(insert_reviews)
+
+        def insert_states(conn):
+            conn.begin()
+            conn.cursor().executemany('''
+            INSERT INTO user_question_state (user_id, question_id, level, last_reviewed, next_review)
+            VALUES (%s, %s, %s, %s, %s)
+            ''', [(user_id, question_id) + state for question_id, state in states.items()])
+            conn.commit()
+
+        db.pool.run(insert_states)
+        total += len(reviews)
+    log("重建统计汇总表...")
+    db.rebuild_review_rollup()
+    db.reset_due_queues()
+    db.question_cache.clear()
+    return {'question_ids': question_ids, 'user_ids': user_ids, 'reviews': total}
@@ -0,0 +1,464 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : load.py
+@Author  : admin1
+@Date    : 2026/10/17 23:20
+@Description : 多用户并发压测（虚拟用户登录后循环 取题 → 思考 → 提交，间或查看统计/检索），
+               按时间窗口输出吞吐、延迟分位数、连接池等待、锁等待与错误率
+用法：python -m bench.load [--users N] [--processes P] [--arrival-rate R] [--duration 秒] [--output 结果.json]
+      python -m bench.load --target configured ...   # 压 config/db_config.py 配置的库（如 MySQL）
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime
+
+from bench import datagen
+from bench.suite import percentile, prepare_database, summarize
+from src.database import QuestionDB
+from src.storage import SQLiteBackend, create_backend
+from src.trainer import InterviewTrainer
+
+# datagen 生成的账号密码；--target configured 时不存在的账号按此密码注册
+PASSWORD = "bench"
+# 每个窗口记录的连接池/语句计数（取相邻两次采样的差值）
+POOL_COUNTERS = ('waits', 'wait_seconds', 'timeouts', 'retries')
+# MySQL 服务端的行锁计数（SHOW GLOBAL STATUS，累计值，取差值）
+SERVER_LOCK_STATUS = ('Innodb_row_lock_waits', 'Innodb_row_lock_time', 'Innodb_deadlocks')
+
+
+class Recorder:
+    """
+    按时间窗口（自 started 起每 interval 秒一个）记录各操作的耗时样本、失败次数和计数器
+    各进程各自记录，结束后由主进程用 merge_windows 合并
+    """
+
+    def __init__(self, started, interval):
+        self.started = started
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._windows = {}
+        self.active = 0  # 当前在线的虚拟用户数
+
+    def user_started(self):
+        with self._lock:
+            self.active += 1
+
+    def user_finished(self):
+        with self._lock:
+            self.active -= 1
+
+    def _window(self, index):
+        window = self._windows.get(index)
+        if window is None:
+            window = self._windows[index] = {'ops': {}, 'counters': {}, 'active': 0}
+        return window
+
+    def index(self, at=None):
+        return int(((at if at is not None else time.time()) - self.started) // self.interval)
+
+    def record(self, op, seconds, ok=True):
+        with self._lock:
+            stats = self._window(self.index()).get('ops')
+            entry = stats.get(op)
+            if entry is None:
+                entry = stats[op] = {'samples': [], 'errors': 0}
+            entry['samples'].append(seconds)
+            if not ok:
+                entry['errors'] += 1
+
+    def add_counters(self, index, counters, active=None):
+        with self._lock:
+            window = self._window(index)
+            for key, value in counters.items():
+                window['counters'][key] = window['counters'].get(key, 0) + value
+            if active is not None:
+                window['active'] = max(window['active'], active)
+
+    def to_dict(self):
+        with self._lock:
+            return {index: window for index, window in self._windows.items()}
+
+
+def merge_windows(parts):
+    """合并各进程的窗口记录：样本拼接，失败数、计数器、活跃用户数相加"""
+    merged = {}
+    for part in parts:
+        for index, window in part.items():
+            target = merged.setdefault(int(index), {'ops': {}, 'counters': {}, 'active': 0})
+            for op, entry in window['ops'].items():
+                into = target['ops'].setdefault(op, {'samples': [], 'errors': 0})
+                into['samples'].extend(entry['samples'])
+                into['errors'] += entry['errors']
+            for key, value in window['counters'].items():
+                target['counters'][key] = target['counters'].get(key, 0) + value
+            target['active'] += window['active']
+    return merged
+
+
+# --------------------
+# 采样
+# --------------------
+def server_lock_status(db):
+    """MySQL 的行锁等待/死锁累计计数，其他后端返回空字典"""
+    if db.backend.name != "mysql":
+        return {}
+    names = ", ".join(f"'{name}'" for name in SERVER_LOCK_STATUS)
+    try:
+        rows = db._query_all(f"SHOW GLOBAL STATUS WHERE Variable_name IN ({names})")
+    except Exception as e:
+        print(f"读取锁等待状态失败：{str(e)}")
+        return {}
+    return {row['Variable_name']: float(row['Value']) for row in rows}
+
+
+def sample_counters(db, server_locks=False):
+    """当前累计计数：连接池等待/超时/重试、出错语句数，以及（可选）服务端行锁计数"""
+    pool = db.pool_metrics()
+    counters = {f"pool_{key}": pool.get(key, 0) for key in POOL_COUNTERS}
+    snapshot = db.query_stats.snapshot()
+    counters['statement_errors'] = sum(stats['errors'] for stats in snapshot['statements'])
+    if server_locks:
+        counters.update(server_lock_status(db))
+    return counters
+
+
+def monitor(db, recorder, stop, server_locks):
+    """每个窗口结束时采样一次计数器，把与上次采样的差值记入该窗口，stop 置位后做最后一次采样退出"""
+    previous = sample_counters(db, server_locks)
+    index = recorder.index()
+    while True:
+        next_boundary = recorder.started + (index + 1) * recorder.interval
+        stopped = stop.wait(max(0.0, next_boundary - time.time()))
+        current = sample_counters(db, server_locks)
+        recorder.add_counters(index, {key: value - previous.get(key, 0) for key, value in current.items()},
+                              active=recorder.active)
+        if stopped:
+            return
+        previous = current
+        index += 1
+
+
+# --------------------
+# 虚拟用户
+# --------------------
+def timed(recorder, op, fn, *args, ok=lambda result: result is not None, **kwargs):
+    """调用并记录耗时；抛异常或 ok(result) 为假时记为失败，异常不向外抛出"""
+    started = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+    except Exception as e:
+        recorder.record(op, time.perf_counter() - started, ok=False)
+        print(f"{op} 失败：{str(e)}")
+        return None
+    recorder.record(op, time.perf_counter() - started, ok=bool(ok(result)))
+    return result
+
+
+def virtual_user(trainer, account, config, recorder, rng, deadline):
+    """
+    一个虚拟用户：登录 → 循环（取题 → 思考 → 提交，按比例插入查看统计/检索），
+    每答完一轮（平均 session_questions 题）重新登录一次，直到 deadline
+    """
+    search_words = datagen.WORDS
+
+    def think(mean):
+        remaining = deadline - time.time()
+        if mean > 0 and remaining > 0:
+            time.sleep(min(rng.expovariate(1 / mean), remaining))
+
+    recorder.user_started()
+    try:
+        while time.time() < deadline:
+            user = timed(recorder, 'login', trainer.verify_user, account, PASSWORD)
+            if not user:
+                think(config['think_time'])
+                continue
+            user_id = user['id']
+            session = rng.expovariate(1 / config['session_questions']) if config['session_questions'] else None
+            answered = 0
+            while time.time() < deadline and (session is None or answered < session):
+                roll = rng.random()
+                if roll < config['stats_ratio']:
+                    timed(recorder, 'stats', trainer.get_overall_stats, user_id)
+                    think(config['think_time'] / 4)
+                    continue
+                if roll < config['stats_ratio'] + config['search_ratio']:
+                    query = " ".join(rng.sample(search_words, rng.randint(1, 2)))
+                    timed(recorder, 'search', trainer.search_questions, query, limit=50)
+                    think(config['think_time'] / 4)
+                    continue
+                row = timed(recorder, 'next_question', trainer.get_next_question, user_id)
+                if not row:
+                    think(config['think_time'])
+                    continue
+                think(config['think_time'])
+                if time.time() >= deadline:
+                    break
+                timed(recorder, 'submit_answer', trainer.submit_answer, row['id'], "压测答案", rng.randint(1, 5),
+                      user_id=user_id, duration_seconds=rng.randint(5, 600), ok=bool)
+                answered += 1
+    finally:
+        recorder.user_finished()
+
+
+def make_backend(target):
+    kind, path = target
+    return SQLiteBackend(path) if kind == "sqlite" else create_backend()
+
+
+def ensure_accounts(db, accounts):
+    """确保压测账号存在（--target configured 时由主进程在开始前注册）"""
+    created = 0
+    for account in accounts:
+        if not db.get_user_by_name(account):
+            if db.create_user(account, PASSWORD):
+                created += 1
+    return created
+
+
+def run_process(target, accounts, arrivals, config, process_index, barrier=None, results=None):
+    """
+    一个进程内的虚拟用户（每个用户一个线程，共用一个 InterviewTrainer 和连接池）
+    多进程时先在 barrier 处等齐再开始计时，结果放入 results 队列
+    """
+    db = QuestionDB(max_connections=config['pool_size'], backend=make_backend(target))
+    trainer = InterviewTrainer(db=db, prefetch_depth=config['prefetch_depth'])
+    try:
+        if barrier is not None:
+            barrier.wait()
+        started = time.time()
+        deadline = started + config['duration']
+        recorder = Recorder(started, config['interval'])
+        stop = threading.Event()
+        watcher = threading.Thread(target=monitor, name="load-monitor",
+                                   args=(db, recorder, stop, process_index == 0), daemon=True)
+        watcher.start()
+        threads = []
+        for i, (account, arrival) in enumerate(zip(accounts, arrivals)):
+            rng = random.Random(f"{config['seed']}-{process_index}-{i}")
+
+            def start_user(account=account, arrival=arrival, rng=rng):
+                time.sleep(max(0.0, started + arrival - time.time()))
+                virtual_user(trainer, account, config, recorder, rng, deadline)
+
+            thread = threading.Thread(target=start_user, name=f"vuser-{account}", daemon=True)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        stop.set()
+        watcher.join()
+        result = recorder.to_dict()
+    finally:
+        trainer.close()
+    if results is not None:
+        results.put(result)
+    return result
+
+
+# --------------------
+# 汇总
+# --------------------
+def window_rows(windows, interval):
+    """每个窗口一行：活跃用户、吞吐、延迟分位数、失败率、连接池等待、重试、服务端锁等待"""
+    rows = []
+    for index in sorted(windows):
+        window = windows[index]
+        samples = sorted(s for entry in window['ops'].values() for s in entry['samples'])
+        errors = sum(entry['errors'] for entry in window['ops'].values())
+        counters = window['counters']
+        waits = counters.get('pool_waits', 0)
+        rows.append({
+            'second': index * interval,
+            'active': window['active'],
+            'ops': len(samples),
+            'ops_per_sec': len(samples) / interval,
+            'p50_ms': percentile(samples, 0.50) * 1000,
+            'p95_ms': percentile(samples, 0.95) * 1000,
+            'p99_ms': percentile(samples, 0.99) * 1000,
+            'errors': errors,
+            'error_rate': errors / len(samples) if samples else 0.0,
+            'pool_waits': waits,
+            'pool_wait_ms': counters.get('pool_wait_seconds', 0) * 1000 / waits if waits else 0.0,
+            'pool_timeouts': counters.get('pool_timeouts', 0),
+            'retries': counters.get('pool_retries', 0),
+            'statement_errors': counters.get('statement_errors', 0),
+            'row_lock_waits': counters.get('Innodb_row_lock_waits'),
+            'row_lock_ms': counters.get('Innodb_row_lock_time'),
+            'deadlocks': counters.get('Innodb_deadlocks'),
+        })
+    return rows
+
+
+def operation_summary(windows, duration):
+    """各操作在整个压测期间的延迟分位数、吞吐和失败率"""
+    merged = {}
+    for window in windows.values():
+        for op, entry in window['ops'].items():
+            into = merged.setdefault(op, {'samples': [], 'errors': 0})
+            into['samples'].extend(entry['samples'])
+            into['errors'] += entry['errors']
+    result = {}
+    for op, entry in sorted(merged.items()):
+        result[op] = summarize(entry['samples'], duration)
+        result[op]['errors'] = entry['errors']
+        result[op]['error_rate'] = entry['errors'] / len(entry['samples'])
+    return result
+
+
+def format_report(rows, operations):
+    has_server = any(row['row_lock_waits'] is not None for row in rows)
+    header = (f"{'时间(s)':>7} {'活跃':>5} {'次/秒':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'失败率':>7} "
+              f"{'池等待':>6} {'等待ms':>7} {'重试':>5}" + (f" {'行锁等待':>8} {'行锁ms':>8} {'死锁':>5}" if has_server else ""))
+    lines = [header]
+    for row in rows:
+        line = (f"{row['second']:>7g} {row['active']:>5} {row['ops_per_sec']:>8.1f} {row['p50_ms']:>8.2f} "
+                f"{row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['error_rate']:>7.2%} "
+                f"{row['pool_waits']:>6} {row['pool_wait_ms']:>7.2f} {row['retries']:>5}")
+        if has_server:
+            line += f" {row['row_lock_waits'] or 0:>8g} {row['row_lock_ms'] or 0:>8g} {row['deadlocks'] or 0:>5g}"
+        lines.append(line)
+    lines.append("")
+    lines.append(f"{'操作':<16} {'次数':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>9} {'次/秒':>8} {'失败率':>7}")
+    for op, r in operations.items():
+        lines.append(f"{op:<16} {r['count']:>7} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+                     f"{r['max_ms']:>9.2f} {r['ops_per_sec']:>8.1f} {r['error_rate']:>7.2%}")
+    return "\n".join(lines)
+
+
+# --------------------
+# 入口
+# --------------------
+def arrival_offsets(users, rate, rng):
+    """各虚拟用户开始的时间（秒）：rate > 0 时按泊松过程陆续到达，否则同时开始"""
+    if rate <= 0:
+        return [0.0] * users
+    offsets, at = [], 0.0
+    for _ in range(users):
+        offsets.append(at)
+        at += rng.expovariate(rate)
+    return offsets
+
+
+def run_load(target, config, log=print):
+    """
+    按 config 运行压测，虚拟用户按序号轮流分配到各进程
+    :return: {'meta', 'windows', 'operations'}
+    """
+    users, processes = config['users'], max(1, min(config['processes'], config['users']))
+    accounts = [f"bench_user_{i}" for i in range(users)]
+    arrivals = arrival_offsets(users, config['arrival_rate'], random.Random(config['seed']))
+    log(f"{users} 个虚拟用户，{processes} 个进程，持续 {config['duration']} 秒")
+    if processes == 1:
+        parts = [run_process(target, accounts, arrivals, config, 0)]
+    else:
+        mp = multiprocessing.get_context()
+        barrier, results = mp.Barrier(processes), mp.Queue()
+        workers = [mp.Process(target=run_process, name=f"load-{p}",
+                              args=(target, accounts[p::processes], arrivals[p::processes], config, p,
+                                    barrier, results))
+                   for p in range(processes)]
+        for worker in workers:
+            worker.start()
+        # 子进程异常退出时不会放入结果，等待上限为压测时长加准备时间
+        parts = [results.get(timeout=config['duration'] + 600) for _ in workers]
+        for worker in workers:
+            worker.join()
+    windows = merge_windows(parts)
+    # 最后一个窗口只有收尾的零头，不计入
+    last = int(config['duration'] // config['interval'])
+    windows = {index: window for index, window in windows.items() if index < last}
+    return {
+        'meta': {
+            'target': target[0],
+            'config': config,
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'windows': window_rows(windows, config['interval']),
+        'operations': operation_summary(windows, last * config['interval']),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="面试训练器多用户并发压测")
+    parser.add_argument("--target", choices=("bench", "configured"), default="bench",
+                        help="bench：按种子生成的本地 SQLite 数据集；configured：config/db_config.py 配置的库")
+    parser.add_argument("--users", type=int, default=20, help="虚拟用户数（每人一个账号）")
+    parser.add_argument("--processes", type=int, default=1, help="进程数，虚拟用户平均分到各进程")
+    parser.add_argument("--pool-size", type=int, default=5, help="每个进程的连接池大小")
+    parser.add_argument("--prefetch-depth", type=int, default=0, help="每个用户的预取题数（同界面的 PREFETCH_DEPTH）")
+    parser.add_argument("--arrival-rate", type=float, default=0, help="每秒到达的用户数，0 为同时开始")
+    parser.add_argument("--duration", type=float, default=60, help="压测时长（秒）")
+    parser.add_argument("--interval", type=float, default=5, help="报告窗口（秒）")
+    parser.add_argument("--think-time", type=float, default=2.0, help="平均思考时间（秒，指数分布），0 为不停顿")
+    parser.add_argument("--session-questions", type=float, default=20, help="平均每次登录答题数，0 为只登录一次")
+    parser.add_argument("--stats-ratio", type=float, default=0.05, help="每步查看统计的概率")
+    parser.add_argument("--search-ratio", type=float, default=0.02, help="每步检索的概率")
+    parser.add_argument("--seed", type=int, default=1, help="到达时间和用户行为的随机种子")
+    parser.add_argument("--questions", type=int, default=20000, help="bench 数据集题目数")
+    parser.add_argument("--years", type=float, default=0.25, help="bench 数据集答题历史年数")
+    parser.add_argument("--data-seed", type=int, default=7, help="bench 数据集生成种子")
+    parser.add_argument("--output", help="结果保存为 JSON")
+    args = parser.parse_args(argv)
+
+    config = {
+        'users': args.users,
+        'processes': args.processes,
+        'pool_size': args.pool_size,
+        'prefetch_depth': args.prefetch_depth,
+        'arrival_rate': args.arrival_rate,
+        'duration': args.duration,
+        'interval': args.interval,
+        'think_time': args.think_time,
+        'session_questions': args.session_questions,
+        'stats_ratio': args.stats_ratio,
+        'search_ratio': args.search_ratio,
+        'seed': args.seed,
+    }
+    work_path = None
+    if args.target == "bench":
+        spec = {
+            'questions': args.questions,
+            'users': args.users,
+            'years': args.years,
+            'reviews_per_day': 20,
+            'category_skew': 1.0,
+            'seed': args.data_seed,
+        }
+        work_path = prepare_database(spec)
+        target = ("sqlite", work_path)
+    else:
+        target = ("configured", None)
+        db = QuestionDB(max_connections=1)
+        try:
+            created = ensure_accounts(db, [f"bench_user_{i}" for i in range(args.users)])
+        finally:
+            db.close()
+        if created:
+            print(f"已注册 {created} 个压测账号")
+    try:
+        result = run_load(target, config)
+    finally:
+        if work_path:
+            shutil.rmtree(os.path.dirname(work_path), ignore_errors=True)
+    print(format_report(result['windows'], result['operations']))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存：{args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
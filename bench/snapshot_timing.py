@@ -0,0 +1,101 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : snapshot_timing.py
+@Author  : admin1
+@Date    : 2026/10/17 19:50
+@Description : 题库冷启动耗时对比（逐行 DictCursor 载入 vs mmap 快照）
+用法：python -m bench.snapshot_timing [题目数] [重复次数]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from src.database import QuestionDB
+from src.snapshot import QuestionSnapshot
+from src.storage import DictCursor
+
+CATEGORIES = ["Python", "MySQL", "Redis", "网络", "操作系统", "算法", "分布式", "前端"]
+DIFFICULTIES = ["简单", "中等", "困难"]
+
+
+def ensure_questions(db, count, seed=7, chunk=5000):
+    """题库不足 count 道时补齐随机题目"""
+    existing = db.count_questions()
+    rng = random.Random(seed)
+    remaining = count - existing
+    if remaining > 0:
+        print(f"生成 {remaining} 道题目...")
+    while remaining > 0:
+        n = min(chunk, remaining)
+        db.add_questions_bulk([
+            (f"bench-{existing + i}：{rng.choice(CATEGORIES)} 中{'如何' * rng.randint(1, 3)}实现第 {i} 个特性？",
+             "参考答案" * rng.randint(5, 40), rng.choice(CATEGORIES), rng.choice(DIFFICULTIES))
+            for i in range(n)
+        ])
+        existing += n
+        remaining -= n
+
+
+def load_rows(db):
+    """改造前：整表逐行载入为 dict"""
+    def work(conn):
+        cursor = conn.cursor(DictCursor)
+        cursor.execute("SELECT * FROM questions")
+        return len(cursor.fetchall())
+
+    return db.pool.run(work)
+
+
+def open_snapshot(path):
+    """打开快照并取第一页"""
+    snapshot = QuestionSnapshot(path)
+    snapshot.page(limit=100)
+    snapshot.close()
+
+
+def scan_snapshot(path):
+    """逐题读取全部文本（构建检索索引时的读取量）"""
+    snapshot = QuestionSnapshot(path)
+    for _ in snapshot.iter_documents():
+        pass
+    snapshot.close()
+
+
+def time_it(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), min(samples)
+
+
+def main(count=500_000, repeat=5):
+    db = QuestionDB()
+    path = os.path.join(tempfile.mkdtemp(), "questions.snap")
+    try:
+        ensure_questions(db, count)
+        started = time.perf_counter()
+        written = db.write_snapshot(path)
+        print(f"题库 {written} 道，快照 {os.path.getsize(path) / 2 ** 20:.1f} MB，"
+              f"生成耗时 {time.perf_counter() - started:.1f} 秒；每项重复 {repeat} 次")
+        cases = [
+            ("改造前：SELECT * 逐行载入 dict", lambda: load_rows(db)),
+            ("快照：打开 + 第一页", lambda: open_snapshot(path)),
+            ("快照：打开 + 校验指纹", lambda: db.open_snapshot(path)),
+            ("快照：逐题读取全部文本", lambda: scan_snapshot(path)),
+        ]
+        for name, fn in cases:
+            median, best = time_it(fn, repeat)
+            print(f"{name:<24} 中位数 {median:10.1f} ms   最快 {best:10.1f} ms")
+    finally:
+        db.close()
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,114 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : stats_timing.py
+@Author  : admin1
+@Date    : 2026/10/17 14:30
+@Description : 统计查询前后耗时对比（生成百万级答题历史后分别计时）
+用法：python -m bench.stats_timing [记录数] [重复次数]
+"""
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from src.database import QuestionDB
+from src.storage import DictCursor
+
+BENCH_USER = "bench_stats_user"
+
+# 改造前 get_review_status(user_id) 的查询（DATE() 包裹列、同一批记录扫描多遍）
+LEGACY_QUERIES = [
+    "SELECT COUNT(*) as count FROM review_records WHERE DATE(reviewed_at) = CURDATE() AND user_id = %s",
+    "SELECT COUNT(*) as cnt FROM review_records WHERE user_id = %s",
+    """SELECT COALESCE(SUM(duration_seconds), 0) as total_seconds,
+              COALESCE(AVG(duration_seconds), 0) as avg_seconds
+       FROM review_records WHERE user_id = %s""",
+    "SELECT COALESCE(AVG(rating), 0) as avg_rating FROM review_records WHERE user_id = %s",
+    """SELECT q.category, COUNT(*) as cnt, COALESCE(SUM(r.duration_seconds), 0) as total_sec,
+              COALESCE(AVG(r.duration_seconds),0) as avg_sec
+       FROM review_records r JOIN questions q ON r.question_id = q.id
+       WHERE r.user_id = %s GROUP BY q.category""",
+    """SELECT q.difficulty, COUNT(*) as cnt, COALESCE(SUM(r.duration_seconds),0) as total_sec,
+              COALESCE(AVG(r.duration_seconds),0) as avg_sec
+       FROM review_records r JOIN questions q ON r.question_id = q.id
+       WHERE r.user_id = %s GROUP BY q.difficulty""",
+]
+
+
+def ensure_history(db, records, years=3, seed=42, chunk=5000):
+    """准备测试用户及其答题历史，已有足够记录时直接复用"""
+    user = db.get_user_by_name(BENCH_USER)
+    user_id = user['id'] if user else db.create_user(BENCH_USER, "bench")
+    existing = db._query_one("SELECT COUNT(*) AS cnt FROM review_records WHERE user_id = %s", (user_id,))['cnt']
+    if existing >= records:
+        return user_id
+    question_ids = [row['id'] for row in db._query_all("SELECT id FROM questions")]
+    if not question_ids:
+        raise RuntimeError("题库为空，请先导入题目")
+    rng = random.Random(seed)
+    now = datetime.now()
+    span = int(timedelta(days=365 * years).total_seconds())
+    remaining = records - existing
+    print(f"生成 {remaining} 条答题记录...")
+    while remaining > 0:
+        n = min(chunk, remaining)
+        rows = [(rng.choice(question_ids), "", rng.randint(1, 5), now - timedelta(seconds=rng.randrange(span)),
+                 user_id, rng.randint(5, 600)) for _ in range(n)]
+
+        def insert(conn):
+            conn.begin()
+            conn.cursor().executemany('''
+            INSERT INTO review_records (question_id, user_answer, rating, reviewed_at, user_id, duration_seconds)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ''', rows)
+            conn.commit()
+
+        db.pool.run(insert)
+        remaining -= n
+    db.rebuild_review_rollup(user_id=user_id)
+    return user_id
+
+
+def run_legacy(db, user_id):
+    def work(conn):
+        cursor = conn.cursor(DictCursor)
+        cursor.execute("SELECT level, COUNT(*) as count FROM questions GROUP BY level")
+        cursor.fetchall()
+        for sql in LEGACY_QUERIES:
+            cursor.execute(sql, (user_id,))
+            cursor.fetchall()
+
+    db.pool.run(work)
+
+
+def time_it(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), min(samples)
+
+
+def main(records=1_000_000, repeat=5):
+    db = QuestionDB()
+    try:
+        user_id = ensure_history(db, records)
+        cases = [
+            ("改造后：单次分组查询（扫描记录）", lambda: db.get_review_status(user_id, use_rollup=False)),
+            ("改造后：日汇总表", lambda: db.get_review_status(user_id)),
+        ]
+        if db.backend.name == "mysql":  # 旧查询使用 MySQL 专有函数
+            cases.insert(0, ("改造前：7 次查询，DATE() 过滤", lambda: run_legacy(db, user_id)))
+        print(f"用户 {user_id}，答题记录 ≥ {records} 条，每项重复 {repeat} 次")
+        for name, fn in cases:
+            median, best = time_it(fn, repeat)
+            print(f"{name:<28} 中位数 {median:10.1f} ms   最快 {best:10.1f} ms")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,323 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : suite.py
+@Author  : admin1
+@Date    : 2026/10/17 22:45
+@Description : 热点路径基准测试（本地 SQLite 临时库，输出各操作 p50/p95/p99 与吞吐，可与基线对比）
+用法：python -m bench.suite [--questions N] [--users N] [--years Y] [--output 结果.json] [--baseline 基线.json]
+      python -m bench.suite --compare 新结果.json 基线.json
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from bench import datagen
+from src.database import QuestionDB
+from src.storage import SQLiteBackend
+
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "interview_trainer_bench")
+RESULT_VERSION = 1
+# 对比时超过阈值的方向：延迟变大、吞吐变小算退化
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def percentile(sorted_samples, fraction):
+    """最近秩分位数"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+def summarize(samples, wall_seconds, items=None):
+    """samples 为每次调用的秒数；items 为每次调用处理的条数（如导入行数），用于计算条/秒"""
+    ordered = sorted(samples)
+    result = {
+        'count': len(samples),
+        'mean_ms': sum(samples) * 1000 / len(samples),
+        'p50_ms': percentile(ordered, 0.50) * 1000,
+        'p95_ms': percentile(ordered, 0.95) * 1000,
+        'p99_ms': percentile(ordered, 0.99) * 1000,
+        'max_ms': ordered[-1] * 1000,
+        'ops_per_sec': len(samples) / wall_seconds if wall_seconds else 0.0,
+    }
+    if items is not None:
+        result['items_per_sec'] = items / wall_seconds if wall_seconds else 0.0
+    return result
+
+
+# --------------------
+# 数据准备
+# --------------------
+def dataset_key(spec):
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def prepare_database(spec, fresh=False, log=print):
+    """
+    按参数生成（或复用缓存的）数据集，再复制一份作为本次运行的工作库，写操作不影响缓存
+    :return: 工作库路径
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cached = os.path.join(CACHE_DIR, f"dataset_{dataset_key(spec)}.db")
+    if fresh or not os.path.exists(cached):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(cached + suffix):
+                os.remove(cached + suffix)
+        building = cached + ".building"
+        if os.path.exists(building):
+            os.remove(building)
+        started = time.perf_counter()
+        db = QuestionDB(backend=SQLiteBackend(building))
+        try:
+            datagen.generate(db, log=log, **spec)
+        finally:
+            db.close()
+        # 合并 WAL 后只需复制一个文件
+        conn = sqlite3.connect(building)
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.close()
+        os.replace(building, cached)
+        log(f"数据集已生成：{cached}（{time.perf_counter() - started:.1f} 秒）")
+    else:
+        log(f"复用数据集：{cached}")
+    work_dir = tempfile.mkdtemp(prefix="bench_run_")
+    work_path = os.path.join(work_dir, "bench.db")
+    shutil.copyfile(cached, work_path)
+    return work_path
+
+
+# --------------------
+# 各操作
+# --------------------
+class Context:
+    """一次运行共享的状态：数据库、随机数、题目/用户 id 和样本题目"""
+
+    def __init__(self, db, seed):
+        self.db = db
+        self.rng = random.Random(seed)
+        self.question_ids = [row['id'] for row in db._query_all("SELECT id FROM questions")]
+        self.user_ids = [row['id'] for row in db._query_all("SELECT id FROM users")]
+        sample = self.rng.sample(self.question_ids, min(500, len(self.question_ids)))
+        self.sample_texts = [db.get_question(qid)['question'] for qid in sample]
+        self.import_round = 0
+        self.trainer = None  # 导入操作首次运行时创建，与 db 共用
+        self.work_dir = tempfile.mkdtemp(prefix="bench_import_")
+
+
+def op_get_question_fro_review(ctx):
+    ctx.db.get_question_fro_review(user_id=ctx.rng.choice(ctx.user_ids))
+
+
+def op_save_review_record(ctx):
+    ctx.db.save_review_record(ctx.rng.choice(ctx.question_ids), "基准测试答案", ctx.rng.randint(1, 5),
+                              user_id=ctx.rng.choice(ctx.user_ids), duration_seconds=ctx.rng.randint(5, 600))
+
+
+def op_get_review_status(ctx):
+    ctx.db.get_review_status(ctx.rng.choice(ctx.user_ids))
+
+
+def op_is_question_exists(ctx):
+    # 一半命中已有题目，一半是不存在的题目
+    if ctx.rng.random() < 0.5:
+        ctx.db.is_question_exists(ctx.rng.choice(ctx.sample_texts))
+    else:
+        ctx.db.is_question_exists(f"不存在的题目 {ctx.rng.random()}")
+
+
+def op_search_questions(ctx):
+    words = ctx.rng.sample(datagen.WORDS, ctx.rng.randint(1, 2))
+    ctx.db.search_questions(" ".join(words), limit=50)
+
+
+def setup_search(ctx):
+    """等待进程内检索索引构建完成，避免把构建时间计入单次搜索"""
+    ctx.db.search_questions("索引", limit=1)
+    deadline = time.monotonic() + 600
+    while not ctx.db.search_index.ready and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def op_import_from_csv(ctx, rows=2000):
+    """每次导入一个新生成的 CSV（题目不重复），返回导入行数"""
+    from data.import_questions import ImportJob
+    from src.trainer import InterviewTrainer
+
+    ctx.import_round += 1
+    rng = random.Random(ctx.import_round)
+    path = os.path.join(ctx.work_dir, f"import_{ctx.import_round}.csv")
+    datagen.write_csv(path, datagen.make_questions(rng, rows, 1.0, start=10_000_000 * ctx.import_round))
+    if ctx.trainer is None:
+        ctx.trainer = InterviewTrainer(db=ctx.db)
+    ImportJob(path, trainer=ctx.trainer).run()
+    return rows
+
+
+# (名称, 操作, 默认次数, 准备函数)；import 每次处理一批行，次数少
+OPERATIONS = [
+    ("get_question_fro_review", op_get_question_fro_review, 2000, None),
+    ("save_review_record", op_save_review_record, 1000, None),
+    ("get_review_status", op_get_review_status, 200, None),
+    ("is_question_exists", op_is_question_exists, 2000, None),
+    ("search_questions", op_search_questions, 500, setup_search),
+    ("import_from_csv", op_import_from_csv, 5, None),
+]
+
+
+def run_operation(ctx, fn, iterations, warmup):
+    for _ in range(warmup):
+        fn(ctx)
+    samples, items = [], 0
+    wall_started = time.perf_counter()
+    for _ in range(iterations):
+        started = time.perf_counter()
+        n = fn(ctx)
+        samples.append(time.perf_counter() - started)
+        items += n or 0
+    return summarize(samples, time.perf_counter() - wall_started, items or None)
+
+
+def run_suite(spec, seed=1, scale=1.0, warmup=5, only=None, fresh=False, log=print):
+    """
+    :param scale: 各操作默认次数的倍数
+    :param only: 只运行这些操作（名称列表）
+    """
+    path = prepare_database(spec, fresh=fresh, log=log)
+    db = QuestionDB(backend=SQLiteBackend(path))
+    results = {}
+    ctx = None
+    try:
+        ctx = Context(db, seed)
+        for name, fn, iterations, setup in OPERATIONS:
+            if only and name not in only:
+                continue
+            if setup:
+                setup(ctx)
+            count = max(1, int(iterations * scale))
+            results[name] = run_operation(ctx, fn, count, min(warmup, count))
+            r = results[name]
+            log(f"{name:<24} n={r['count']:<6} p50 {r['p50_ms']:8.3f}  p95 {r['p95_ms']:8.3f}  "
+                f"p99 {r['p99_ms']:8.3f} ms   {r['ops_per_sec']:9.1f} 次/秒"
+                + (f"  {r['items_per_sec']:9.0f} 行/秒" if 'items_per_sec' in r else ""))
+    finally:
+        if ctx is not None and ctx.trainer is not None:
+            ctx.trainer.close()  # 同时关闭 db
+        else:
+            db.close()
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+        if ctx is not None:
+            shutil.rmtree(ctx.work_dir, ignore_errors=True)
+    return {
+        'version': RESULT_VERSION,
+        'meta': {
+            'dataset': spec,
+            'seed': seed,
+            'scale': scale,
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'sqlite': sqlite3.sqlite_version,
+        },
+        'operations': results,
+    }
+
+
+# --------------------
+# 基线对比
+# --------------------
+def compare(current, baseline, threshold=0.10):
+    """
+    逐项对比延迟分位数和吞吐
+    :return: (输出行列表, 退化项列表)
+    """
+    lines, regressions = [], []
+    if current['meta'].get('dataset') != baseline['meta'].get('dataset'):
+        lines.append("注意：两次运行的数据集参数不同，结果不可直接比较")
+    lines.append(f"{'操作':<24} {'指标':<12} {'基线':>10} {'本次':>10} {'变化':>8}")
+    for name, now in current['operations'].items():
+        base = baseline['operations'].get(name)
+        if base is None:
+            lines.append(f"{name:<24} （基线中没有）")
+            continue
+        metrics = [(key, False) for key in LATENCY_KEYS] + [('ops_per_sec', True)]
+        for key, higher_is_better in metrics:
+            if not base.get(key):
+                continue
+            change = (now[key] - base[key]) / base[key]
+            worse = -change if higher_is_better else change
+            flag = ""
+            if worse > threshold:
+                flag = "  退化"
+                regressions.append((name, key, change))
+            elif worse < -threshold:
+                flag = "  改善"
+            lines.append(f"{name:<24} {key:<12} {base[key]:>10.3f} {now[key]:>10.3f} {change:>+8.1%}{flag}")
+    return lines, regressions
+
+
+def load_result(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="面试训练器热点路径基准测试")
+    parser.add_argument("--questions", type=int, default=20000, help="题库题目数")
+    parser.add_argument("--users", type=int, default=20, help="用户数")
+    parser.add_argument("--years", type=float, default=1.0, help="答题历史年数")
+    parser.add_argument("--reviews-per-day", type=int, default=20, help="每个用户每天答题数")
+    parser.add_argument("--category-skew", type=float, default=1.0, help="分类 Zipf 倾斜度，0 为均匀")
+    parser.add_argument("--data-seed", type=int, default=7, help="数据生成种子")
+    parser.add_argument("--seed", type=int, default=1, help="操作参数的随机种子")
+    parser.add_argument("--scale", type=float, default=1.0, help="各操作次数的倍数")
+    parser.add_argument("--only", help="只运行指定操作，逗号分隔")
+    parser.add_argument("--fresh", action="store_true", help="重新生成数据集（默认复用缓存）")
+    parser.add_argument("--output", help="结果保存为 JSON")
+    parser.add_argument("--baseline", help="与基线结果 JSON 对比")
+    parser.add_argument("--threshold", type=float, default=10, help="判定退化的变化百分比")
+    parser.add_argument("--compare", nargs=2, metavar=("结果", "基线"), help="只对比两个已有结果，不运行")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        current, baseline = (load_result(path) for path in args.compare)
+    else:
+        spec = {
+            'questions': args.questions,
+            'users': args.users,
+            'years': args.years,
+            'reviews_per_day': args.reviews_per_day,
+            'category_skew': args.category_skew,
+            'seed': args.data_seed,
+        }
+        only = set(args.only.split(",")) if args.only else None
+        current = run_suite(spec, seed=args.seed, scale=args.scale, only=only, fresh=args.fresh)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(current, f, ensure_ascii=False, indent=2)
+            print(f"结果已保存：{args.output}")
+        if not args.baseline:
+            return 0
+        baseline = load_result(args.baseline)
+    lines, regressions = compare(current, baseline, args.threshold / 100)
+    print("\n".join(lines))
+    if regressions:
+        print(f"共 {len(regressions)} 项退化超过 {args.threshold:g}%")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
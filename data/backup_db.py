@@ -0,0 +1,42 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : backup_db.py
+@Author  : admin1
+@Date    : 2026/10/17 19:05
+@Description : 数据库备份/恢复命令行
+用法：python -m data.backup_db backup <目录>
+      python -m data.backup_db restore <目录> [--replace]
+"""
+import sys
+import time
+
+from src.backup import backup_database, restore_database
+from src.trainer import InterviewTrainer
+
+
+def main(argv):
+    if len(argv) < 2 or argv[0] not in ("backup", "restore"):
+        print("用法：python -m data.backup_db backup <目录>")
+        print("      python -m data.backup_db restore <目录> [--replace]")
+        return 1
+    action, path = argv[0], argv[1]
+    trainer = InterviewTrainer()
+    started = time.perf_counter()
+    try:
+        if action == "backup":
+            manifest = backup_database(trainer.db, path)
+            total = sum(t['rows'] for t in manifest['tables'])
+            print(f"备份完成：{path}，共 {total} 行，耗时 {time.perf_counter() - started:.1f} 秒")
+        else:
+            restored = restore_database(trainer.db, path, replace="--replace" in argv[2:])
+            print(f"恢复完成，共 {sum(restored.values())} 行，耗时 {time.perf_counter() - started:.1f} 秒")
+    except Exception as e:
+        print(f"{'备份' if action == 'backup' else '恢复'}失败：{str(e)}")
+        return 1
+    finally:
+        trainer.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
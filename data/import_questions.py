@@ -6,76 +6,251 @@
 @Description : 题目导入
 """
 import csv
+import json
+import os
+import threading
+import time
 
+from src.normalize import question_hash
 from src.trainer import InterviewTrainer
 
+DEFAULT_BATCH_SIZE = 1000  # 每批插入条数（一个事务）
+PROGRESS_INTERVAL = 0.5  # 进度回调最小间隔（秒）
 
-def import_from_csv(file_path, mode='cli'):
-    """从csv文件导入题目"""
-    trainer = InterviewTrainer()
-    imported_cnt = 0
-    skipped_cnt = 0  # 重复题目
-    failed_rows = []  # 添加失败的信息
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            total_rows = 0  # 总行计数
-            for _ in reader:  # 先统计行数
-                total_rows += 1
-            f.seek(0)  # 重置文件指针
-            next(reader)  # 跳过标题行
-            if mode == "cli":
-                print(f"开始导入，共 {total_rows} 行")
-            for line_num, row in enumerate(reader, start=2):  # 行号从2开始
-                # 显示进度
-
-                print(f"处理中： 第 {line_num}/{total_rows + 1} 行... ")
-
-                if 'question' not in row:
-                    failed_rows.append((line_num, "缺少 'question' row", row))
-                    continue
+
+def _cli_progress(progress):
+    """命令行模式下的进度输出"""
+    print(f"处理中：已读取 {progress['rows']} 行，新增 {progress['imported']}，"
+          f"跳过 {progress['skipped']}，失败 {progress['failed']}")
+
+
+def _validate_row(row):
+    """校验并清洗一行，返回 ((question, answer, category, difficulty), None) 或 (None, 错误信息)"""
+    if row.get('question') is None:
+        return None, "缺少 'question' row"
+    question = row['question'].strip()
+    if not question:
+        return None, "题目为空"
+    answer = (row.get('answer') or '').strip()
+    category = (row.get('category') or '').strip()
+    difficulty = (row.get('difficulty') or '中等').strip()
+    return (question, answer, category, difficulty), None
+
+
+class ImportJob:
+    """
+    一次 CSV 导入任务，可在后台线程运行
+    - 单次读取文件；预取已有题目的去重哈希在内存中查重；按批在一个事务内批量插入
+    - progress 为最新进度（读取行数、新增/跳过/失败数、已读字节、速度），可在其他线程轮询
+    - cancel() 后在下一行处停止：正在写入的批次整批提交或整批回滚，尚未写入的行直接丢弃
+    - 指定 checkpoint_path 时每提交一批记录一次断点，resume=True 时从断点之后继续；
+      文件大小或修改时间变化后断点失效，正常完成后删除断点
+    """
+
+    def __init__(self, file_path, trainer=None, batch_size=DEFAULT_BATCH_SIZE, progress_callback=None,
+                 progress_interval=PROGRESS_INTERVAL, checkpoint_path=None, resume=False):
+        """
+        :param trainer: 使用已有的 InterviewTrainer（同进程内的缓存/快照随之失效），为空时临时创建
+        :param progress_callback: progress_callback(progress) 节流后的进度回调，在运行导入的线程中调用
+        """
+        self.file_path = file_path
+        self.trainer = trainer
+        self.batch_size = batch_size
+        self.progress_callback = progress_callback
+        self.progress_interval = progress_interval
+        self.checkpoint_path = checkpoint_path
+        self.resume = resume
+        self.total_bytes = os.path.getsize(file_path)
+        self.failed_rows = []  # 添加失败的信息 (行号, 错误, 原始行)
+        self.progress = self._progress(0, 0, 0, 0, 0, 0.0)
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """请求停止导入（在导入线程中于下一行处生效）"""
+        self._cancel.set()
+
+    def _file_stamp(self):
+        stat = os.stat(self.file_path)
+        return {"file": os.path.abspath(self.file_path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+    def load_checkpoint(self):
+        """读取与当前文件匹配的断点，没有或已失效时返回 None"""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return None
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if {k: checkpoint.get(k) for k in ("file", "size", "mtime")} != self._file_stamp():
+            return None
+        return checkpoint
+
+    def _save_checkpoint(self, rows, imported, skipped, failed):
+        checkpoint = dict(self._file_stamp(), rows=rows, imported=imported, skipped=skipped, failed=failed)
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f, ensure_ascii=False)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _clear_checkpoint(self):
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def _progress(self, rows, imported, skipped, failed, bytes_read, elapsed):
+        return {
+            "rows": rows,
+            "imported": imported,
+            "skipped": skipped,
+            "failed": failed,
+            "bytes_read": bytes_read,
+            "total_bytes": self.total_bytes,
+            "rows_per_second": rows / elapsed if elapsed > 0 else 0.0,
+            "elapsed": elapsed,
+        }
+
+    def run(self):
+        """
+        执行导入
+        :return: {"imported", "skipped", "failed", "failed_details", "rows", "cancelled", "resumed_from", "elapsed"}
+        """
+        own_trainer = self.trainer is None
+        trainer = self.trainer or InterviewTrainer()
+        checkpoint = self.load_checkpoint() if self.resume else None
+        resume_rows = checkpoint["rows"] if checkpoint else 0
+        imported_cnt = checkpoint["imported"] if checkpoint else 0
+        skipped_cnt = checkpoint["skipped"] if checkpoint else 0  # 重复题目
+        failed_before = checkpoint["failed"] if checkpoint else 0  # 断点之前失败的行数（明细不保留）
+        rows_read = 0
+        bytes_read = 0
+        started = time.monotonic()
+        last_report = 0.0
+
+        def report(force=False):
+            nonlocal last_report
+            now = time.monotonic()
+            if not force and now - last_report < self.progress_interval:
+                return
+            last_report = now
+            self.progress = self._progress(rows_read, imported_cnt, skipped_cnt,
+                                           failed_before + len(self.failed_rows), bytes_read, now - started)
+            if self.progress_callback is not None:
+                self.progress_callback(self.progress)
+
+        def flush(batch):
+            nonlocal imported_cnt, skipped_cnt
+            if batch:
                 try:
-                    # 导入题目
-                    question = row['question'].strip()
-                    # 检查题目是否已存在
-                    if trainer.question_exists(question):
-                        skipped_cnt += 1
-                        # failed_rows.append((line_num, "题目已存在", row))
-                        continue
-                    answer = row.get('answer', '').strip()
-                    category = row.get('category', '').strip()
-                    difficulty = row.get('difficulty', '中等').strip()
-                    trainer.add_question(question, answer, category, difficulty)
-                    # print(f"读取的题目信息：{question}")
-                    # print(f"读取的题目信息：{answer}")
-                    # print(f"读取的题目信息：{category}")
-                    # print(f"读取的题目信息：{difficulty}")
-                    imported_cnt += 1
+                    inserted = trainer.add_questions_bulk([values for _, values, _ in batch])
+                    imported_cnt += inserted
+                    # 预取之后被其他人插入的题目由唯一索引忽略，计为重复
+                    skipped_cnt += len(batch) - inserted
                 except Exception as e:
-                    failed_rows.append((line_num, str(e), row))
+                    # 整批已回滚，逐行记为失败
+                    for line_num, _, row in batch:
+                        self.failed_rows.append((line_num, str(e), row))
+            if self.checkpoint_path:
+                self._save_checkpoint(rows_read, imported_cnt, skipped_cnt, failed_before + len(self.failed_rows))
+
+        def lines(f):
+            # 按字节读取以便统计进度（文本模式迭代时不能 tell()），UTF-8 多字节字符中不含换行符
+            # 与文本模式一样把 \r\n 换成 \n
+            nonlocal bytes_read
+            for line in f:
+                bytes_read += len(line)
+                if line.endswith(b"\r\n"):
+                    line = line[:-2] + b"\n"
+                yield line.decode("utf-8")
+
+        try:
+            existing_keys = trainer.question_hashes()  # 已有题目的去重哈希
+            with open(self.file_path, "rb") as f:
+                reader = csv.DictReader(lines(f))
+                batch = []
+                for line_num, row in enumerate(reader, start=2):  # 行号从2开始
+                    if self.cancelled:
+                        # 尚未写入的批次直接丢弃，断点停在上一次提交的批次
+                        batch = []
+                        break
+                    rows_read += 1
+                    if rows_read <= resume_rows:
+                        # 断点之前的行已处理过
+                        report()
+                        continue
+                    values, error = _validate_row(row)
+                    if error:
+                        self.failed_rows.append((line_num, error, row))
+                    else:
+                        # 检查题目是否已存在（含文件内重复）
+                        key = question_hash(values[0])
+                        if key in existing_keys:
+                            skipped_cnt += 1
+                        else:
+                            existing_keys.add(key)
+                            batch.append((line_num, values, row))
+                    if len(batch) >= self.batch_size:
+                        flush(batch)
+                        batch = []
+                    report()
+                if not self.cancelled:
+                    flush(batch)
+                    self._clear_checkpoint()
+                report(force=True)
+        finally:
+            if own_trainer:
+                trainer.close()
+        return {
+            "imported": imported_cnt,
+            "skipped": skipped_cnt,
+            "failed": failed_before + len(self.failed_rows),
+            "failed_details": self.failed_rows,
+            "rows": rows_read,
+            "cancelled": self.cancelled,
+            "resumed_from": resume_rows,
+            "elapsed": time.monotonic() - started,
+        }
+
+
+def import_from_csv(file_path, mode='cli', batch_size=DEFAULT_BATCH_SIZE, progress_callback=None,
+                    progress_interval=PROGRESS_INTERVAL, checkpoint_path=None, resume=False):
+    """
+    从csv文件导入题目（ImportJob 的同步封装）
+    :param progress_callback: progress_callback(progress) 节流后的进度回调，
+                              progress 含 rows/imported/skipped/failed
+    """
+    if progress_callback is None and mode == "cli":
+        progress_callback = _cli_progress
+    try:
+        if mode == "cli":
+            print(f"开始导入：{file_path}")
+        job = ImportJob(file_path, batch_size=batch_size, progress_callback=progress_callback,
+                        progress_interval=progress_interval, checkpoint_path=checkpoint_path, resume=resume)
+        result = job.run()
         if mode == "cli":
             print("\n" + '=' * 50)
-            print(f"成功导入 {imported_cnt} 道题目")
-            print(f"跳过重复 {skipped_cnt} 道题目")
-            print(f"导入失败 {len(failed_rows)} 行")
+            print(f"成功导入 {result['imported']} 道题目")
+            print(f"跳过重复 {result['skipped']} 道题目")
+            print(f"导入失败 {result['failed']} 行")
             print('=' * 50)
-            if failed_rows:
-                for i, (line, error, data) in enumerate(failed_rows, 1):
+            if result['failed_details']:
+                for i, (line, error, data) in enumerate(result['failed_details'], 1):
                     print(f"#{i} 行：{line} | 错误类型：{error}")
         else:  # web
             return {
-                "imported": imported_cnt,
-                "skipped": skipped_cnt,
-                "failed": len(failed_rows),
-                "failed_details": failed_rows
+                "imported": result['imported'],
+                "skipped": result['skipped'],
+                "failed": result['failed'],
+                "failed_details": result['failed_details']
             }
     except Exception as e:
         if mode == "cli":
             print(f"文件处理失败：{str(e)}")
         else:
             return {"error": str(e)}
-    finally:
-        trainer.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,27 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : rebuild_stats.py
+@Author  : admin1
+@Date    : 2026/10/17 13:40
+@Description : 从答题记录重建统计汇总表
+"""
+import sys
+
+from src.trainer import InterviewTrainer
+
+
+def rebuild_stats(user_id=None):
+    """重建 review_daily_stats，user_id 为空时重建全部用户"""
+    trainer = InterviewTrainer()
+    try:
+        rows = trainer.db.rebuild_review_rollup(user_id=user_id)
+        target = f"用户 {user_id}" if user_id is not None else "全部用户"
+        print(f"{target} 的统计汇总已重建，共 {rows} 行")
+    except Exception as e:
+        print(f"重建统计汇总失败：{str(e)}")
+    finally:
+        trainer.close()
+
+
+if __name__ == '__main__':
+    rebuild_stats(int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -5,19 +5,31 @@
 @Date    : 2025/8/25 16:48
 @Description : GUI实现
 """
+import time
+
+_PROCESS_STARTED = time.perf_counter()  # 启动耗时报告的起点，放在其他 import 之前
+
 import json
 import logging
 import logging.handlers
 import platform
+from collections import deque
 
 import customtkinter as ctk
 import tkinter as tk
 import os
 from tkinter import messagebox, filedialog
 from datetime import datetime
-from pymysql.cursors import DictCursor
-from src.trainer import InterviewTrainer
-from data.import_questions import import_from_csv
+# 数据层（pymysql/werkzeug 等）在窗口显示后于后台线程导入，见 load_trainer()
+from src.startup_timer import StartupTimer
+from src.task_runner import TaskRunner
+
+# 练习时在后台预取的题数：作答期间备好后续题目，点“下一题”时直接显示
+PREFETCH_DEPTH = 3
+# CSV 导入断点：取消或中断后可从上次提交的批次继续
+IMPORT_CHECKPOINT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "import_checkpoint.json")
+# 退出时等待后台任务（含已取消的导入提交当前批次）结束的最长时间（秒）
+SHUTDOWN_WAIT_SECONDS = 10
 
 
 def setup_logging():
@@ -61,10 +73,162 @@ def setup_logging():
 logger = setup_logging()
 
 
+def load_trainer(startup):
+    """
+    后台线程：导入数据层并连接数据库
+    答题记录先写本地日志，提交不等待数据库；配置了 REPLICA_PATH 时读取走本地离线副本
+    题库列表/检索索引从 mmap 快照读取，启动时不逐行加载题库
+    """
+    from src.storage import configured_replica_path
+    from src.trainer import InterviewTrainer, DEFAULT_SNAPSHOT_PATH
+    startup.mark("导入数据层")
+    trainer = InterviewTrainer(write_behind=True, replica_path=configured_replica_path(),
+                               snapshot_path=DEFAULT_SNAPSHOT_PATH, prefetch_depth=PREFETCH_DEPTH)
+    startup.mark("连接数据库")
+    return trainer
+
+
+class PagedListbox:
+    """
+    按需翻页的列表框
+    滚动接近底部时取下一页、接近顶部时取回已丢弃的上一页，内存中最多保留 max_pages 页，
+    丢弃的页只保留起始游标，因此浏览任意多条记录时内存占用不变
+    指定 runner 时在后台线程取页，reset() 会丢弃尚未返回的旧结果
+    """
+
+    def __init__(self, listbox, fetch_page, format_row, page_size=100, max_pages=5, threshold=0.1, runner=None,
+                 on_error=None):
+        """
+        :param fetch_page: fetch_page(cursor, limit) -> (rows, next_cursor)，cursor 为 None 表示第一页
+        :param format_row: format_row(row) -> 列表显示文本
+        :param runner: TaskRunner，为空时在主线程同步取页
+        :param on_error: on_error(exc) 取页失败时回调
+        """
+        self.listbox = listbox
+        self.fetch_page = fetch_page
+        self.format_row = format_row
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.threshold = threshold
+        self.runner = runner
+        self.on_error = on_error
+        self.pages = deque()  # [(起始游标, rows, 下一页游标)]
+        self.dropped = []  # 已从顶部丢弃的页的起始游标
+        self.exhausted = False
+        self._loading = False
+        self._generation = 0  # 每次 reset() 加一，旧的取页结果按此丢弃
+        self.listbox.configure(yscrollcommand=self._on_scroll)
+
+    def reset(self):
+        """清空并加载第一页"""
+        self._generation += 1
+        self._loading = False
+        self.listbox.delete(0, "end")
+        self.pages.clear()
+        self.dropped = []
+        self.exhausted = False
+        self._load_next()
+
+    def row(self, index):
+        """列表框第 index 行对应的记录"""
+        for _, rows, _ in self.pages:
+            if index < len(rows):
+                return rows[index]
+            index -= len(rows)
+        return None
+
+    def _on_scroll(self, first, last):
+        if self._loading:
+            return
+        if float(last) >= 1 - self.threshold and not self.exhausted:
+            self.listbox.after_idle(self._load_next)
+        elif float(first) <= self.threshold and self.dropped:
+            self.listbox.after_idle(self._load_prev)
+
+    def _fetch(self, cursor, on_done):
+        """取一页，完成后在主线程回调 on_done(rows, next_cursor)"""
+        self._loading = True
+        generation = self._generation
+
+        def done(result):
+            if generation == self._generation:
+                self._loading = False
+                on_done(*result)
+
+        def failed(exc):
+            if generation == self._generation:
+                self._loading = False
+                if self.on_error:
+                    self.on_error(exc)
+
+        if self.runner is not None:
+            self.runner.submit(self.fetch_page, cursor, self.page_size, key=self, on_done=done, on_error=failed)
+            return
+        try:
+            result = self.fetch_page(cursor, self.page_size)
+        except Exception as e:
+            failed(e)
+            return
+        done(result)
+
+    def _load_next(self):
+        if self.exhausted or self._loading:
+            return
+        cursor = self.pages[-1][2] if self.pages else None
+        self._fetch(cursor, lambda rows, next_cursor: self._append_page(cursor, rows, next_cursor))
+
+    def _append_page(self, cursor, rows, next_cursor):
+        if len(rows) < self.page_size:
+            self.exhausted = True
+        if not rows:
+            return
+        self.pages.append((cursor, rows, next_cursor))
+        self.listbox.insert("end", *[self.format_row(r) for r in rows])
+        if len(self.pages) > self.max_pages:
+            top = self.listbox.nearest(0)
+            start, old_rows, _ = self.pages.popleft()
+            self.dropped.append(start)
+            self._shift_selection(-len(old_rows))
+            self.listbox.delete(0, len(old_rows) - 1)
+            self.listbox.yview(max(0, top - len(old_rows)))
+
+    def _load_prev(self):
+        if not self.dropped or self._loading:
+            return
+        cursor = self.dropped[-1]
+        self._fetch(cursor, lambda rows, next_cursor: self._prepend_page(cursor, rows, next_cursor))
+
+    def _prepend_page(self, cursor, rows, next_cursor):
+        self.dropped.pop()
+        if not rows:
+            return
+        top = self.listbox.nearest(0)
+        self.pages.appendleft((cursor, rows, next_cursor))
+        self.listbox.insert(0, *[self.format_row(r) for r in rows])
+        self._shift_selection(len(rows))
+        if len(self.pages) > self.max_pages:
+            _, old_rows, _ = self.pages.pop()
+            size = self.listbox.size()
+            self.listbox.delete(size - len(old_rows), "end")
+            self.exhausted = False
+        self.listbox.yview(top + len(rows))
+
+    def _shift_selection(self, delta):
+        """增删顶部行后保持选中行不变"""
+        sel = self.listbox.curselection()
+        if delta > 0 or not sel:
+            return
+        self.listbox.selection_clear(0, "end")
+        if sel[0] + delta >= 0:
+            self.listbox.selection_set(sel[0] + delta)
+
+
 class InterviewTrainerGUI:
     def __init__(self):
         """初始化应用"""
         logger.info("启动UI")
+        self.startup = StartupTimer(_PROCESS_STARTED)
+        self.startup.mark("导入界面模块")
         # CTk基本设置
         # 设置主题
         ctk.set_appearance_mode("light")
@@ -94,18 +258,85 @@ class InterviewTrainerGUI:
         self.timer_running = False
         self.elapsed_time = 0
         self.timer_job = None
-        try:
-            # 初始化数据库连接
-            self.trainer = InterviewTrainer()
-        except Exception as e:
-            logger.exception("Trainer 初始化失败")
-            messagebox.showerror("初始化失败", f"无法连接或加载数据层：：{str(e)}")
-            raise
+
+        # 数据库调用都在后台线程执行，界面线程只负责提交和显示结果
+        self.status_label = ctk.CTkLabel(self.app, text="", anchor="w", font=self.textbox_font)
+        self.status_label.pack(side="bottom", fill="x", padx=12)
+        self.tasks = TaskRunner(self.app.after, on_busy=self._on_tasks_busy, on_error=self._on_task_error)
+        self.import_job = None  # 进行中的 CSV 导入
+        self.main_frame = None  # 主框架在登录后才构建，各选项卡首次打开时构建
+        self._built_tabs = set()
+        self.startup.mark("创建窗口")
         # 构建 UI (分区函数)
         self.setup_auth_frame()  # 登录/注册
-        self.setup_main_frame()  # 主框架(被隐藏直到登录)
+        self.startup.mark("构建登录界面")
+        # 先显示登录界面，数据层在后台导入并连接，完成前登录/注册按钮不可用
+        for btn in (self.login_btn, self.register_btn):
+            btn.configure(state="disabled")
+        self.status_label.configure(text="正在连接数据库…")
+        self.tasks.submit(load_trainer, self.startup, on_done=self._on_trainer_ready,
+                          on_error=self._on_trainer_failed)
+
+    def _on_trainer_ready(self, trainer):
+        self.trainer = trainer
+        for btn in (self.login_btn, self.register_btn):
+            btn.configure(state="normal")
         # 从本地 session.json 尝试恢复用户名
         self.load_saved_session()
+        self._report_startup()
+
+    def _on_trainer_failed(self, exc):
+        logger.error(f"Trainer 初始化失败：{exc}", exc_info=exc)
+        self.status_label.configure(text="数据层初始化失败")
+        messagebox.showerror("初始化失败", f"无法连接或加载数据层：{exc}")
+
+    def _on_first_paint(self):
+        self.startup.mark("首次绘制")
+        self._report_startup()
+
+    def _report_startup(self):
+        """首次绘制和数据库连接都完成后输出一次启动耗时报告"""
+        if self.startup.has("首次绘制", "连接数据库") and not getattr(self, "_startup_reported", False):
+            self._startup_reported = True
+            logger.info(self.startup.report())
+
+    def run_task(self, fn, *args, key=None, on_done=None, error_title="操作失败", busy=(), **kwargs):
+        """
+        在后台线程执行 fn，完成后在界面线程回调 on_done(result)
+        :param key: 同一 key 的新任务会取消尚未返回的旧任务
+        :param busy: 执行期间禁用的按钮
+        """
+        for widget in busy:
+            widget.configure(state="disabled")
+
+        def release():
+            for widget in busy:
+                if widget.winfo_exists():
+                    widget.configure(state="normal")
+
+        def done(result):
+            release()
+            if on_done is not None:
+                on_done(result)
+
+        def failed(exc):
+            release()
+            self._show_task_error(error_title, exc)
+
+        return self.tasks.submit(fn, *args, key=key, on_done=done, on_error=failed, **kwargs)
+
+    def _on_tasks_busy(self, count):
+        """有后台任务进行中时在底部显示加载状态"""
+        self.status_label.configure(text=f"正在加载…（{count}）" if count else "")
+
+    @staticmethod
+    def _show_task_error(title, exc):
+        logger.error(f"{title}：{exc}", exc_info=exc)
+        messagebox.showerror(title, f"{title}：{exc}")
+
+    @staticmethod
+    def _on_task_error(exc):
+        logger.error(f"后台任务失败：{exc}", exc_info=exc)
 
     def set_global_style(self):
         """设置全局字体和主题"""
@@ -158,13 +389,13 @@ class InterviewTrainerGUI:
         button_frame = ctk.CTkFrame(self.auth_frame)
         button_frame.pack(pady=20)
 
-        login_btn = ctk.CTkButton(button_frame, text="登录", width=120, command=self.handle_login,
+        self.login_btn = ctk.CTkButton(button_frame, text="登录", width=120, command=self.handle_login,
                                   font=self.textbox_font)
-        login_btn.pack(side="left", padx=10)
+        self.login_btn.pack(side="left", padx=10)
 
-        register_btn = ctk.CTkButton(button_frame, text="注册", width=120, command=self.handle_register,
+        self.register_btn = ctk.CTkButton(button_frame, text="注册", width=120, command=self.handle_register,
                                      font=self.textbox_font)
-        register_btn.pack(side="left", padx=10)
+        self.register_btn.pack(side="left", padx=10)
 
         # 附加说明
         help_lbl = ctk.CTkLabel(self.auth_frame, text="没有账号？直接注册即可（用户名不可重复）", text_color="#6b7280",
@@ -178,8 +409,7 @@ class InterviewTrainerGUI:
         if not username or not password:
             messagebox.showwarning("输入错误", "用户名和密码不能为空")
             return
-        try:
-            user = self.trainer.db.verify_user(username, password)
+        def on_verified(user):
             if not user:
                 messagebox.showerror("登录失败", "用户名或密码输入错误")
                 return
@@ -192,9 +422,10 @@ class InterviewTrainerGUI:
             self.show_main_interface()
             # 立即加载题目
             self.load_next_question()
-        except Exception as e:
-            logger.exception("登录异常")
-            messagebox.showerror("登录异常", f"登录失败：{e}")
+
+        # 密码哈希校验较慢，放到后台执行
+        self.run_task(self.trainer.verify_user, username, password, key="auth", on_done=on_verified,
+                      error_title="登录失败", busy=(self.login_btn,))
 
     def handle_register(self):
         """注册动作： 弹窗获取并写入db"""
@@ -203,16 +434,15 @@ class InterviewTrainerGUI:
         if not username or not password:
             messagebox.showwarning("输入错误", "用户名和密码不能为空")
             return
-        try:
-            new_id = self.trainer.db.create_user(username, password)
+        def on_created(new_id):
             if new_id:
                 messagebox.showinfo("注册成功", "注册成功！现在可以直接登录。")
                 logger.info(f"新用户注册：{username}")
             else:
                 messagebox.showerror("注册失败", "用户名可能已存在或创建失败")
-        except Exception as e:
-            logger.exception("注册异常")
-            messagebox.showerror("注册异常", f"注册失败：{e}")
+
+        self.run_task(self.trainer.create_user, username, password, key="auth", on_done=on_created,
+                      error_title="注册失败", busy=(self.register_btn,))
 
     # --------------------
     # 主界面与选项卡
@@ -237,15 +467,31 @@ class InterviewTrainerGUI:
         self.tab_view.add("自测")
         self.tab_view.add("回顾")
         self.tab_view.add("统计")
+        self.tab_view.add("诊断")
         self.tab_view.add("题库")
         self.tab_view.add("个人中心")
 
-        # 分别设置每个tab的内容
-        self.setup_practice_tab()
-        self.setup_review_tab()
-        self.setup_stats_tab()
-        self.setup_question_bank_tab()
-        self.setup_profile_tab()
+        # 各tab的内容在首次打开时才构建和加载数据，登录后只构建默认的自测页
+        self.tab_view.configure(command=self.on_tab_changed)
+        self._built_tabs = set()
+        self.build_tab("自测")
+
+    def build_tab(self, name):
+        """构建选项卡内容（每个选项卡只构建一次）"""
+        if name in self._built_tabs:
+            return
+        self._built_tabs.add(name)
+        {
+            "自测": self.setup_practice_tab,
+            "回顾": self.setup_review_tab,
+            "统计": self.setup_stats_tab,
+            "诊断": self.setup_diagnostics_tab,
+            "题库": self.setup_question_bank_tab,
+            "个人中心": self.setup_profile_tab,
+        }[name]()
+
+    def on_tab_changed(self):
+        self.build_tab(self.tab_view.get())
 
     def show_main_interface(self):
         """隐藏登录认证界面，显示主界面"""
@@ -346,33 +592,42 @@ class InterviewTrainerGUI:
 
     def load_next_question(self):
         """从trainer获取下一题并显示，无题则提示"""
-        try:
-            # 如果是会话的第一题，记录开始时间
-            if self.session_question_count == 0:
-                self.session_start_time = datetime.now()
-            # 停止当前问题的计时器
-            self.reset_timer_state()
-            self.stop_timer()
+        # 如果是会话的第一题，记录开始时间
+        if self.session_question_count == 0:
+            self.session_start_time = datetime.now()
+        # 停止当前问题的计时器
+        self.reset_timer_state()
+        self.stop_timer()
 
-            # 隐藏参考答案区域（如果有显示）
-            if self.answer_frame.winfo_ismapped():
-                self.answer_frame.pack_forget()
-                self.show_answer_btn.configure(text="参考答案")
+        # 隐藏参考答案区域（如果有显示）
+        if self.answer_frame.winfo_ismapped():
+            self.answer_frame.pack_forget()
+            self.show_answer_btn.configure(text="参考答案")
 
-            question = self.trainer.get_next_question()
-            if not question:
-                messagebox.showinfo("完成", "没有需要复习的题目了")
-                # 清空显示
-                self.display_question(None)
-                return
-            self.current_question = question
-            self.display_question(question)
-            # 开始计时
-            self.reset_timer()
-            self.start_timer()
-        except Exception as e:
-            logger.exception("加载下一题失败")
-            messagebox.showerror("加载失败", f"加载下一题失败：{str(e)}")
+        user_id = self.current_user.get('id') if self.current_user else None
+        # 有预取好的题目时直接显示，否则在后台取题
+        question = self.trainer.take_prefetched_question(user_id=user_id)
+        if question is not None:
+            # 取消的任务不再回调，由这里恢复按钮
+            self.tasks.cancel("next_question")
+            self.next_btn.configure(state="normal")
+            self._show_next_question(question)
+            return
+        self.run_task(self.trainer.get_next_question, user_id=user_id, key="next_question",
+                      on_done=self._show_next_question, error_title="加载下一题失败", busy=(self.next_btn,))
+
+    def _show_next_question(self, question):
+        if not question:
+            self.current_question = None
+            messagebox.showinfo("完成", "没有需要复习的题目了")
+            # 清空显示
+            self.display_question(None)
+            return
+        self.current_question = question
+        self.display_question(question)
+        # 开始计时
+        self.reset_timer()
+        self.start_timer()
 
     def display_question(self, q):
         """把题目信息填入UI"""
@@ -384,6 +639,8 @@ class InterviewTrainerGUI:
             self.question_textbox.insert("end", "(没有题目)")
             self.question_textbox.configure(state="disabled")
             self.question_textbox.configure(text="(无)")
+            self.meta_label.configure(text="")
+            return
         meta_text = f"[{q.get('category', '未分类')}] - [{q.get('difficulty', '中等')}] - [掌握程度: {q.get('level', 0)}/5]"
         self.meta_label.configure(text=meta_text)
 
@@ -457,27 +714,27 @@ class InterviewTrainerGUI:
             rating = int(self.rating_var.get())
         except Exception:
             rating = 2
-        try:
-            record_id = self.trainer.submit_answer(
-                self.current_question['id'],
-                answer,
-                rating,
-                user_id=self.current_user.get('id') if self.current_user else None,
-                duration_seconds=self.elapsed_time
-            )
+        duration = self.elapsed_time
+
+        def on_submitted(record_id):
             if record_id:
                 # 更新会话统计
                 self.session_question_count += 1
-                self.session_total_time += self.elapsed_time
+                self.session_total_time += duration
                 logger.info(f"已提交记录 id={record_id}")
                 # messagebox.showinfo("提交成功", "答案提交成功，进入下一题。")
                 self.reset_timer_state()
                 self.load_next_question()
             else:
                 messagebox.showerror("提交失败", "提交未成功（请检查数据库或日志）")
-        except Exception as e:
-            logger.exception("提交异常")
-            messagebox.showerror("提交失败", f"提交异常：{str(e)}")
+
+        self.run_task(self.trainer.submit_answer,
+                      self.current_question['id'],
+                      answer,
+                      rating,
+                      user_id=self.current_user.get('id') if self.current_user else None,
+                      duration_seconds=duration,
+                      key="submit", on_done=on_submitted, error_title="提交失败", busy=(self.submit_btn,))
 
     def reset_timer_state(self):
         self.is_paused = False
@@ -502,6 +759,10 @@ class InterviewTrainerGUI:
         self.review_listbox = tk.Listbox(left, width=36, font=self.textbox_font)
         self.review_listbox.pack(fill="y", expand=True, pady=6)
         self.review_listbox.bind("<<ListboxSelect>>", self.on_review_select)
+        self.review_pager = PagedListbox(
+            self.review_listbox, self.fetch_review_page,
+            lambda row: f"[{row['reviewed_at']}] [Q#{row['question_id']}] 评分：{row['rating']} ",
+            runner=self.tasks, on_error=lambda e: self._show_task_error("回顾加载失败", e))
 
         self.refresh_view_btn = ctk.CTkButton(left, text="刷新", command=self.refresh_reviews, font=self.textbox_font)
         self.refresh_view_btn.pack(pady=6)
@@ -513,53 +774,32 @@ class InterviewTrainerGUI:
         self.review_detail.configure(state="disabled")
 
         # 初始加载
-        self.review_cache = []
         self.refresh_reviews()
 
-    def refresh_reviews(self):
-        """从db拉取当前用户的最近记录（50）条"""
-        self.review_listbox.delete(0, "end")
-        self.review_cache = []
-        try:
-            db = self.trainer.db
+    def fetch_review_page(self, cursor, limit):
+        """回顾列表翻页：按 (reviewed_at, id) 游标取当前用户的下一页记录"""
+        user_id = self.current_user['id'] if self.current_user else None
+        rows = self.trainer.db.page_reviews(user_id, before=cursor, limit=limit)
+        next_cursor = (rows[-1]['reviewed_at'], rows[-1]['id']) if rows else cursor
+        return rows, next_cursor
 
-            cursor = db.conn.cursor(DictCursor)
-            if self.current_user:
-                cursor.execute("""
-                    SELECT r.id, r.question_id, r.user_answer, r.rating, r.duration_seconds, r.reviewed_at,
-                        q.question AS question_text, q.answer AS answer_text
-                    FROM review_records r
-                    JOIN questions q ON r.question_id = q.id
-                    WHERE r.user_id = %s
-                    ORDER BY r.reviewed_at DESC
-                    LIMIT 100
-                """, (self.current_user['id'],))
-            else:
-                # messagebox.showwarning("未登录","无法获取记录")
-                # return
-                cursor.execute("""
-                    SELECT r.id, r.question_id, r.user_answer, r.rating, r.duration_seconds, r.reviewed_at,
-                        q.question AS question_text, q.answer AS answer_text
-                    FROM review_records r
-                    JOIN questions q ON r.question_id = q.id
-                    ORDER BY r.reviewed_at DESC
-                    LIMIT 50
-                """)
-            rows = cursor.fetchall()
-            for row in rows:
-                label = f"[{row['reviewed_at']}] [Q#{row['question_id']}] 评分：{row['rating']} "
-                self.review_listbox.insert("end", label)
-                self.review_cache.append(row)
-        except Exception as e:
-            logger.exception("加载回顾失败")
-            messagebox.showerror("回顾加载失败", f"无法加载回顾记录：{e}")
+    def refresh_reviews(self):
+        """从db重新拉取当前用户的答题记录，滚动时按页加载"""
+        self.review_pager.reset()
 
     def on_review_select(self, event):
         sel = self.review_listbox.curselection()
         if not sel:
             return
-        idx = sel[0]
-        rec = self.review_cache[idx]
+        row = self.review_pager.row(sel[0])
+        if row is None:
+            return
+        self.run_task(self.trainer.db.get_review_detail, row['id'], key="review_detail",
+                      on_done=self._show_review_detail, error_title="加载回顾详情失败")
+
+    def _show_review_detail(self, rec):
+        if rec is None:
+            return
         #         txt = f"""问题(Q#{rec['question_id']}):
         # {rec.get('question_text', '(无)')}
         #
@@ -614,11 +854,13 @@ class InterviewTrainerGUI:
 
     def refresh_stats(self):
         """简化统计：仅显示答题数、分类数、平均评分、总用时"""
-        try:
-            stats = self.trainer.get_overall_stats(
-                user_id=self.current_user.get('id') if self.current_user else None
-            )
+        self.run_task(self.trainer.get_overall_stats,
+                      user_id=self.current_user.get('id') if self.current_user else None,
+                      key="stats", on_done=self._render_stats, error_title="统计失败",
+                      busy=(self.stats_refresh_btn,))
 
+    def _render_stats(self, stats):
+        try:
             total_reviews = stats.get("total_reviews", 0)
             category_stats = stats.get("category_stats", {})
             avg_rating = float(stats.get("avg_rating", 0) or 0)
@@ -665,10 +907,12 @@ class InterviewTrainerGUI:
             messagebox.showerror("统计失败", f"无法获取统计：{e}")
 
     def export_stats_json(self):
+        self.run_task(self.trainer.get_overall_stats,
+                      user_id=self.current_user.get('id') if self.current_user else None,
+                      key="export_stats", on_done=self._save_stats_json, error_title="导出失败")
+
+    def _save_stats_json(self, stats):
         try:
-            stats = self.trainer.get_overall_stats(
-                user_id=self.current_user.get('id') if self.current_user else None
-            )
             path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON 文件", "*.json")])
             if not path:
                 return
@@ -679,6 +923,73 @@ class InterviewTrainerGUI:
             logger.exception("导出统计失败")
             messagebox.showerror("导出失败", "导出统计失败，请查看日志")
 
+    # --------------------
+    # 诊断 Tab（数据库调用耗时、慢查询、连接池/缓存指标）
+    # --------------------
+    def setup_diagnostics_tab(self):
+        tab = self.tab_view.tab("诊断")
+
+        top = ctk.CTkFrame(tab)
+        top.pack(fill="x", padx=8, pady=8)
+        ctk.CTkButton(top, text="刷新", command=self.refresh_diagnostics, font=self.textbox_font).pack(
+            side="left", padx=6)
+        ctk.CTkButton(top, text="导出诊断 (JSON)", command=self.export_diagnostics_json,
+                      font=self.textbox_font).pack(side="left", padx=6)
+        ctk.CTkButton(top, text="清零", command=self.reset_diagnostics, font=self.textbox_font).pack(
+            side="left", padx=6)
+
+        self.diag_text = ctk.CTkTextbox(tab, font=self.textbox_font, wrap="none")
+        self.diag_text.pack(fill="both", expand=True, padx=8, pady=8)
+        self.diag_text.configure(state="disabled")
+        self.refresh_diagnostics()
+
+    def refresh_diagnostics(self, top_n=15, slow_n=20):
+        """显示耗时最多的方法/语句、最近的慢查询（统计在内存中，直接读取）"""
+        data = self.trainer.db.diagnostics()
+        lines = [f"统计起始：{data['since']}    慢查询阈值：{data['slow_ms']} ms", ""]
+
+        def table(title, entries, width):
+            lines.append(f"{title}（按总耗时，前 {top_n} 项）：")
+            lines.append(f"  {'次数':>7} {'平均ms':>8} {'p95ms':>9} {'最大ms':>8} {'行数':>8} {'KB':>9} {'出错':>4}  名称")
+            for e in entries[:top_n]:
+                lines.append(f"  {e['count']:>9} {e['avg_ms']:>10.2f} {e['p95_ms']:>9.1f} {e['max_ms']:>10.1f} "
+                             f"{e['rows']:>10} {e['bytes'] / 1024:>9.1f} {e['errors']:>6}  {e['name'][:width]}")
+            lines.append("")
+
+        table("方法", data['methods'], 60)
+        table("语句", data['statements'], 120)
+        pool, cache = data['pool'], data['cache']
+        lines.append(f"连接池：{pool.get('in_use', 0)}/{pool.get('max_size', 0)} 使用中，"
+                     f"平均借出 {pool.get('avg_checkout_ms', 0):.2f} ms，等待 {pool.get('waits', 0)} 次，"
+                     f"重试 {pool.get('retries', 0)} 次，超时 {pool.get('timeouts', 0)} 次")
+        lines.append(f"题目缓存：{cache['entries']} 条 {cache['bytes'] / 2 ** 20:.1f}/{cache['max_bytes'] / 2 ** 20:.0f} MB，"
+                     f"命中率 {cache['hit_rate']:.1%}，淘汰 {cache['evictions']}")
+        lines.append("")
+        lines.append(f"最近的慢查询/出错语句（最多 {slow_n} 条）：")
+        for e in reversed(data['slow_log'][-slow_n:]):
+            error = f"  [{e['error']}]" if 'error' in e else ""
+            lines.append(f"  {e['at']} {e['ms']:>9.1f} ms  {e['sql'][:120]}  参数：{e['args']}{error}")
+        self.diag_text.configure(state="normal")
+        self.diag_text.delete("1.0", "end")
+        self.diag_text.insert("end", "\n".join(lines))
+        self.diag_text.configure(state="disabled")
+
+    def export_diagnostics_json(self):
+        path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON 文件", "*.json")])
+        if not path:
+            return
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.trainer.db.diagnostics(), f, ensure_ascii=False, indent=2, default=str)
+            messagebox.showinfo("导出完成", f"诊断数据已导出到：{path}")
+        except Exception:
+            logger.exception("导出诊断数据失败")
+            messagebox.showerror("导出失败", "导出诊断数据失败，请查看日志")
+
+    def reset_diagnostics(self):
+        self.trainer.db.query_stats.reset()
+        self.refresh_diagnostics()
+
     # --------------------
     # 题库 Tab（搜索/导入/新增）
     # --------------------
@@ -692,8 +1003,13 @@ class InterviewTrainerGUI:
         top.pack(fill="x", padx=8, pady=8)
         # 搜索
         self.q_search_var = tk.StringVar()
-        ctk.CTkEntry(top, placeholder_text="按关键词搜索题目", font=self.textbox_font,
-                     textvariable=self.q_search_var).pack(side="left", padx=6, fill="x", expand=True)
+        self.q_search_job = None
+        self.q_search_key = ""
+        search_entry = ctk.CTkEntry(top, placeholder_text="按关键词搜索题目（题目/答案/分类）", font=self.textbox_font,
+                                    textvariable=self.q_search_var)
+        search_entry.pack(side="left", padx=6, fill="x", expand=True)
+        # 边输入边搜索
+        search_entry.bind("<KeyRelease>", self.schedule_search)
         ctk.CTkButton(top, text="搜索", command=self.search_questions, font=self.textbox_font).pack(side="left", padx=6)
         ctk.CTkButton(top, text="导入 CSV", command=self.import_csv_from_ui, font=self.textbox_font).pack(side="left",
                                                                                                           padx=6)
@@ -704,6 +1020,10 @@ class InterviewTrainerGUI:
         self.q_listbox = tk.Listbox(tab, font=self.textbox_font)
         self.q_listbox.pack(fill="both", expand=True, padx=8, pady=8)
         self.q_listbox.bind("<<ListboxSelect>>", self.on_question_select)
+        self.q_pager = PagedListbox(
+            self.q_listbox, self.fetch_question_page,
+            lambda r: f"#{r['id']} [{r.get('category') or '-'}] ({r.get('difficulty') or '-'}) L{r.get('level', 0)}: {r['question'][:80].replace('', '')}",
+            runner=self.tasks, on_error=lambda e: self._show_task_error("题库加载失败", e))
 
         # 详情显示
         self.q_detail = ctk.CTkTextbox(tab, height=8, font=self.textbox_font)
@@ -715,43 +1035,56 @@ class InterviewTrainerGUI:
         self.search_questions()
         self.update_question_count()
 
+    def schedule_search(self, event=None):
+        """输入停顿 200ms 后再搜索，避免每个按键都查询"""
+        if self.q_search_job:
+            self.app.after_cancel(self.q_search_job)
+        self.q_search_job = self.app.after(200, self.search_questions)
+
+    def fetch_question_page(self, cursor, limit):
+        """
+        题库列表翻页：无关键词时按 id 游标分页，
+        有关键词时按相关度排序，游标为已取条数
+        在后台线程执行，不读取 Tk 变量，关键词由 search_questions() 记下
+        """
+        key = self.q_search_key
+        if key:
+            offset = cursor or 0
+            rows = self.trainer.search_questions(key, limit=limit, offset=offset)
+            return rows, offset + len(rows)
+        rows = self.trainer.db.page_questions(after_id=cursor, limit=limit)
+        return rows, rows[-1]['id'] if rows else cursor
+
     def search_questions(self):
-        key = self.q_search_var.get().strip()
-        try:
-            cursor = self.trainer.db.conn.cursor(DictCursor)
-            if key:
-                sql = "SELECT id, question, category, difficulty, level FROM questions WHERE question LIKE %s LIMIT 200"
-                cursor.execute(sql, (f"%{key}%",))
-            else:
-                sql = "SELECT id, question, category, difficulty, level FROM questions ORDER BY id DESC LIMIT 200"
-                cursor.execute(sql)
-            rows = cursor.fetchall()
-            self.q_listbox.delete(0, "end")
-            self.q_cache = rows
-            for r in rows:
-                label = f"#{r['id']} [{r.get('category') or '-'}] ({r.get('difficulty') or '-'}) L{r.get('level', 0)}: {r['question'][:80].replace('', '')}"
-                self.q_listbox.insert("end", label)
-        except Exception:
-            logger.exception("题库搜索失败")
-            messagebox.showerror("题库错误", "搜索题库失败，请查看日志")
+        self.q_search_job = None
+        self.q_search_key = self.q_search_var.get().strip()
+        self.q_pager.reset()
 
     def update_question_count(self):
         """更新题目数量"""
-        try:
-            cursor = self.trainer.db.conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM questions")
-            cnt = cursor.fetchone()[0]
-            self.question_cnt_lbl.configure(text=f"当前共收录 {cnt} 道题")
-        except Exception as e:
-            logger.exception(f"题目数量获取失败：{e}")
+        def failed(exc):
+            logger.error(f"题目数量获取失败：{exc}", exc_info=exc)
             self.question_cnt_lbl.configure(text="题目数量获取失败")
 
+        self.tasks.submit(self.trainer.db.count_questions, key="question_count", on_error=failed,
+                          on_done=lambda cnt: self.question_cnt_lbl.configure(text=f"当前共收录 {cnt} 道题"))
+
     def on_question_select(self, event):
         sel = self.q_listbox.curselection()
         if not sel:
             return
-        idx = sel[0]
-        rec = self.q_cache[idx]
+        row = self.q_pager.row(sel[0])
+        if row is None:
+            return
+
+        def failed(exc):
+            logger.error(f"加载题目详情失败：{exc}", exc_info=exc)
+            self._show_question_detail(row)
+
+        self.tasks.submit(self.trainer.db.get_question, row['id'], key="question_detail", on_error=failed,
+                          on_done=lambda rec: self._show_question_detail(rec or row))
+
+    def _show_question_detail(self, rec):
         txt = f"Q#{rec['id']}\n分类：{rec.get('category')}\n难度：{rec.get('difficulty')}\n掌握度：{rec.get('level')}\n\n题目：\n{rec.get('question')}"
         self.q_detail.configure(state="normal")
         self.q_detail.delete("1.0", "end")
@@ -759,24 +1092,84 @@ class InterviewTrainerGUI:
         self.q_detail.configure(state="disabled")
 
     def import_csv_from_ui(self):
-        """通过文件对话框导入 CSV，调用 import_from_csv(file, mode='cli'|'web')"""
+        """通过文件对话框选择 CSV，在后台导入并显示进度，可取消，取消或中断后可从断点继续"""
+        if self.import_job is not None:
+            messagebox.showwarning("正在导入", "上一个导入尚未结束")
+            return
         path = filedialog.askopenfilename(title="选择 CSV 文件(.csv)", filetypes=[("CSV 文件", "*.csv")])
         if not path:
             return
-        # 弹出确认
-        if not messagebox.askyesno("确认导入", f"将导入文件：\n{path}\n导入过程中可能需要几秒钟，是否继续？"):
+        from data.import_questions import ImportJob
+        job = ImportJob(path, trainer=self.trainer, checkpoint_path=IMPORT_CHECKPOINT_PATH)
+        checkpoint = job.load_checkpoint()
+        if checkpoint:
+            # 是 -> 从断点继续，否 -> 从头导入（已导入的题目会按重复跳过），取消 -> 不导入
+            answer = messagebox.askyesnocancel(
+                "继续导入", f"该文件上次导入到第 {checkpoint['rows']} 行（已新增 {checkpoint['imported']}），是否从断点继续？")
+            if answer is None:
+                return
+            job.resume = answer
+        elif not messagebox.askyesno("确认导入", f"将导入文件：\n{path}\n导入在后台进行，可随时取消，是否继续？"):
             return
-        try:
-            result = import_from_csv(path, mode="web")
-            if 'error' in result:
-                messagebox.showerror("导入失败", f"导入发生错误：{result['error']}")
+        self.show_import_progress(job)
+
+    def show_import_progress(self, job):
+        """导入进度窗口：进度条 + 计数 + 取消按钮，定时轮询 job.progress（导入线程不直接操作界面）"""
+        dlg = ctk.CTkToplevel(self.app)
+        dlg.title("导入 CSV")
+        dlg.geometry("480x200")
+        dlg.transient(self.app)
+        ctk.CTkLabel(dlg, text=os.path.basename(job.file_path), font=self.textbox_font).pack(anchor="w", padx=12,
+                                                                                            pady=(12, 6))
+        bar = ctk.CTkProgressBar(dlg)
+        bar.set(0)
+        bar.pack(fill="x", padx=12, pady=6)
+        status = ctk.CTkLabel(dlg, text="准备中…", font=self.textbox_font, justify="left")
+        status.pack(anchor="w", padx=12, pady=6)
+
+        def cancel():
+            job.cancel()
+            cancel_btn.configure(state="disabled", text="正在取消…")
+
+        cancel_btn = ctk.CTkButton(dlg, text="取消导入", command=cancel, font=self.textbox_font)
+        cancel_btn.pack(pady=6)
+        # 关闭窗口等同于取消
+        dlg.protocol("WM_DELETE_WINDOW", cancel)
+
+        def poll():
+            if not dlg.winfo_exists():
+                return
+            p = job.progress
+            if p['total_bytes']:
+                bar.set(p['bytes_read'] / p['total_bytes'])
+            status.configure(text=f"已读取 {p['rows']} 行：新增 {p['imported']}，跳过 {p['skipped']}，失败 {p['failed']}\n"
+                                  f"速度 {p['rows_per_second']:.0f} 行/秒，已用时 {p['elapsed']:.0f} 秒")
+            dlg.after(200, poll)
+
+        def on_finished(result):
+            self.import_job = None
+            if dlg.winfo_exists():
+                dlg.destroy()
+            summary = f"新增 {result['imported']}，跳过 {result['skipped']}，失败 {result['failed']}"
+            if result['cancelled']:
+                messagebox.showinfo("导入已取消", f"已取消，已提交的批次保留：{summary}\n下次导入同一文件时可从断点继续")
             else:
-                messagebox.showinfo("导入完成",
-                                    f"导入完成：新增 {result.get('imported', 0)}，跳过 {result.get('skipped', 0)}，失败 {result.get('failed', 0)}")
+                messagebox.showinfo("导入完成", f"导入完成：{summary}")
+            # 导入期间登出时题库页已随主界面销毁（或重新登录后尚未打开），不再刷新
+            listbox = getattr(self, 'q_listbox', None)
+            if self.main_frame is not None and listbox is not None and listbox.winfo_exists():
                 self.refresh_question_list()
-        except Exception:
-            logger.exception("CSV 导入失败")
-            messagebox.showerror("导入失败", "CSV 导入失败，请查看日志")
+
+        def on_failed(exc):
+            self.import_job = None
+            if dlg.winfo_exists():
+                dlg.destroy()
+            self._show_task_error("CSV 导入失败", exc)
+
+        poll()
+        self.import_job = job
+        # 不设 key：登出时 cancel_all() 不丢弃导入结果，进度窗口照常关闭
+        self.tasks.submit(job.run, on_done=on_finished, on_error=on_failed)
 
     def add_question_dialog(self):
         """弹窗新增题目（同步写入 DB）"""
@@ -804,14 +1197,17 @@ class InterviewTrainerGUI:
             if not qtxt:
                 messagebox.showwarning("输入错误", "题目不能为空")
                 return
-            try:
-                self.trainer.add_question(qtxt, atxt, cat, diff)
+
+            def on_added(added):
+                if not added:
+                    messagebox.showwarning("添加失败", "题目已存在或添加失败")
+                    return
                 messagebox.showinfo("添加成功", "题目已添加")
                 dlg.destroy()
                 self.refresh_question_list()
-            except Exception:
-                logger.exception("新增题目失败")
-                messagebox.showerror("失败", "新增题目失败，请查看日志")
+
+            self.run_task(self.trainer.add_question, qtxt, atxt, cat, diff, on_done=on_added,
+                          error_title="新增题目失败", busy=(add_btn,))
 
         add_btn = ctk.CTkButton(frm, text="添加", command=do_add)
         add_btn.pack(pady=6)
@@ -835,7 +1231,9 @@ class InterviewTrainerGUI:
         ctk.CTkButton(frm, text="应用主题", command=self.apply_theme, font=self.textbox_font).pack(pady=6, anchor="w")
 
         # 备份导出
-        ctk.CTkButton(frm, text="导出题库备份（JSON）", command=self.backup_question_db, font=self.textbox_font).pack(
+        ctk.CTkButton(frm, text="备份数据库", command=self.backup_question_db, font=self.textbox_font).pack(
+            pady=6, anchor="w")
+        ctk.CTkButton(frm, text="从备份恢复", command=self.restore_question_db, font=self.textbox_font).pack(
             pady=6, anchor="w")
         ctk.CTkButton(frm, text="清除本地 Session", command=self.clear_saved_session, font=self.textbox_font).pack(
             pady=6, anchor="w")
@@ -855,22 +1253,32 @@ class InterviewTrainerGUI:
             messagebox.showerror("失败", "设置主题失败")
 
     def backup_question_db(self):
-        """把 questions 表导出为 JSON（简易备份）"""
-        path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON 文件", "*.json")])
-        if not path:
+        """把所有表流式导出到一个新目录（gzip 压缩的 NDJSON + 清单）"""
+        parent = filedialog.askdirectory(title="选择备份保存位置")
+        if not parent:
             return
-        try:
+        from src.backup import backup_database
+        path = os.path.join(parent, f"interview_trainer_backup_{datetime.now():%Y%m%d_%H%M%S}")
 
-            cursor = self.trainer.db.conn.cursor(DictCursor)
-            cursor.execute("SELECT * FROM questions")
-            rows = cursor.fetchall()
-            # rows 可能是 pymysql dict 类型，直接 json.dump 需转换
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(rows, f, ensure_ascii=False, default=str, indent=2)
-            messagebox.showinfo("备份完成", f"题库已导出到：{path}")
-        except Exception:
-            logger.exception("备份失败")
-            messagebox.showerror("备份失败", "备份失败，请查看日志")
+        def on_backed_up(manifest):
+            total = sum(t['rows'] for t in manifest['tables'])
+            messagebox.showinfo("备份完成", f"共 {total} 行，已备份到：{path}")
+
+        self.run_task(backup_database, self.trainer.db, path, key="backup", on_done=on_backed_up,
+                      error_title="备份失败")
+
+    def restore_question_db(self):
+        """从备份目录恢复，覆盖当前数据库"""
+        path = filedialog.askdirectory(title="选择备份目录")
+        if not path:
+            return
+        if not messagebox.askyesno("确认恢复", "恢复会清空当前题库、用户和答题记录，确定继续吗？"):
+            return
+        from src.backup import restore_database
+        self.run_task(restore_database, self.trainer.db, path, replace=True, key="restore",
+                      on_done=lambda restored: messagebox.showinfo(
+                          "恢复完成", f"共恢复 {sum(restored.values())} 行，请重新登录"),
+                      error_title="恢复失败")
 
     # --------------------
     # Session / Preferences / Persistence
@@ -898,22 +1306,24 @@ class InterviewTrainerGUI:
                     data = json.load(f)
                 username = data.get("username")
                 password = data.get("password")
-                if username and password:
-                    # 自动尝试登录
-                    user = self.trainer.db.verify_user(username, password)
-                    if user:
-                        self.current_user = user
-                        self.show_main_interface()
-                        self.load_user_preferences()
-                        self.load_next_question()
-                        logger.info(f"自动登录：{username}")
-                        return
-                # 如果失败，则仍然填充输入框
+                # 先填充输入框，自动登录失败时可以直接点登录
                 self.username_entry.delete(0, "end")
                 self.username_entry.insert(0, username or "")
                 self.password_entry.delete(0, "end")
                 self.password_entry.insert(0, password or "")
                 self.remember_var.set(True)
+                if username and password:
+                    # 自动尝试登录
+                    def on_verified(user):
+                        if user:
+                            self.current_user = user
+                            self.show_main_interface()
+                            self.load_user_preferences()
+                            self.load_next_question()
+                            logger.info(f"自动登录：{username}")
+
+                    self.run_task(self.trainer.verify_user, username, password, key="auth", on_done=on_verified,
+                                  error_title="自动登录失败")
         except Exception:
             logger.exception("加载 session 失败")
 
@@ -960,6 +1370,11 @@ class InterviewTrainerGUI:
     # --------------------
     def logout(self):
         self.current_user = None
+        # 丢弃上一个用户尚未返回的查询结果
+        self.tasks.cancel_all()
+        if self.import_job is not None:
+            # 在下一行处停止，已提交的批次保留，下次可从断点继续；结束后进度窗口照常关闭
+            self.import_job.cancel()
         # 停止计时
         self.stop_timer()
         # 重置会话统计
@@ -986,7 +1401,14 @@ class InterviewTrainerGUI:
             try:
                 # 停止计时
                 self.stop_timer()
-                if hasattr(self, 'trainer') and self.trainer:
+                if self.import_job is not None:
+                    # 已提交的批次保留，下次可从断点继续
+                    self.import_job.cancel()
+                # 先等后台任务结束再关闭连接池，避免导入等任务在关闭的连接池上失败、批次只写了一半
+                if not self.tasks.shutdown(timeout=SHUTDOWN_WAIT_SECONDS):
+                    logger.warning(f"后台任务 {SHUTDOWN_WAIT_SECONDS} 秒内未结束，不关闭数据库连接，随进程退出释放")
+                    self._db_closed = True  # 析构时也不再关闭
+                elif hasattr(self, 'trainer') and self.trainer:
                     self.trainer.close()
                     self._db_closed = True  # 设置标记避免重复
             except Exception as e:
@@ -999,6 +1421,8 @@ class InterviewTrainerGUI:
     # --------------------
     def run(self):
         """运行程序"""
+        # 主循环开始后的第一个空闲回调时窗口已完成首次绘制
+        self.app.after_idle(self._on_first_paint)
         self.app.mainloop()
 
     def __del__(self):
@@ -0,0 +1,95 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : async_database.py
+@Author  : admin1
+@Date    : 2026/10/18 00:20
+@Description : QuestionDB 的 asyncio 封装（有界线程池桥接，等待中的调用只占协程不占线程）
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from src.database import QuestionDB
+
+
+class AsyncQuestionDB:
+    """
+    QuestionDB 的异步版本
+    - 阻塞调用在固定大小的线程池中执行，线程数默认等于连接池大小，多出的调用在信号量上以协程形式排队
+    - 取消或超时只影响等待方：尚未开始的调用不会执行；已在线程中执行的调用无法中断，
+      运行完后结果丢弃，执行期间仍占用一个线程名额
+    """
+
+    def __init__(self, db=None, max_workers=None):
+        """
+        :param db: 使用已创建的 QuestionDB，为空时按配置创建
+        :param max_workers: 同时执行的数据库调用数，默认等于连接池大小
+        """
+        self.db = db or QuestionDB()
+        self.max_workers = max_workers or self.db.max_connections
+        self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="async-db")
+        self._slots = asyncio.Semaphore(self.max_workers)
+
+    async def run(self, fn, *args, **kwargs):
+        """在线程池中执行 fn(*args, **kwargs) 并等待结果"""
+        await self._slots.acquire()
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self._executor,
+                                                                functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._slots.release()
+            raise
+        # 线程结束时才归还名额，等待方被取消也不会让同时执行的调用超过 max_workers
+        future.add_done_callback(self._release)
+        return await asyncio.shield(future)
+
+    def _release(self, future):
+        self._slots.release()
+        if not future.cancelled():
+            future.exception()  # 等待方已取消时取走异常，避免“异常未被获取”的警告
+
+    async def get_question_fro_review(self, user_id=None):
+        return await self.run(self.db.get_question_fro_review, user_id=user_id)
+
+    async def save_review_record(self, question_id, user_answer, rating, user_id=None, duration_seconds=None):
+        return await self.run(self.db.save_review_record, question_id, user_answer, rating, user_id=user_id,
+                              duration_seconds=duration_seconds)
+
+    async def save_review_records(self, reviews):
+        return await self.run(self.db.save_review_records, reviews)
+
+    async def get_review_status(self, user_id=None):
+        return await self.run(self.db.get_review_status, user_id=user_id)
+
+    async def search_questions(self, query=None, filters=None, limit=50, offset=0):
+        return await self.run(self.db.search_questions, query, filters=filters, limit=limit, offset=offset)
+
+    async def is_question_exists(self, question):
+        return await self.run(self.db.is_question_exists, question)
+
+    async def get_question(self, question_id):
+        return await self.run(self.db.get_question, question_id)
+
+    async def page_questions(self, after_id=None, filters=None, limit=100):
+        return await self.run(self.db.page_questions, after_id=after_id, filters=filters, limit=limit)
+
+    async def verify_user(self, username, password_plain):
+        return await self.run(self.db.verify_user, username, password_plain)
+
+    async def create_user(self, username, password_plain):
+        return await self.run(self.db.create_user, username, password_plain)
+
+    async def add_question(self, question, answer="", category="", difficulty="中等"):
+        return await self.run(self.db.add_question, question, answer, category, difficulty)
+
+    async def add_questions_bulk(self, rows):
+        return await self.run(self.db.add_questions_bulk, rows)
+
+    async def shutdown(self):
+        """等待执行中的调用结束后关闭线程池（不关闭 QuestionDB）"""
+        await asyncio.get_running_loop().run_in_executor(None, functools.partial(self._executor.shutdown, wait=True))
+
+    async def close(self):
+        """关闭线程池和连接池"""
+        await self.shutdown()
+        self.db.close()
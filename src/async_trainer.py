@@ -0,0 +1,131 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : async_trainer.py
+@Author  : admin1
+@Date    : 2026/10/18 00:35
+@Description : InterviewTrainer 的 asyncio 版本（每用户并发上限、超时与取消）
+"""
+import asyncio
+import weakref
+
+from src.async_database import AsyncQuestionDB
+from src.trainer import InterviewTrainer
+
+DEFAULT_TIMEOUT = 30  # 单次调用（含排队）的默认超时（秒）
+DEFAULT_PER_USER_LIMIT = 2  # 同一用户同时执行的调用数
+
+
+class AsyncInterviewTrainer:
+    """
+    InterviewTrainer 的异步版本，供 asyncio 服务使用
+    - 数据库调用经 AsyncQuestionDB 的有界线程池执行，大量空闲或很慢的客户端只占协程
+    - 同一用户的调用最多同时执行 per_user_limit 个，超出的排队等待；不属于某个用户的调用（limit_key 为 None）
+      只受线程池总名额限制
+    - 每次调用（含排队时间）超过 timeout 抛出 TimeoutError；取消等待不会中断已在执行的数据库调用
+    - 必须在事件循环中使用，所有方法在同一个事件循环中调用
+    """
+
+    def __init__(self, trainer=None, max_workers=None, per_user_limit=DEFAULT_PER_USER_LIMIT,
+                 timeout=DEFAULT_TIMEOUT):
+        """
+        :param trainer: 使用已创建的 InterviewTrainer，为空时创建一个不记录会话的实例
+        :param max_workers: 同时执行的数据库调用数，默认等于连接池大小
+        :param timeout: 默认超时（秒），None 为不限
+        """
+        self.trainer = trainer or InterviewTrainer(track_session=False)
+        self.db = AsyncQuestionDB(self.trainer.db, max_workers=max_workers)
+        self.per_user_limit = per_user_limit
+        self.timeout = timeout
+        # 限流键 -> Semaphore；没有调用在使用时自动回收
+        self._user_slots = weakref.WeakValueDictionary()
+
+    def _user_slot(self, limit_key):
+        slot = self._user_slots.get(limit_key)
+        if slot is None:
+            slot = self._user_slots[limit_key] = asyncio.Semaphore(self.per_user_limit)
+        return slot
+
+    async def _call(self, limit_key, fn, /, *args, timeout=..., **kwargs):
+        """
+        按 limit_key（用户 id，登录/注册时为用户名）限流后在线程池中执行 fn，limit_key 为 None 时不做用户级限流
+        timeout 缺省时使用 self.timeout
+        """
+        timeout = self.timeout if timeout is ... else timeout
+
+        async def guarded():
+            if limit_key is None:
+                return await self.db.run(fn, *args, **kwargs)
+            slot = self._user_slot(limit_key)
+            async with slot:
+                return await self.db.run(fn, *args, **kwargs)
+
+        return await asyncio.wait_for(guarded(), timeout)
+
+    async def verify_user(self, username, password, timeout=...):
+        return await self._call(("login", username), self.trainer.verify_user, username, password, timeout=timeout)
+
+    async def create_user(self, username, password, timeout=...):
+        return await self._call(("login", username), self.trainer.create_user, username, password, timeout=timeout)
+
+    async def get_next_question(self, user_id=None, timeout=...):
+        """获取下一题；启用预取且已有预取题目时直接返回，不经过线程池"""
+        row = self.trainer.take_prefetched_question(user_id)
+        if row is not None:
+            return row
+        return await self._call(user_id, self.trainer.get_next_question, user_id, timeout=timeout)
+
+    async def submit_answer(self, question_id, user_answer, rating, user_id=None, duration_seconds=None,
+                            timeout=...):
+        return await self._call(user_id, self.trainer.submit_answer, question_id, user_answer, rating,
+                                user_id=user_id, duration_seconds=duration_seconds, timeout=timeout)
+
+    async def submit_answers(self, answers, user_id=None, timeout=...):
+        return await self._call(user_id, self.trainer.submit_answers, answers, timeout=timeout)
+
+    async def get_overall_stats(self, user_id=None, timeout=...):
+        return await self._call(user_id, self.trainer.get_overall_stats, user_id, timeout=timeout)
+
+    async def search_questions(self, query, filters=None, limit=50, offset=0, user_id=None, timeout=...):
+        return await self._call(user_id, self.trainer.search_questions, query, filters=filters, limit=limit,
+                                offset=offset, timeout=timeout)
+
+    async def question_exists(self, question, timeout=...):
+        return await self._call(None, self.trainer.question_exists, question, timeout=timeout)
+
+    async def add_question(self, question, answer='', category='', difficulty='中等', timeout=...):
+        return await self._call(None, self.trainer.add_question, question, answer, category, difficulty,
+                                timeout=timeout)
+
+    async def import_csv(self, file_path, progress_callback=None, timeout=None, user_id=None, **job_options):
+        """
+        导入 CSV（ImportJob），占用一个线程名额直到导入结束
+        按发起导入的用户（user_id，如管理员）单独限流：同一用户同时最多 per_user_limit 个导入，
+        不占该用户练习调用的名额；未指定 user_id 的导入共用一组名额
+        取消或超时时请求 ImportJob 停止：正在写入的批次整批提交或回滚，之后抛出 CancelledError/TimeoutError
+        :param progress_callback: progress_callback(progress)，在事件循环线程中调用
+        :param job_options: 传给 ImportJob 的其他参数（batch_size、checkpoint_path、resume 等）
+        """
+        from data.import_questions import ImportJob
+
+        loop = asyncio.get_running_loop()
+        callback = None
+        if progress_callback is not None:
+            def callback(progress):
+                loop.call_soon_threadsafe(progress_callback, progress)
+        job = ImportJob(file_path, trainer=self.trainer, progress_callback=callback, **job_options)
+        try:
+            return await self._call(("import", user_id), job.run, timeout=timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            job.cancel()
+            raise
+
+    async def close(self):
+        """等待执行中的调用结束后关闭（同时关闭 InterviewTrainer）"""
+        await self.db.shutdown()
+        self.trainer.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
@@ -0,0 +1,207 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : backup.py
+@Author  : admin1
+@Date    : 2026/10/17 18:50
+@Description : 数据库流式备份与恢复（每张表一个 gzip 压缩的 NDJSON 文件 + 清单）
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+from datetime import date, datetime
+
+from src.storage import SCHEMA_VERSION
+
+BACKUP_FORMAT = "interview_trainer-backup"
+MANIFEST_NAME = "manifest.json"
+
+# 按外键依赖排序：恢复时依次写入，清空时倒序删除
+BACKUP_TABLES = ("users", "questions", "user_question_state", "review_records", "review_daily_stats",
+                 "question_tombstones")
+
+
+class BackupError(Exception):
+    """备份文件缺失、损坏或与当前表结构不兼容"""
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat(" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def backup_database(db, path, chunk_rows=5000, compresslevel=1):
+    """
+    把所有表流式导出到目录 path
+    - 全部表在同一个只读快照中读取，备份期间仍可正常答题
+    - 服务端游标按 chunk_rows 行一批读取、编码、压缩写出，内存占用与表大小无关
+    - 每行是一个 JSON 数组，列名记录在清单中；清单最后写入，先写到 path.partial 再改名
+    :return: 清单 dict
+    """
+    if os.path.exists(path):
+        raise BackupError(f"备份目录已存在：{path}")
+    partial = path + ".partial"
+    backend = db.backend
+    manifest = {
+        "format": BACKUP_FORMAT,
+        "schema_version": SCHEMA_VERSION,
+        "backend": backend.name,
+        "created_at": datetime.now().isoformat(" ", "seconds"),
+        "tables": [],
+    }
+
+    def work(conn):
+        # pool.run 遇到临时性错误会换连接重试 work：每次尝试从空目录开始，表清单只在整次成功后使用
+        shutil.rmtree(partial, ignore_errors=True)
+        os.makedirs(partial)
+        tables = []
+        backend.begin_snapshot(conn)
+        try:
+            for table in BACKUP_TABLES:
+                tables.append(_dump_table(backend, conn, table, partial, chunk_rows, compresslevel))
+        finally:
+            conn.rollback()
+        return tables
+
+    try:
+        manifest["tables"] = db.pool.run(work)
+        with open(os.path.join(partial, MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(partial, path)
+    except Exception:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    return manifest
+
+
+def _dump_table(backend, conn, table, directory, chunk_rows, compresslevel):
+    file_name = f"{table}.ndjson.gz"
+    digest = hashlib.sha256()
+    rows = size = 0
+    cursor = backend.stream_cursor(conn)
+    try:
+        cursor.execute(f"SELECT * FROM {table}")
+        columns = [column[0] for column in cursor.description]
+        with gzip.open(os.path.join(directory, file_name), "wb", compresslevel=compresslevel) as f:
+            while True:
+                batch = cursor.fetchmany(chunk_rows)
+                if not batch:
+                    break
+                data = "".join(json.dumps(list(row), ensure_ascii=False, default=_json_default) + "\n"
+                               for row in batch).encode("utf-8")
+                digest.update(data)
+                f.write(data)
+                rows += len(batch)
+                size += len(data)
+    finally:
+        cursor.close()
+    return {"name": table, "file": file_name, "columns": columns, "rows": rows, "bytes": size,
+            "sha256": digest.hexdigest()}
+
+
+def read_manifest(path):
+    """读取并检查清单"""
+    try:
+        with open(os.path.join(path, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise BackupError(f"无法读取备份清单：{str(e)}")
+    if manifest.get("format") != BACKUP_FORMAT:
+        raise BackupError("不是题库备份目录")
+    if manifest.get("schema_version", 0) > SCHEMA_VERSION:
+        raise BackupError(f"备份的表结构版本 {manifest['schema_version']} 高于当前程序支持的 {SCHEMA_VERSION}")
+    return manifest
+
+
+def _iter_lines(path, entry, chunk_bytes=1 << 20):
+    """逐行读取一张表的数据文件，读完后核对行数和校验和"""
+    digest = hashlib.sha256()
+    rows = 0
+    try:
+        with gzip.open(os.path.join(path, entry["file"]), "rb") as f:
+            while True:
+                lines = f.readlines(chunk_bytes)
+                if not lines:
+                    break
+                for line in lines:
+                    digest.update(line)
+                rows += len(lines)
+                yield lines
+    except (OSError, EOFError) as e:
+        raise BackupError(f"{entry['file']} 读取失败：{str(e)}")
+    if rows != entry["rows"] or digest.hexdigest() != entry["sha256"]:
+        raise BackupError(f"{entry['file']} 校验失败，备份文件可能已损坏")
+
+
+def verify_backup(path):
+    """完整读一遍所有数据文件，核对行数与校验和，返回清单"""
+    manifest = read_manifest(path)
+    for entry in manifest["tables"]:
+        for _ in _iter_lines(path, entry):
+            pass
+    return manifest
+
+
+def restore_database(db, path, replace=False, batch_rows=20000, verify=True):
+    """
+    从备份目录恢复全部表（保留原 id）
+    - 默认先完整校验一遍备份，避免恢复到一半才发现文件损坏
+    - 目标库非空时需要 replace=True，会先清空所有表
+    - 按外键依赖顺序逐表写入，每 batch_rows 行一个事务，内存占用与表大小无关
+    :return: {表名: 恢复行数}
+    """
+    manifest = verify_backup(path) if verify else read_manifest(path)
+    entries = {entry["name"]: entry for entry in manifest["tables"]}
+    backend = db.backend
+
+    def clear(conn):
+        cursor = conn.cursor()
+        existing = 0
+        for table in BACKUP_TABLES:
+            cursor.execute(f"SELECT COUNT(*) FROM (SELECT 1 FROM {table} LIMIT 1) t")
+            existing += cursor.fetchone()[0]
+        if not existing:
+            return
+        if not replace:
+            raise BackupError("目标数据库不是空的，如需覆盖请使用 replace=True")
+        conn.begin()
+        for table in reversed(BACKUP_TABLES):
+            cursor.execute(f"DELETE FROM {table}")
+        conn.commit()
+
+    db.pool.run(clear)
+    restored = {}
+    for table in BACKUP_TABLES:
+        entry = entries.get(table)
+        if entry is None:  # 旧版本备份中没有的表
+            continue
+        columns = entry["columns"]
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        pending = []
+        for lines in _iter_lines(path, entry):
+            pending.extend(json.loads(line) for line in lines)
+            while len(pending) >= batch_rows:
+                _insert_batch(db, sql, pending[:batch_rows])
+                del pending[:batch_rows]
+        if pending:
+            _insert_batch(db, sql, pending)
+        restored[table] = entry["rows"]
+    db.invalidate_snapshot()
+    db.question_cache.clear()
+    db.reset_due_queues()
+    db.reset_search_index()
+    print(f"已从 {path} 恢复（{backend.name}）：" + "，".join(f"{t} {n} 行" for t, n in restored.items()))
+    return restored
+
+
+def _insert_batch(db, sql, rows):
+    def work(conn):
+        conn.begin()
+        conn.cursor().executemany(sql, rows)
+        conn.commit()
+
+    db.pool.run(work)
@@ -5,171 +5,632 @@
 @Date    : 2025/8/18 10:37
 @Description : 数据库初始化和数据操作
 """
-import pymysql
-from pymysql.cursors import DictCursor
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
 
-from config.db_config import DB_CONFIG
+from src.db_pool import ConnectionPool, PoolTimeoutError
+from src.due_queue import DueQueue
+from src.normalize import question_hash
+from src.query_stats import InstrumentedConnection, QueryStats, instrument_methods
+from src.question_cache import QuestionCache
+from src.search import SearchIndex
+from src.snapshot import QuestionSnapshot, SnapshotError, question_fingerprint, write_snapshot
 from src.scheduler import ReviewScheduler
+from src.storage import DictCursor, create_backend
 from werkzeug.security import generate_password_hash, check_password_hash
 
+# 汇总表主键列不能为 NULL，分类/难度为 NULL 时以该值存储，读取时还原
+ROLLUP_NULL = '\0'
 
+
+@instrument_methods(exclude=('is_transient_error', 'pool_metrics', 'cache_stats', 'diagnostics', 'iter_questions',
+                             'close'))
 class QuestionDB:
-    def __init__(self):
-        self.conn = None
+    def __init__(self, max_connections=5, backend=None, cache_bytes=32 << 20, slow_query_ms=200,
+                 max_user_queues=1000, user_queue_ttl=1800):
+        """
+        :param backend: 存储后端（src.storage.StorageBackend），为空时按 config/db_config.py 选择
+        :param cache_bytes: 题目行缓存的内存上限（字节）
+        :param slow_query_ms: 超过该耗时（毫秒）的语句记入慢查询日志
+        :param max_user_queues: 最多保留的用户复习队列数，超出时淘汰最久未使用的
+        :param user_queue_ttl: 用户复习队列空闲超过该秒数后淘汰；被淘汰的用户下次取题时重新加载
+        """
+        # 每个公开方法和每条语句的耗时统计，连接池借出的连接都经过计时代理
+        self.query_stats = QueryStats(slow_ms=slow_query_ms)
+        self.pool = None
+        self.backend = backend or create_backend()
+        self.max_connections = min(max_connections, self.backend.max_connections or max_connections)
         self.connect()
+        self.due_queue = DueQueue(self._fetch_due_batch, self._fetch_new_batch)
+        # 每个用户一个复习队列（user_id -> (DueQueue, 最近使用时间)，最近使用的在末尾），
+        # 常驻服务中按数量和空闲时间淘汰
+        self.max_user_queues = max_user_queues
+        self.user_queue_ttl = user_queue_ttl
+        self._user_queues = OrderedDict()
+        self._user_queues_lock = threading.Lock()
+        self.due_generation = 0  # 每次 reset_due_queues() 加一，预取的题目据此判断是否过期
+        # 进程内全文索引，首次搜索时在后台构建，构建完成前使用 MySQL 全文索引
+        self.search_index = SearchIndex()
+        self._search_build_thread = None
+        self._search_build_lock = threading.Lock()
+        # 题目行缓存：取题、题目详情、答题详情重复读取同一道题时不再访问数据库
+        self.question_cache = QuestionCache(cache_bytes)
+        # 题库二进制快照（open_snapshot 打开后分页/计数/索引构建改读快照）
+        self.snapshot = None
+        self._snapshot_generation = 0  # 每次停用快照加一，防止启用一个检查期间已过期的快照
 
     def connect(self):
-        """连接到数据库"""
+        """创建连接池并验证数据库可连接"""
         try:
-            self.conn = pymysql.connect(**DB_CONFIG)
-            print(f"数据库连接成功")
+            self.pool = ConnectionPool(
+                lambda: InstrumentedConnection(self.backend.connect(), self.query_stats),
+                max_size=self.max_connections,
+                ping=self.backend.ping,
+                is_transient=self.backend.is_transient
+            )
+            with self.pool.connection():
+                pass
+            print(f"数据库连接成功（{self.backend.name}）")
         except Exception as e:
             print(f"数据库连接失败 : {str(e)}")
             raise
+        if self.backend.auto_initialize:
+            self.initialize_database()
+
+    def is_transient_error(self, exc):
+        """异常是否为临时性错误（连不上数据库、等待连接超时等），稍后重试即可"""
+        return isinstance(exc, PoolTimeoutError) or self.backend.is_transient(exc)
+
+    def pool_metrics(self):
+        """连接池指标"""
+        return self.pool.metrics() if self.pool else {}
+
+    def cache_stats(self):
+        """题目行缓存指标"""
+        return self.question_cache.stats()
+
+    def diagnostics(self):
+        """诊断数据：方法/语句耗时统计、慢查询日志、连接池和缓存指标"""
+        data = self.query_stats.snapshot()
+        data['pool'] = self.pool_metrics()
+        data['cache'] = self.cache_stats()
+        return data
 
     def initialize_database(self):
         """初始化数据库"""
-        if not self.conn or not self.conn.open:
+        if not self.pool:
             print("数据库未连接，无法初始化")
             raise
         try:
-            cursor = self.conn.cursor()
-            # 执行初始化
-            # 1. 创建数据库
-            cursor.execute(
-                "CREATE DATABASE IF NOT EXISTS interview_trainer DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci"
-            )
-            # 2. 选择数据库
-            cursor.execute("USE interview_trainer")
-            # 3. 创建questions表
-            cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS questions (
-                        id INT AUTO_INCREMENT PRIMARY KEY,
-                        question TEXT NOT NULL,
-                        answer TEXT,
-                        category VARCHAR(100),
-                        difficulty ENUM('简单','中等','困难'),
-                        level TINYINT DEFAULT 0 COMMENT '掌握程度(0-5)',
-                        last_reviewed DATETIME,
-                        next_review DATETIME,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        INDEX idx_category (category),
-                        INDEX idx_difficulty (difficulty),
-                        INDEX idx_next_review (next_review)
-                    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-                    """)
-            # 4. 创建review_records表
-            cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS review_records (
-                        id INT AUTO_INCREMENT PRIMARY KEY,
-                        question_id INT NOT NULL,
-                        user_answer TEXT,
-                        rating TINYINT COMMENT '用户自评掌握程度(1-5)',
-                        reviewed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        user_id INT,
-                        FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE,
-                        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
-                    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-                    """)
-            # 5.创建user表
-            cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS users (
-                        id INT AUTO_INCREMENT PRIMARY KEY,
-                        username VARCHAR(150) NOT NULL UNIQUE,
-                        password_hash VARCHAR(255) NOT NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-                    """)
-
-            self.conn.commit()
+            self.pool.run(self.backend.create_schema)
+            self.migrate_question_hash()
+            self._ensure_review_rollup()
             print(f"数据库初始化完成")
         except Exception as e:
             print(f"数据库初始化失败：{str(e)}")
-            if self.conn:
-                self.conn.rollback()
             return False
 
+    def migrate_question_hash(self, batch_size=1000):
+        """为旧库补齐 question_hash 列及索引，并回填已有题目的哈希"""
+
+        def backfill(conn, after_id):
+            cursor = conn.cursor()
+            cursor.execute('''
+            SELECT id, question FROM questions
+            WHERE question_hash IS NULL AND id > %s
+            ORDER BY id
+            LIMIT %s
+            ''', (after_id, batch_size))
+            rows = cursor.fetchall()
+            if rows:
+                conn.begin()
+                # 重复题目保留最早的一条带哈希，其余保持 NULL（IGNORE 跳过唯一键冲突）
+                cursor.executemany(f"{self.backend.update_ignore} questions SET question_hash = %s WHERE id = %s",
+                                   [(question_hash(question), qid) for qid, question in rows])
+                conn.commit()
+            return rows[-1][0] if rows else None
+
+        self.pool.run(self.backend.upgrade_schema)
+        after_id = 0
+        while after_id is not None:
+            after_id = self.pool.run(lambda conn: backfill(conn, after_id))
+        duplicates = self._query_one("SELECT COUNT(*) AS cnt FROM questions WHERE question_hash IS NULL")['cnt']
+        if duplicates:
+            print(f"有 {duplicates} 道重复题目未写入哈希，请人工合并")
+
     def add_question(self, question, answer="", category="", difficulty="中等"):
-        """添加新题目"""
+        """添加新题目，题目已存在时返回 None"""
         valid_difficulties = ["简单", "中等", "困难"]
         if difficulty not in valid_difficulties:
             difficulty = "中等"  # 使用默认值
+
+        def work(conn):
+            cursor = conn.cursor()
+            # 依靠 uq_question_hash 原子地“不存在才插入”
+            cursor.execute(f'''
+            {self.backend.insert_ignore} INTO questions (question, answer, category, difficulty, question_hash)
+            VALUES (%s, %s, %s, %s, %s)
+            ''', (question, answer, category, difficulty, question_hash(question)))
+            return cursor.lastrowid if cursor.rowcount else None
+
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-            INSERT INTO questions (question, answer,category,difficulty)
-            VALUES (%s, %s, %s, %s)
-            ''', (question, answer, category, difficulty))
-            self.conn.commit()
-            return cursor.lastrowid
+            question_id = self.pool.run(work)
+            if question_id is None:
+                print(f"添加题目失败：题目已存在")
+                return None
+            self.invalidate_snapshot()
+            self.question_cache.invalidate((question_id,))
+            self._wake_due_queues()
+            if self.search_index.ready:
+                self.search_index.add(question_id, question, answer, category, difficulty)
+            return question_id
         except Exception as e:
             print(f"添加题目失败：{str(e)}")
-            self.conn.rollback()
             return None
 
-    def get_question_fro_review(self):
-        """获取复习的题目（基于间隔重复算法）"""
-        try:
-            cursor = self.conn.cursor(DictCursor)
-            # 优先选择待复习题目，其次选择新题
+    def add_questions_bulk(self, rows):
+        """
+        批量添加题目，整批在一个事务中提交
+        :param rows: [(question, answer, category, difficulty), ...]
+        :return: 实际插入条数（已存在的题目被跳过）；失败时整批回滚并抛出异常
+        """
+        valid_difficulties = ["简单", "中等", "困难"]
+        params = [
+            (question, answer, category, difficulty if difficulty in valid_difficulties else "中等",
+             question_hash(question))
+            for question, answer, category, difficulty in rows
+        ]
+        if not params:
+            return 0
+
+        def work(conn):
+            conn.begin()
+            cursor = conn.cursor()
+            # executemany 会把 INSERT ... VALUES 合并为多行 VALUES 一次发送
+            cursor.executemany(f'''
+            {self.backend.insert_ignore} INTO questions (question, answer, category, difficulty, question_hash)
+            VALUES (%s, %s, %s, %s, %s)
+            ''', params)
+            conn.commit()
+            return cursor.rowcount
+
+        inserted = self.pool.run(work)
+        if inserted:
+            self.invalidate_snapshot()
+            self._wake_due_queues()
+            if self.search_index.ready:
+                self._sync_search_index()
+        return inserted
+
+    def delete_question(self, question_id):
+        """删除题目并记录删除时间（离线副本据此同步删除），返回是否删除成功"""
+        def work(conn):
+            conn.begin()
+            cursor = conn.cursor()
+            # 该题答题记录随题目级联删除，先记下涉及的 (用户, 日期)，删除后在同一事务中重算这些日汇总
             cursor.execute('''
-            SELECT * FROM questions
-            WHERE next_review <= NOW() OR next_review IS NULL
-            ORDER BY next_review ASC, RAND()
-            LIMIT 1            
-            ''')
-            return cursor.fetchone()
+            SELECT DISTINCT COALESCE(user_id, 0), DATE(reviewed_at) FROM review_records WHERE question_id = %s
+            ''', (question_id,))
+            rollup_keys = [tuple(row) for row in cursor.fetchall()]
+            cursor.execute("DELETE FROM questions WHERE id = %s", (question_id,))
+            deleted = cursor.rowcount
+            if deleted:
+                self._rebuild_rollup_days(cursor, rollup_keys)
+                # 删除时间取数据库服务器时间，与 updated_at 一样作为同步水位
+                now = self.backend.now_sql
+                cursor.execute(f'''
+                INSERT INTO question_tombstones (question_id, deleted_at) VALUES (%s, {now})
+                {self.backend.on_conflict(('question_id',))} deleted_at = {now}
+                ''', (question_id,))
+            conn.commit()
+            return bool(deleted)
+
+        try:
+            deleted = self.pool.run(work)
+            if deleted:
+                self.invalidate_snapshot()
+                self.question_cache.invalidate((question_id,))
+                self.search_index.remove(question_id)
+                self.reset_due_queues()
+            return deleted
+        except Exception as e:
+            print(f"删除题目失败：{str(e)}")
+            return False
+
+    def get_question_hashes(self):
+        """已有题目的 question_hash 集合（只扫描唯一索引）"""
+        def work(conn):
+            cursor = conn.cursor()
+            cursor.execute("SELECT question_hash FROM questions WHERE question_hash IS NOT NULL")
+            return {row[0] for row in cursor.fetchall()}
+
+        return self.pool.run(work)
+
+    def get_question_fro_review(self, user_id=None):
+        """获取复习的题目（基于间隔重复算法），指定user_id时按该用户的复习状态选题"""
+        try:
+            # 优先选择待复习题目，其次选择新题；题目来自内存队列，不访问数据库
+            return self._get_due_queue(user_id).pop()
         except Exception as e:
             print(f"获取题目失败：{str(e)}")
             return None
 
+    def _get_due_queue(self, user_id=None):
+        """获取（必要时创建）用户的复习队列，user_id 为空时使用题目表上的公共状态"""
+        if user_id is None:
+            return self.due_queue
+        now = time.monotonic()
+        with self._user_queues_lock:
+            entry = self._user_queues.pop(user_id, None)
+            queue = entry[0] if entry else DueQueue(
+                lambda after, now, limit: self._fetch_user_due_batch(user_id, after, now, limit),
+                lambda after_id, limit: self._fetch_user_new_batch(user_id, after_id, limit)
+            )
+            self._user_queues[user_id] = (queue, now)
+            self._evict_user_queues(now)
+            return queue
+
+    def _existing_due_queue(self, user_id=None):
+        """已加载的复习队列，用户队列不存在（未取过题或已被淘汰）时返回 None，不新建"""
+        if user_id is None:
+            return self.due_queue
+        with self._user_queues_lock:
+            entry = self._user_queues.get(user_id)
+            return entry[0] if entry else None
+
+    def _evict_user_queues(self, now):
+        """淘汰空闲超时和超出数量上限的用户队列（调用方持有 _user_queues_lock），最久未使用的在最前"""
+        while self._user_queues:
+            last_used = next(iter(self._user_queues.values()))[1]
+            if len(self._user_queues) <= self.max_user_queues and now - last_used < self.user_queue_ttl:
+                break
+            self._user_queues.popitem(last=False)
+
+    def reset_due_queues(self):
+        """题目或复习状态被批量改动后清空所有复习队列，下次取题时重新加载"""
+        self.due_generation += 1
+        self.due_queue.clear()
+        with self._user_queues_lock:
+            queues = [queue for queue, _ in self._user_queues.values()]
+        for queue in queues:
+            queue.clear()
+
+    def _wake_due_queues(self):
+        """新增题目后解除各复习队列的“暂无可用题目”状态，新题下次取题时即可加载（已加载的内容保留）"""
+        self.due_queue.wake()
+        with self._user_queues_lock:
+            queues = [queue for queue, _ in self._user_queues.values()]
+        for queue in queues:
+            queue.wake()
+
+    def _query_all(self, sql, args=None):
+        """借出连接执行查询，返回全部行（dict 列表）"""
+        def work(conn):
+            cursor = conn.cursor(DictCursor)
+            cursor.execute(sql, args)
+            return list(cursor.fetchall())
+
+        return self.pool.run(work)
+
+    def _query_one(self, sql, args=None):
+        """借出连接执行查询，返回第一行（dict 或 None）"""
+        rows = self._query_all(sql, args)
+        return rows[0] if rows else None
+
+    def _get_question_rows(self, question_ids, chunk_size=500):
+        """按 id 读取题目整行（先查缓存，未命中的一次 IN 查询补齐），返回 {id: row}"""
+        rows, missing = self.question_cache.get_many(question_ids)
+        for start in range(0, len(missing), chunk_size):
+            chunk = missing[start:start + chunk_size]
+            generation = self.question_cache.generation
+            fetched = self._query_all(
+                f"SELECT * FROM questions WHERE id IN ({', '.join(['%s'] * len(chunk))})", tuple(chunk))
+            self.question_cache.put_many(fetched, generation)
+            rows.update((row['id'], row) for row in fetched)
+        return rows
+
+    def _with_question_rows(self, schedule_rows):
+        """
+        给只含 id 和复习状态列的查询结果补上题目内容（来自缓存），复习状态列以查询结果为准
+        查询后被删除的题目跳过
+        """
+        questions = self._get_question_rows([row['id'] for row in schedule_rows])
+        return [{**questions[row['id']], **row} for row in schedule_rows if row['id'] in questions]
+
+    def _fetch_due_batch(self, after, now, limit):
+        """按 idx_next_review 分批获取已到期题目（题目内容走缓存）"""
+        if after is None:
+            return self._with_question_rows(self._query_all('''
+            SELECT id, level, last_reviewed, next_review FROM questions
+            WHERE next_review <= %s
+            ORDER BY next_review ASC, id ASC
+            LIMIT %s
+            ''', (now, limit)))
+        last_review, last_id = after
+        return self._with_question_rows(self._query_all('''
+        SELECT id, level, last_reviewed, next_review FROM questions
+        WHERE next_review >= %s AND next_review <= %s
+          AND (next_review > %s OR id > %s)
+        ORDER BY next_review ASC, id ASC
+        LIMIT %s
+        ''', (last_review, now, last_review, last_id, limit)))
+
+    def _fetch_new_batch(self, after_id, limit):
+        """分批获取从未复习过的新题"""
+        return self._with_question_rows(self._query_all('''
+        SELECT id, level, last_reviewed, next_review FROM questions
+        WHERE next_review IS NULL AND id > %s
+        ORDER BY id ASC
+        LIMIT %s
+        ''', (after_id, limit)))
+
+    def _fetch_user_due_batch(self, user_id, after, now, limit):
+        """按 idx_user_next_review 分批获取该用户已到期的题目（只查复习状态，题目内容走缓存）"""
+        if after is None:
+            return self._with_question_rows(self._query_all('''
+            SELECT s.question_id AS id, s.level, s.last_reviewed, s.next_review
+            FROM user_question_state s
+            WHERE s.user_id = %s AND s.next_review <= %s
+            ORDER BY s.next_review ASC, s.question_id ASC
+            LIMIT %s
+            ''', (user_id, now, limit)))
+        last_review, last_id = after
+        return self._with_question_rows(self._query_all('''
+        SELECT s.question_id AS id, s.level, s.last_reviewed, s.next_review
+        FROM user_question_state s
+        WHERE s.user_id = %s AND s.next_review >= %s AND s.next_review <= %s
+          AND (s.next_review > %s OR s.question_id > %s)
+        ORDER BY s.next_review ASC, s.question_id ASC
+        LIMIT %s
+        ''', (user_id, last_review, now, last_review, last_id, limit)))
+
+    def _fetch_user_new_batch(self, user_id, after_id, limit):
+        """分批获取该用户从未复习过的题目"""
+        return self._with_question_rows(self._query_all('''
+        SELECT q.id, 0 AS level, NULL AS last_reviewed, NULL AS next_review
+        FROM questions q
+        WHERE q.id > %s
+          AND NOT EXISTS (
+              SELECT 1 FROM user_question_state s
+              WHERE s.user_id = %s AND s.question_id = q.id
+          )
+        ORDER BY q.id ASC
+        LIMIT %s
+        ''', (after_id, user_id, limit)))
+
     def save_review_record(self, question_id, user_answer, rating, user_id=None, duration_seconds=None):
         """保存答题记录并更新题目状态,可指定user_id"""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-            INSERT INTO review_records (question_id, user_answer, rating, user_id, duration_seconds)
-            VALUES (%s, %s, %s, %s, %s)
-            ''', (question_id, user_answer, rating, user_id, duration_seconds))
-            # 更新题目复习状态
-            self._update_question_level(question_id, rating)
-            self.conn.commit()
-            return cursor.lastrowid
+            record_ids = self.save_review_records([(question_id, user_answer, rating, user_id, duration_seconds)])
+            return record_ids[0]
         except Exception as e:
             print(f"保存记录失败：{str(e)}")
-            self.conn.rollback()
             return None
 
-    def _update_question_level(self, question_id, rating):
-        "根据自评分更新题目掌握情况和复习计划"
+    def save_review_records(self, reviews):
+        """
+        批量保存答题记录并更新复习状态，整批在一个事务中提交
+        :param reviews: [(question_id, user_answer, rating, user_id, duration_seconds[, reviewed_at[, client_key]]), ...]
+                        reviewed_at 为空时取当前时间；client_key 为幂等键，已写入过的记录跳过
+        :return: 答题记录 id 列表（跳过的记录为 None）；失败时整批回滚并抛出异常
+        """
+        if not reviews:
+            return []
+
+        def work(conn):
+            now = datetime.now()
+            conn.begin()
+            cursor = conn.cursor()
+            record_ids, schedules, saved = [], [], []
+            for review in reviews:
+                question_id, user_answer, rating, user_id, duration_seconds, reviewed_at, client_key = \
+                    (tuple(review) + (None, None))[:7]
+                reviewed_at = reviewed_at or now
+                insert = self.backend.insert_ignore if client_key else "INSERT"
+                cursor.execute(f'''
+                {insert} INTO review_records
+                    (question_id, user_answer, rating, reviewed_at, user_id, duration_seconds, client_key)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ''', (question_id, user_answer, rating, reviewed_at, user_id, duration_seconds, client_key))
+                if not cursor.rowcount:
+                    # 该幂等键已经写入过（重放的日志条目）
+                    record_ids.append(None)
+                    continue
+                record_ids.append(cursor.lastrowid)
+                schedule = self._apply_rating(cursor, question_id, rating, user_id, reviewed_at)
+                schedules.append((user_id or None, question_id, schedule))
+                saved.append((question_id, rating, user_id, duration_seconds, reviewed_at.date()))
+            if saved:
+                self._update_review_rollup(conn, self._rollup_rows(saved))
+            conn.commit()
+            return record_ids, schedules
+
+        record_ids, schedules = self.pool.run(work)
+        public = [question_id for user_id, question_id, _ in schedules if user_id is None]
+        if public:
+            # 未登录答题会改 questions 上的 level/next_review
+            self.invalidate_snapshot()
+            self.question_cache.invalidate(public)
+        for user_id, question_id, schedule in schedules:
+            queue = self._existing_due_queue(user_id) if schedule else None
+            if queue is not None:
+                # 没有已加载队列的用户下次取题时从数据库加载，自然包含这次的新状态
+                queue.reschedule(question_id, *schedule)
+        return record_ids
+
+    def _apply_rating(self, cursor, question_id, rating, user_id, reviewed_at):
+        """
+        按自评分更新复习状态：新级别和下次复习时间在一条 UPDATE 中由当前级别算出，
+        不需要先读后写，并发评分同一道题也不会丢失更新
+        登录用户更新各自的状态（首次作答时先插入 0 级状态行），否则更新题目表上的公共状态
+        :return: (level, last_reviewed, next_review)，题目不存在时返回 None
+        """
+        if user_id:
+            table, where, where_args = "user_question_state", "user_id = %s AND question_id = %s", (user_id, question_id)
+        else:
+            table, where, where_args = "questions", "id = %s", (question_id,)
+        level_sql = self._level_sql(rating)
+        # 间隔表以参数下推：每个级别对应的下次复习时间
+        review_times = ReviewScheduler.review_times(reviewed_at)
+        next_review_sql = "CASE " + level_sql + " " + "WHEN %s THEN %s " * len(review_times) + "ELSE NULL END"
+        next_review_args = tuple(arg for level, when in enumerate(review_times) for arg in (level, when))
+        # next_review 写在 level 之前：MySQL 按顺序赋值，这样两个表达式看到的都是更新前的级别
+        assignments = f"next_review = {next_review_sql}, last_reviewed = %s"
+
+        def update():
+            return self.backend.update_returning(cursor, table, assignments, 'level', level_sql, where,
+                                                 next_review_args + (reviewed_at,) + where_args)
+
+        new_level = update()
+        if new_level is None and user_id:
+            cursor.execute(f'''
+            {self.backend.insert_ignore} INTO user_question_state (user_id, question_id, level)
+            VALUES (%s, %s, 0)
+            ''', (user_id, question_id))
+            new_level = update()
+        if new_level is None:
+            return None
+        new_level = int(new_level)
+        return new_level, reviewed_at, review_times[new_level] if new_level < len(review_times) else None
+
+    @staticmethod
+    def _level_sql(rating, column='level'):
+        """ReviewScheduler.update_question_level 的 SQL 版本（rating 已知，只需按当前级别升降）"""
+        current = f"COALESCE({column}, 0)"
+        delta = ReviewScheduler.level_delta(rating)
+        if delta > 0:
+            return f"(CASE WHEN {current} >= {ReviewScheduler.max_level} THEN {ReviewScheduler.max_level} " \
+                   f"ELSE {current} + 1 END)"
+        if delta < 0:
+            return f"(CASE WHEN {current} <= 0 THEN 0 ELSE {current} - 1 END)"
+        return current
+
+    @staticmethod
+    def _rollup_rows(reviews):
+        """
+        把一批答题记录按 (用户, 日期, 题目) 合并为日汇总表的增量行
+        :param reviews: [(question_id, rating, user_id, duration_seconds, day), ...]
+        """
+        groups = {}
+        for question_id, rating, user_id, duration_seconds, day in reviews:
+            key = (user_id or 0, day, question_id)
+            group = groups.setdefault(key, [0, 0, 0, 0, 0, None, None])
+            group[0] += 1
+            if duration_seconds is not None:
+                group[1] += 1
+                group[2] += duration_seconds
+                group[5] = duration_seconds if group[5] is None else min(group[5], duration_seconds)
+                group[6] = duration_seconds if group[6] is None else max(group[6], duration_seconds)
+            if rating is not None:
+                group[3] += 1
+                group[4] += rating
+        return [(user_id, day, ROLLUP_NULL, ROLLUP_NULL, *group, question_id)
+                for (user_id, day, question_id), group in groups.items()]
+
+    def _update_review_rollup(self, conn, rows):
+        """在同一事务中把答题记录的增量累加到日汇总表"""
+        new = self.backend.excluded
+        cursor = conn.cursor()
+        cursor.executemany(f'''
+        INSERT INTO review_daily_stats
+            (user_id, day, category, difficulty, review_count, duration_count, total_seconds,
+             rating_count, rating_sum, min_seconds, max_seconds)
+        SELECT %s, %s, COALESCE(q.category, %s), COALESCE(q.difficulty, %s), %s, %s, %s, %s, %s, %s, %s
+        FROM questions q WHERE q.id = %s
+        {self.backend.on_conflict(('user_id', 'day', 'category', 'difficulty'))}
+            review_count = review_count + {new('review_count')},
+            duration_count = duration_count + {new('duration_count')},
+            total_seconds = total_seconds + {new('total_seconds')},
+            rating_count = rating_count + {new('rating_count')},
+            rating_sum = rating_sum + {new('rating_sum')},
+            min_seconds = CASE WHEN min_seconds IS NULL OR {new('min_seconds')} < min_seconds
+                               THEN COALESCE({new('min_seconds')}, min_seconds) ELSE min_seconds END,
+            max_seconds = CASE WHEN max_seconds IS NULL OR {new('max_seconds')} > max_seconds
+                               THEN COALESCE({new('max_seconds')}, max_seconds) ELSE max_seconds END
+        ''', rows)
+
+    def rebuild_review_rollup(self, user_id=None):
+        """根据 review_records 全量重建日汇总表（指定 user_id 时只重建该用户）"""
+        user_filter = "WHERE COALESCE(r.user_id, 0) = %s" if user_id is not None else ""
+        args = (user_id,) if user_id is not None else ()
+
+        def work(conn):
+            conn.begin()
+            cursor = conn.cursor()
+            if user_id is not None:
+                cursor.execute("DELETE FROM review_daily_stats WHERE user_id = %s", args)
+            else:
+                cursor.execute("DELETE FROM review_daily_stats")
+            cursor.execute(self._rollup_insert_sql(user_filter), self._rollup_insert_args(args))
+            conn.commit()
+            return cursor.rowcount
+
+        return self.pool.run(work)
+
+    @staticmethod
+    def _rollup_insert_sql(where):
+        """从 review_records 按 (用户, 日期, 分类, 难度) 汇总写入日汇总表的语句，where 为筛选答题记录的条件"""
+        return f'''
+        INSERT INTO review_daily_stats
+            (user_id, day, category, difficulty, review_count, duration_count, total_seconds,
+             rating_count, rating_sum, min_seconds, max_seconds)
+        SELECT COALESCE(r.user_id, 0), DATE(r.reviewed_at),
+               COALESCE(q.category, %s), COALESCE(q.difficulty, %s),
+               COUNT(*), COUNT(r.duration_seconds), COALESCE(SUM(r.duration_seconds), 0),
+               COUNT(r.rating), COALESCE(SUM(r.rating), 0),
+               MIN(r.duration_seconds), MAX(r.duration_seconds)
+        FROM review_records r
+        JOIN questions q ON r.question_id = q.id
+        {where}
+        GROUP BY COALESCE(r.user_id, 0), DATE(r.reviewed_at),
+                 COALESCE(q.category, %s), COALESCE(q.difficulty, %s)
+        '''
+
+    @staticmethod
+    def _rollup_insert_args(args):
+        return (ROLLUP_NULL, ROLLUP_NULL) + tuple(args) + (ROLLUP_NULL, ROLLUP_NULL)
+
+    def _rebuild_rollup_days(self, cursor, keys):
+        """
+        在当前事务中按剩余的答题记录重建指定 (user_id, day) 的汇总行（user_id 为 0 表示未登录用户）
+        最小/最大用时无法做减法，删除答题记录后只能重算受影响的日期
+        """
+        for user_id, day in keys:
+            day = day if isinstance(day, date) else date.fromisoformat(str(day))
+            start = datetime.combine(day, datetime.min.time())
+            end = start + timedelta(days=1)
+            cursor.execute("DELETE FROM review_daily_stats WHERE user_id = %s AND day = %s", (user_id, day))
+            user_clause = "r.user_id = %s" if user_id else "r.user_id IS NULL"
+            cursor.execute(
+                self._rollup_insert_sql(f"WHERE {user_clause} AND r.reviewed_at >= %s AND r.reviewed_at < %s"),
+                self._rollup_insert_args(((user_id,) if user_id else ()) + (start, end)))
+
+    def _ensure_review_rollup(self):
+        """汇总表为空而已有答题记录时（旧库升级），从历史记录回填"""
+        rollup = self._query_one("SELECT 1 AS found FROM review_daily_stats LIMIT 1")
+        records = self._query_one("SELECT 1 AS found FROM review_records LIMIT 1")
+        if rollup is None and records is not None:
+            print("正在从历史答题记录回填统计汇总表...")
+            self.rebuild_review_rollup()
+
+    def get_review_status(self, user_id=None, use_rollup=True):
+        """获取复习统计数据；use_rollup=False 时直接扫描答题记录（用于核对汇总表）"""
         try:
-            cursor = self.conn.cursor(DictCursor)
-            # 获取当前题目状态
-            cursor.execute('''
-            SELECT level FROM questions WHERE id = %s
-            ''', (question_id,))
-            question = cursor.fetchone()
-            if not question:
-                return
-            current_level = question['level']
-            new_level = ReviewScheduler.update_question_level(current_level, rating)
-            next_level = ReviewScheduler.calculate_next_review(new_level)
-            # 更新题目
-            cursor.execute('''
-            UPDATE questions
-            SET level = %s, last_reviewed = NOW(), next_review = %s
-            WHERE id = %s
-            ''', (new_level, next_level, question_id))
+            return self.pool.run(lambda conn: self._collect_review_status(conn, user_id, use_rollup))
         except Exception as e:
-            print(f"更新题目状态失败：{str(e)}")
-            raise
+            print(f"获取统计信息失败：{str(e)}")
+            return {}
 
-    def get_review_status(self, user_id=None):
-        """获取复习统计数据"""
-        try:
-            cursor = self.conn.cursor(DictCursor)
+    def _collect_review_status(self, conn, user_id, use_rollup=True):
+        """在一条连接上汇总统计数据"""
+        cursor = conn.cursor(DictCursor)
 
-            # 各级别题目数量
+        # 各级别题目数量
+        if user_id:
+            level_status = self._get_user_level_status(cursor, user_id)
+        else:
             cursor.execute('''
             SELECT level, COUNT(*) as count
             FROM questions
@@ -177,151 +638,122 @@ class QuestionDB:
             ''')
             level_status = {row['level']: row['count'] for row in cursor.fetchall()}
 
-            if user_id:
-                # 今日复习数
-                cursor.execute('''
-                    SELECT COUNT(*) as count
-                    FROM review_records
-                    WHERE DATE(reviewed_at) = CURDATE() AND user_id = %s
-                ''', (user_id,))
-                today_count = cursor.fetchone()['count']
-
-                # 总答题数
-                cursor.execute('''
-                    SELECT COUNT(*) as cnt FROM review_records WHERE user_id = %s
-                ''', (user_id,))
-                total_reviews = cursor.fetchone()['cnt']
-
-                # 总用时 & 平均用时
-                cursor.execute('''
-                    SELECT COALESCE(SUM(duration_seconds), 0) as total_seconds,
-                           COALESCE(AVG(duration_seconds), 0) as avg_seconds
-                    FROM review_records
-                    WHERE user_id = %s
-                ''', (user_id,))
-                row = cursor.fetchone()
-                total_seconds_all = row['total_seconds']
-                avg_seconds = row['avg_seconds']
-
-                # 平均评分
-                cursor.execute('''
-                    SELECT COALESCE(AVG(rating), 0) as avg_rating
-                    FROM review_records
-                    WHERE user_id = %s
-                ''', (user_id,))
-                avg_rating = cursor.fetchone()['avg_rating']
-
-                # 分类统计
-                cursor.execute('''
-                 SELECT q.category, COUNT(*) as cnt, COALESCE(SUM(r.duration_seconds), 0) as total_sec,
-                        COALESCE(AVG(r.duration_seconds),0) as avg_sec
-                 FROM review_records r
-                 JOIN questions q ON r.question_id = q.id 
-                 WHERE r.user_id = %s
-                 GROUP BY q.category
-                ''', (user_id,))
-                category_rows = cursor.fetchall()
-                category_stats = {
-                    row['category']: {
-                        'count': row['cnt'],
-                        'total_seconds': row['total_sec'],
-                        'avg_seconds': row['avg_sec']
-                    } for row in category_rows
-                }
+        if use_rollup:
+            review_stats = self._review_stats_from_rollup(cursor, user_id)
+        else:
+            review_stats = self._review_stats_from_records(cursor, user_id)
+        return {'level_stats': level_status, **review_stats}
 
-                # 难度统计
-                cursor.execute('''
-                 SELECT q.difficulty, COUNT(*) as cnt, COALESCE(SUM(r.duration_seconds),0) as total_sec, 
-                        COALESCE(AVG(r.duration_seconds),0) as avg_sec
-                 FROM review_records r
-                 JOIN questions q ON r.question_id = q.id
-                 WHERE r.user_id = %s
-                 GROUP BY q.difficulty
-                ''', (user_id,))
-                difficulty_rows = cursor.fetchall()
-                difficulty_stats = {
-                    row['difficulty']: {
-                        'count': row['cnt'],
-                        'total_seconds': row['total_sec'],
-                        'avg_seconds': row['avg_sec']
-                    } for row in difficulty_rows
-                }
+    @staticmethod
+    def _review_stats_from_rollup(cursor, user_id):
+        """从日汇总表一次查询得到答题统计"""
+        user_filter = "WHERE user_id = %s" if user_id else ""
+        cursor.execute(f'''
+        SELECT category, difficulty,
+               SUM(review_count) AS cnt,
+               SUM(CASE WHEN day = %s THEN review_count ELSE 0 END) AS today_cnt,
+               SUM(duration_count) AS duration_cnt,
+               SUM(total_seconds) AS total_sec,
+               SUM(rating_count) AS rating_cnt,
+               SUM(rating_sum) AS rating_sum
+        FROM review_daily_stats
+        {user_filter}
+        GROUP BY category, difficulty
+        ''', (datetime.now().date(),) + ((user_id,) if user_id else ()))
+        return QuestionDB._fold_review_groups(cursor.fetchall(), user_id)
 
-                return {
-                    'level_stats': level_status,
-                    'today_reviews': today_count,
-                    'total_reviews': total_reviews,
-                    'total_seconds_all': total_seconds_all,
-                    'avg_seconds': avg_seconds,
-                    'avg_rating': avg_rating,
-                    'category_stats': category_stats,
-                    'difficulty_stats': difficulty_stats
-                }
+    @staticmethod
+    def _review_stats_from_records(cursor, user_id):
+        """直接扫描 review_records 计算答题统计：一次按 (分类, 难度) 分组的查询，总数在内存中合计"""
+        user_filter = "WHERE r.user_id = %s" if user_id else ""
+        # 今日条件使用半开时间区间，不对 reviewed_at 套函数；按用户过滤走覆盖索引 idx_user_reviewed
+        today = datetime.combine(datetime.now().date(), datetime.min.time())
+        cursor.execute(f'''
+        SELECT q.category, q.difficulty,
+               COUNT(*) AS cnt,
+               COALESCE(SUM(r.reviewed_at >= %s AND r.reviewed_at < %s), 0) AS today_cnt,
+               COUNT(r.duration_seconds) AS duration_cnt,
+               COALESCE(SUM(r.duration_seconds), 0) AS total_sec,
+               COUNT(r.rating) AS rating_cnt,
+               COALESCE(SUM(r.rating), 0) AS rating_sum
+        FROM review_records r
+        JOIN questions q ON r.question_id = q.id
+        {user_filter}
+        GROUP BY q.category, q.difficulty
+        ''', (today, today + timedelta(days=1)) + ((user_id,) if user_id else ()))
+        return QuestionDB._fold_review_groups(cursor.fetchall(), user_id)
 
-            else:
-                # 全部用户的统计（可以按需精简）
-                cursor.execute('''
-                    SELECT COUNT(*) as count
-                    FROM review_records
-                    WHERE DATE(reviewed_at) = CURDATE()
-                ''')
-                today_count = cursor.fetchone()['count']
-
-                cursor.execute('''
-                    SELECT COUNT(*) as cnt,
-                           COALESCE(SUM(duration_seconds),0) as total_seconds,
-                           COALESCE(AVG(duration_seconds),0) as avg_seconds,
-                           COALESCE(AVG(rating),0) as avg_rating
-                    FROM review_records
-                ''')
-                row = cursor.fetchone()
-                total_reviews = row['cnt']
-                total_seconds_all = row['total_seconds']
-                avg_seconds = row['avg_seconds']
-                avg_rating = row['avg_rating']
-
-                cursor.execute('''
-                    SELECT q.category, COUNT(*) as count
-                    FROM review_records r
-                    JOIN questions q ON r.question_id = q.id
-                    GROUP BY q.category
-                ''')
-                category_stats = {row['category']: row['count'] for row in cursor.fetchall()}
-
-                cursor.execute('''
-                    SELECT q.difficulty, COUNT(*) as count
-                    FROM review_records r
-                    JOIN questions q ON r.question_id = q.id
-                    GROUP BY q.difficulty
-                ''')
-                difficulty_stats = {row['difficulty']: row['count'] for row in cursor.fetchall()}
+    @staticmethod
+    def _fold_review_groups(rows, user_id):
+        """把按 (分类, 难度) 分组的合计行折算为总数、平均值及分类/难度统计"""
+        def bucket():
+            return {'count': 0, 'total_seconds': 0, 'duration_count': 0}
 
-                return {
-                    'level_stats': level_status,
-                    'today_reviews': today_count,
-                    'total_reviews': total_reviews,
-                    'total_seconds_all': total_seconds_all,
-                    'avg_seconds': avg_seconds,
-                    'avg_rating': avg_rating,
-                    'category_stats': category_stats,
-                    'difficulty_stats': difficulty_stats
-                }
+        totals = {'count': 0, 'today': 0, 'total_seconds': 0, 'duration_count': 0, 'rating_count': 0,
+                  'rating_sum': 0}
+        by_category, by_difficulty = {}, {}
+        for row in rows:
+            category = None if row['category'] == ROLLUP_NULL else row['category']
+            difficulty = None if row['difficulty'] == ROLLUP_NULL else row['difficulty']
+            totals['count'] += int(row['cnt'])
+            totals['today'] += int(row['today_cnt'])
+            totals['total_seconds'] += int(row['total_sec'])
+            totals['duration_count'] += int(row['duration_cnt'])
+            totals['rating_count'] += int(row['rating_cnt'])
+            totals['rating_sum'] += int(row['rating_sum'])
+            for key, groups in ((category, by_category), (difficulty, by_difficulty)):
+                group = groups.setdefault(key, bucket())
+                group['count'] += int(row['cnt'])
+                group['total_seconds'] += int(row['total_sec'])
+                group['duration_count'] += int(row['duration_cnt'])
 
-        except Exception as e:
-            print(f"获取统计信息失败：{str(e)}")
-            return {}
+        def average(total, count):
+            return total / count if count else 0
+
+        def breakdown(groups):
+            if not user_id:
+                return {key: group['count'] for key, group in groups.items()}
+            return {
+                key: {
+                    'count': group['count'],
+                    'total_seconds': group['total_seconds'],
+                    'avg_seconds': average(group['total_seconds'], group['duration_count'])
+                } for key, group in groups.items()
+            }
+
+        return {
+            'today_reviews': totals['today'],
+            'total_reviews': totals['count'],
+            'total_seconds_all': totals['total_seconds'],
+            'avg_seconds': average(totals['total_seconds'], totals['duration_count']),
+            'avg_rating': average(totals['rating_sum'], totals['rating_count']),
+            'category_stats': breakdown(by_category),
+            'difficulty_stats': breakdown(by_difficulty)
+        }
+
+    @staticmethod
+    def _get_user_level_status(cursor, user_id):
+        """用户各级别题目数量，未复习过的题目计入 0 级"""
+        cursor.execute('''
+        SELECT level, COUNT(*) as count
+        FROM user_question_state
+        WHERE user_id = %s
+        GROUP BY level
+        ''', (user_id,))
+        level_status = {row['level']: row['count'] for row in cursor.fetchall()}
+        cursor.execute("SELECT COUNT(*) as count FROM questions")
+        unseen = cursor.fetchone()['count'] - sum(level_status.values())
+        if unseen > 0:
+            level_status[0] = level_status.get(0, 0) + unseen
+        return level_status
 
     def is_question_exists(self, question):
         try:
-            cursor = self.conn.cursor(DictCursor)
-            cursor.execute('''
-            SELECT COUNT(*) AS cnt
-            FROM questions 
-            WHERE TRIM(LOWER(question)) = TRIM(LOWER(%s))
-            ''', (question,))
-            row = cursor.fetchone()
-            cnt = row['cnt'] if row else 0
-            return cnt > 0
+            # 按归一化哈希走唯一索引查找
+            row = self._query_one('''
+            SELECT 1 AS found FROM questions WHERE question_hash = %s LIMIT 1
+            ''', (question_hash(question),))
+            return row is not None
 
         except Exception as e:
             # print(f"检查重复问题存在失败：{str(e)}")
@@ -333,28 +765,28 @@ class QuestionDB:
             if self.get_user_by_name(username):
                 return None
             pwd_hash = generate_password_hash(password_plain)
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                INSERT INTO users (username, password_hash)
-                VALUES (%s, %s)
-            """, (username, pwd_hash))
-            self.conn.commit()
-            return cursor.lastrowid
+
+            def work(conn):
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO users (username, password_hash)
+                    VALUES (%s, %s)
+                """, (username, pwd_hash))
+                return cursor.lastrowid
+
+            return self.pool.run(work)
         except Exception as e:
             print(f"用户创建失败：{str(e)}")
-            self.conn.rollback()
             return None
 
     def get_user_by_name(self, username):
         """按用户名查 user（返回 dict 或 None）"""
         try:
-            cursor = self.conn.cursor(DictCursor)
-            cursor.execute("""
+            return self._query_one("""
                 SELECT id, username, password_hash, created_at 
                 FROM users
                 WHERE username = %s
             """,(username,))
-            return cursor.fetchone()
         except Exception as e:
             print(f"查询用户失败：{str(e)}")
             return None
@@ -376,6 +808,275 @@ class QuestionDB:
             print(f"验证用户失败：{str(e)}")
             return None
 
+    def page_reviews(self, user_id=None, before=None, limit=100):
+        """
+        答题记录分页（按 reviewed_at、id 倒序的游标分页，不取答案等大字段）
+        :param before: 上一页最后一行的 (reviewed_at, id)，None 表示第一页
+        :return: 本页记录，详情用 get_review_detail 获取
+        """
+        conditions, args = [], ()
+        if user_id:
+            conditions.append("r.user_id = %s")
+            args += (user_id,)
+        if before is not None:
+            reviewed_at, review_id = before
+            conditions.append("(r.reviewed_at < %s OR (r.reviewed_at = %s AND r.id < %s))")
+            args += (reviewed_at, reviewed_at, review_id)
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        try:
+            return self._query_all(f"""
+                SELECT r.id, r.question_id, r.rating, r.reviewed_at
+                FROM review_records r
+                {where}
+                ORDER BY r.reviewed_at DESC, r.id DESC
+                LIMIT %s
+            """, args + (limit,))
+        except Exception as e:
+            print(f"查询答题记录失败：{str(e)}")
+            raise
+
+    def get_review_detail(self, review_id):
+        """单条答题记录详情（含题目与参考答案，题目走缓存）"""
+        try:
+            record = self._query_one("""
+                SELECT id, question_id, user_answer, rating, duration_seconds, reviewed_at
+                FROM review_records
+                WHERE id = %s
+            """, (review_id,))
+            question = self._get_question_rows([record['question_id']]).get(record['question_id']) if record else None
+            if question is None:
+                return None
+            record['question_text'] = question['question']
+            record['answer_text'] = question['answer']
+            return record
+        except Exception as e:
+            print(f"查询答题记录失败：{str(e)}")
+            raise
+
+    def page_questions(self, after_id=None, filters=None, limit=100):
+        """
+        题库分页（按 id 倒序的游标分页，题目只取前 120 个字符）
+        :param after_id: 上一页最后一行的 id，None 表示第一页
+        """
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return snapshot.page(after_id, filters, limit)
+        where, args = self._filter_clause({k: v for k, v in (filters or {}).items() if v})
+        if after_id is not None:
+            where = f"{where} AND id < %s" if where else "WHERE id < %s"
+            args += (after_id,)
+        try:
+            return self._query_all(f"""
+                SELECT id, SUBSTR(question, 1, 120) AS question, category, difficulty, level
+                FROM questions
+                {where}
+                ORDER BY id DESC
+                LIMIT %s
+            """, args + (limit,))
+        except Exception as e:
+            print(f"查询题库失败：{str(e)}")
+            raise
+
+    def iter_questions(self, batch_size=1000):
+        """
+        按 id 顺序逐批读取完整题目（生成器，用于流式导出）
+        每批单独借还连接，消费方中途停止或很慢时也不会长期占用连接
+        """
+        after_id = 0
+        while True:
+            rows = self._query_all('''
+            SELECT id, question, answer, category, difficulty, created_at
+            FROM questions
+            WHERE id > %s
+            ORDER BY id
+            LIMIT %s
+            ''', (after_id, batch_size))
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1]['id']
+
+    def get_question(self, question_id):
+        """单道题目详情（走缓存）"""
+        try:
+            return self._get_question_rows([question_id]).get(question_id)
+        except Exception as e:
+            print(f"查询题目失败：{str(e)}")
+            raise
+
+    def search_questions(self, query=None, filters=None, limit=50, offset=0):
+        """
+        题库搜索（题目/答案/分类全文检索，按相关度排序）
+        :param filters: {'category': ..., 'difficulty': ...}
+        :return: 题目行列表（不含答案），检索结果带 score
+        """
+        query = (query or "").strip()
+        filters = {k: v for k, v in (filters or {}).items() if v}
+        try:
+            if not query:
+                where, args = self._filter_clause(filters)
+                return self._query_all(
+                    f"SELECT id, question, category, difficulty, level FROM questions {where} "
+                    f"ORDER BY id DESC LIMIT %s OFFSET %s", args + (limit, offset))
+            self._ensure_search_index()
+            if self.search_index.ready:
+                hits, _ = self.search_index.search(query, filters, limit, offset)
+                return self._fetch_search_hits(hits)
+            if self.backend.supports_fulltext:
+                return self._fulltext_search(query, filters, limit, offset)
+            return self._like_search(query, filters, limit, offset)
+        except Exception as e:
+            print(f"查询题库失败：{str(e)}")
+            raise
+
+    @staticmethod
+    def _filter_clause(filters, prefix="WHERE"):
+        """把分类/难度过滤条件拼成 SQL 片段"""
+        conditions, args = [], ()
+        for column in ('category', 'difficulty'):
+            if column in filters:
+                conditions.append(f"{column} = %s")
+                args += (filters[column],)
+        if not conditions:
+            return "", ()
+        return f"{prefix} " + " AND ".join(conditions), args
+
+    def _fetch_search_hits(self, hits):
+        """按检索得分顺序取回命中题目"""
+        if not hits:
+            return []
+        snapshot = self.snapshot
+        if snapshot is not None:
+            by_id = snapshot.rows_by_ids(doc_id for doc_id, _ in hits)
+        else:
+            placeholders = ", ".join(["%s"] * len(hits))
+            rows = self._query_all(
+                f"SELECT id, question, category, difficulty, level FROM questions WHERE id IN ({placeholders})",
+                tuple(doc_id for doc_id, _ in hits))
+            by_id = {row['id']: row for row in rows}
+        results = []
+        for doc_id, score in hits:
+            row = by_id.get(doc_id)
+            if row is not None:
+                row['score'] = score
+                results.append(row)
+        return results
+
+    def _fulltext_search(self, query, filters, limit, offset):
+        """使用 MySQL ngram 全文索引检索；旧库尚未建全文索引时退回 LIKE"""
+        where, args = self._filter_clause(filters, prefix="AND")
+        try:
+            return self._query_all(f'''
+            SELECT id, question, category, difficulty, level,
+                   MATCH(question, answer, category) AGAINST (%s IN NATURAL LANGUAGE MODE) AS score
+            FROM questions
+            WHERE MATCH(question, answer, category) AGAINST (%s IN NATURAL LANGUAGE MODE) {where}
+            ORDER BY score DESC
+            LIMIT %s OFFSET %s
+            ''', (query, query) + args + (limit, offset))
+        except Exception as e:
+            if not self.backend.is_missing_fulltext_index(e):
+                raise
+        return self._like_search(query, filters, limit, offset)
+
+    def _like_search(self, query, filters, limit, offset):
+        """按 LIKE 模糊匹配题目/答案/分类"""
+        where, args = self._filter_clause(filters, prefix="AND")
+        pattern = f"%{query}%"
+        return self._query_all(f'''
+        SELECT id, question, category, difficulty, level
+        FROM questions
+        WHERE (question LIKE %s OR answer LIKE %s OR category LIKE %s) {where}
+        ORDER BY id DESC
+        LIMIT %s OFFSET %s
+        ''', (pattern, pattern, pattern) + args + (limit, offset))
+
+    def _ensure_search_index(self):
+        """进程内索引未就绪时在后台线程全量构建"""
+        if self.search_index.ready:
+            return
+        with self._search_build_lock:
+            if self._search_build_thread is None or not self._search_build_thread.is_alive():
+                self._search_build_thread = threading.Thread(target=self._build_search_index, daemon=True)
+                self._search_build_thread.start()
+
+    def _build_search_index(self):
+        try:
+            self._sync_search_index()
+            self.search_index.ready = True
+            # 读完最后一批到置为就绪之间新增的题目，add_question 看到的还是未就绪而没有加入索引，
+            # 就绪后再补读一次；之后提交的新题由 add_question/add_questions_bulk 自行加入
+            self._sync_search_index()
+            print(f"题库检索索引构建完成，共 {len(self.search_index)} 道题")
+        except Exception as e:
+            print(f"题库检索索引构建失败：{str(e)}")
+
+    def _sync_search_index(self, batch_size=5000):
+        """把 id 大于已索引最大 id 的题目分批加入进程内索引（有快照时先从快照读取）"""
+        snapshot = self.snapshot
+        if snapshot is not None:
+            for document in snapshot.iter_documents(after_id=self.search_index.max_doc_id):
+                self.search_index.add(*document)
+        while True:
+            rows = self._query_all('''
+            SELECT id, question, answer, category, difficulty FROM questions
+            WHERE id > %s
+            ORDER BY id
+            LIMIT %s
+            ''', (self.search_index.max_doc_id, batch_size))
+            for row in rows:
+                self.search_index.add(row['id'], row['question'], row['answer'], row['category'], row['difficulty'])
+            if len(rows) < batch_size:
+                return
+
+    def count_questions(self):
+        """题目总数"""
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return len(snapshot)
+        return self._query_one("SELECT COUNT(*) AS cnt FROM questions")['cnt']
+
+    def open_snapshot(self, path):
+        """
+        打开题库快照（src.snapshot），与数据库指纹一致时才启用
+        :return: 是否启用；快照缺失、损坏或过期时返回 False，可用 write_snapshot 重新生成
+        """
+        generation = self._snapshot_generation
+        try:
+            snapshot = QuestionSnapshot(path)
+        except FileNotFoundError:
+            return False
+        except (OSError, SnapshotError) as e:
+            print(f"题库快照不可用：{str(e)}")
+            return False
+        if snapshot.fingerprint != question_fingerprint(self) or generation != self._snapshot_generation:
+            snapshot.close()
+            print("题库快照已过期，需要重新生成")
+            return False
+        # 只替换引用、不关闭旧快照：其他线程可能还在读旧快照，引用全部释放后 mmap 随对象回收
+        self.snapshot = snapshot
+        return True
+
+    def write_snapshot(self, path):
+        """把当前题库写成快照文件，返回题目数"""
+        return write_snapshot(self, path)
+
+    def invalidate_snapshot(self):
+        """
+        本进程改动题库后停用快照（其他进程的改动只在打开快照时按指纹检查）
+        不关闭 mmap：可能有其他线程正在读，引用释放后自动回收
+        """
+        self._snapshot_generation += 1
+        self.snapshot = None
+
+    def reset_search_index(self):
+        """题库被整体替换（如从备份恢复）后丢弃进程内索引，下次搜索时重建"""
+        with self._search_build_lock:
+            self.search_index = SearchIndex()
+
     def close(self):
-        if self.conn:
-            self.conn.close()
+        if self.snapshot is not None:
+            self.snapshot.close()
+            self.snapshot = None
+        if self.pool:
+            self.pool.close()
@@ -0,0 +1,262 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : db_pool.py
+@Author  : admin1
+@Date    : 2026/10/17 10:05
+@Description : 线程安全的数据库连接池（借出检测、空闲回收、寿命回收、失败重试）
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolTimeoutError(Exception):
+    """等待可用连接超时"""
+
+
+class _PooledConnection:
+    """连接池中的一条连接及其时间信息"""
+    __slots__ = ('raw', 'created_at', 'last_used')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """
+    有界连接池
+    - connection() 上下文管理器借出/归还连接，异常时自动回滚
+    - 借出时 ping 检测，失效连接丢弃重建
+    - 空闲超过 max_idle 秒、存活超过 max_lifetime 秒的连接在借出/归还时回收
+    - run() 在遇到临时性错误（断线、死锁等）时按指数退避重试
+    """
+
+    def __init__(self, creator, max_size=5, acquire_timeout=10, max_idle=300, max_lifetime=3600,
+                 ping=None, is_transient=None, retries=3, backoff=0.2):
+        """
+        :param creator: 无参函数，返回一条新的数据库连接
+        :param max_size: 最大连接数
+        :param acquire_timeout: 等待可用连接的最长时间（秒）
+        :param max_idle: 空闲连接最长保留时间（秒）
+        :param max_lifetime: 连接最长寿命（秒）
+        :param ping: ping(conn) 检测连接可用，失败时抛异常
+        :param is_transient: is_transient(exc) 判断异常是否值得重试
+        :param retries: run() 的最大重试次数
+        :param backoff: 首次重试前等待的秒数，之后翻倍
+        """
+        self.creator = creator
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.ping = ping
+        self.is_transient = is_transient or (lambda exc: False)
+        self.retries = retries
+        self.backoff = backoff
+
+        self._cond = threading.Condition()
+        self._idle = []  # 后进先出，最近用过的连接优先借出
+        self._size = 0  # 已创建且未关闭的连接数
+        self._closed = False
+        self._stats = {
+            'created': 0,
+            'closed': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'checkout_seconds': 0.0,
+            'max_checkout_seconds': 0.0,
+            'ping_failures': 0,
+            'idle_evictions': 0,
+            'lifetime_recycles': 0,
+            'retries': 0,
+            'timeouts': 0,
+        }
+
+    # --------------------
+    # 借出/归还
+    # --------------------
+    @contextmanager
+    def connection(self):
+        """借出一条连接，with 块结束时归还；块内抛异常则回滚"""
+        pooled = self.checkout()
+        try:
+            yield pooled.raw
+        except Exception:
+            self._rollback_quietly(pooled)
+            self.checkin(pooled)
+            raise
+        self.checkin(pooled)
+
+    def checkout(self):
+        """借出连接（返回 _PooledConnection），没有空闲连接且已达上限时阻塞等待"""
+        started = time.monotonic()
+        deadline = started + self.acquire_timeout
+        waited = False
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeoutError("连接池已关闭")
+                pooled = self._take_idle()
+                if pooled is None and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeoutError(f"等待数据库连接超时（{self.acquire_timeout}s）")
+                    waited = True
+                    self._cond.wait(remaining)
+                    continue
+                if pooled is None:
+                    self._size += 1  # 先占位，连接在锁外创建
+            if pooled is None:
+                pooled = self._create()
+            elif not self._is_alive(pooled):
+                self._discard(pooled)
+                continue
+            self._record_checkout(started, waited)
+            return pooled
+
+    def checkin(self, pooled, discard=False):
+        """归还连接，discard=True 或连接超过寿命时直接关闭"""
+        now = time.monotonic()
+        if not discard and now - pooled.created_at > self.max_lifetime:
+            with self._cond:
+                self._stats['lifetime_recycles'] += 1
+            discard = True
+        if discard:
+            self._discard(pooled)
+            return
+        pooled.last_used = now
+        with self._cond:
+            if self._closed:
+                self._close_raw(pooled)
+                self._size -= 1
+                return
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    def run(self, work):
+        """借出连接执行 work(conn) 并返回其结果，临时性错误时换一条连接按退避重试"""
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            pooled = self.checkout()
+            try:
+                result = work(pooled.raw)
+            except Exception as e:
+                transient = self.is_transient(e)
+                if transient:
+                    self.checkin(pooled, discard=True)
+                else:
+                    self._rollback_quietly(pooled)
+                    self.checkin(pooled)
+                if not transient or attempt >= self.retries:
+                    raise
+                with self._cond:
+                    self._stats['retries'] += 1
+                time.sleep(delay)
+                delay *= 2
+                continue
+            self.checkin(pooled)
+            return result
+
+    # --------------------
+    # 状态与关闭
+    # --------------------
+    def metrics(self):
+        """连接池指标：连接数、等待与借出耗时等"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._size - len(self._idle)
+            stats['max_size'] = self.max_size
+        checkouts = stats['checkouts'] or 1
+        stats['avg_wait_ms'] = stats['wait_seconds'] * 1000 / checkouts
+        stats['avg_checkout_ms'] = stats['checkout_seconds'] * 1000 / checkouts
+        stats['max_checkout_ms'] = stats.pop('max_checkout_seconds') * 1000
+        return stats
+
+    def close(self):
+        """关闭所有空闲连接，借出中的连接在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for pooled in idle:
+            self._close_raw(pooled)
+
+    # --------------------
+    # 内部方法
+    # --------------------
+    def _take_idle(self):
+        """取一条空闲连接，顺带回收空闲过久/超过寿命的连接（需持有锁）"""
+        now = time.monotonic()
+        while self._idle:
+            pooled = self._idle.pop()
+            if now - pooled.last_used > self.max_idle:
+                self._stats['idle_evictions'] += 1
+            elif now - pooled.created_at > self.max_lifetime:
+                self._stats['lifetime_recycles'] += 1
+            else:
+                return pooled
+            self._close_raw(pooled)
+            self._size -= 1
+        return None
+
+    def _create(self):
+        try:
+            raw = self.creator()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats['created'] += 1
+        return _PooledConnection(raw)
+
+    def _is_alive(self, pooled):
+        if self.ping is None:
+            return True
+        try:
+            self.ping(pooled.raw)
+            return True
+        except Exception:
+            with self._cond:
+                self._stats['ping_failures'] += 1
+            return False
+
+    def _discard(self, pooled):
+        self._close_raw(pooled)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _close_raw(self, pooled):
+        try:
+            pooled.raw.close()
+        except Exception:
+            pass
+        # 可能在持有锁时调用（Condition 默认使用可重入锁）
+        with self._cond:
+            self._stats['closed'] += 1
+
+    @staticmethod
+    def _rollback_quietly(pooled):
+        try:
+            pooled.raw.rollback()
+        except Exception:
+            pass
+
+    def _record_checkout(self, started, waited):
+        elapsed = time.monotonic() - started
+        with self._cond:
+            self._stats['checkouts'] += 1
+            self._stats['checkout_seconds'] += elapsed
+            self._stats['max_checkout_seconds'] = max(self._stats['max_checkout_seconds'], elapsed)
+            if waited:
+                self._stats['waits'] += 1
+                self._stats['wait_seconds'] += elapsed
@@ -0,0 +1,222 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : due_queue.py
+@Author  : admin1
+@Date    : 2026/10/17 09:20
+@Description : 待复习题目队列（内存小顶堆 + 新题池，批量预取）
+"""
+import heapq
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class DueQueue:
+    """
+    待复习题目队列
+    - 到期题目：按 (next_review, id) 建小顶堆，数据库按 idx_next_review 分批游标加载
+    - 新题（next_review 为 NULL）：单独的新题池，按 id 分批加载后用带种子的随机数打乱
+    - 队列余量低于阈值时在后台线程补货，取题本身不访问数据库
+    - 重新扫描也没有可用题目时记下最早到期时间，此前取题直接返回 None；reschedule/wake/clear 或补货拿到新数据后解除
+    - 补货读库期间 reschedule 过的题目以 reschedule 的状态为准，读到的旧状态不会再放回队列
+    """
+
+    def __init__(self, fetch_due, fetch_new, batch_size=500, low_watermark=50, seed=None, idle_interval=30):
+        """
+        :param fetch_due: fetch_due(after, now, limit) -> 按 (next_review, id) 升序返回到期题目,
+                          after 为上一批最后一条的 (next_review, id)，首次为 None
+        :param fetch_new: fetch_new(after_id, limit) -> 按 id 升序返回 next_review 为 NULL 的题目
+        :param batch_size: 每批加载条数
+        :param low_watermark: 队列余量低于该值时触发后台补货
+        :param seed: 新题打乱的随机种子
+        :param idle_interval: 数据库已无更多题目时，两次补货之间的最小间隔（秒）
+        """
+        self.fetch_due = fetch_due
+        self.fetch_new = fetch_new
+        self.batch_size = batch_size
+        self.low_watermark = low_watermark
+        self.idle_interval = idle_interval
+        self._random = random.Random(seed)
+
+        self._lock = threading.Lock()  # 保护堆/新题池
+        self._refill_lock = threading.Lock()  # 同一时间只允许一个补货
+        self._refill_thread = None
+        self._reset_state()
+
+    def _reset_state(self):
+        self._heap = []  # [(next_review, id)]
+        self._rows = {}  # id -> row，堆中条目与之不一致时视为过期条目
+        self._new_pool = []
+        self._due_cursor = None  # 已加载到的 (next_review, id)
+        self._new_cursor = 0  # 已加载到的新题 id
+        self._due_more = True  # 上一批到期题目是满批，数据库中可能还有
+        self._exhausted_at = None  # 上次补货没有拿到任何新数据的时间
+        self._idle_until = None  # 重新扫描也没有可用题目时，在此时间之前取题不再访问数据库
+        self._rescheduled = None  # 补货进行中时记录期间 reschedule 的 id -> 新状态
+
+    def __len__(self):
+        with self._lock:
+            return len(self._rows)
+
+    def clear(self):
+        """清空队列，下次取题时重新从数据库加载"""
+        with self._lock:
+            self._reset_state()
+
+    def pop(self, now=None):
+        """取出下一道题：优先返回已到期题目，其次返回新题；没有则返回 None"""
+        now = now or datetime.now()
+        with self._lock:
+            idle = self._idle_until is not None and now < self._idle_until
+        if idle:
+            # 刚确认过没有可用题目，到最早的到期时间（或空闲间隔）之前直接返回，不访问数据库
+            return self._pop_ready(now)
+        # 数据库中可能还有更早到期的题目时，不先发新题
+        row = self._pop_ready(now, allow_new=not self._due_pending())
+        if row is None:
+            # 队列中没有可用题目，同步补货一次
+            self.refill(now)
+            row = self._pop_ready(now)
+        if row is None and self._cursors_started():
+            # 游标已走到末尾，可能还有被跳过（取出但未作答）的题目，从头再来一次
+            self.clear()
+            self.refill(now)
+            row = self._pop_ready(now)
+        if row is None:
+            self._mark_idle(now)
+            return None
+        self._maybe_refill_async()
+        return row
+
+    def _mark_idle(self, now):
+        """记录“暂无可用题目”：到队列中最早的到期时间为止，最长 idle_interval 秒"""
+        with self._lock:
+            idle_until = now + timedelta(seconds=self.idle_interval)
+            while self._heap:
+                next_review, qid = self._heap[0]
+                row = self._rows.get(qid)
+                if row is None or row.get('next_review') != next_review:
+                    heapq.heappop(self._heap)  # 过期条目
+                    continue
+                idle_until = min(idle_until, next_review)
+                break
+            self._idle_until = idle_until
+
+    def wake(self):
+        """数据库中新增了题目：解除“暂无可用题目”状态，下次取题重新补货"""
+        with self._lock:
+            self._idle_until = None
+            self._exhausted_at = None
+
+    def reschedule(self, question_id, level, last_reviewed, next_review):
+        """题目复习状态更新后原地调整队列"""
+        with self._lock:
+            self._idle_until = None
+            if self._rescheduled is not None:
+                self._rescheduled[question_id] = dict(level=level, last_reviewed=last_reviewed,
+                                                      next_review=next_review)
+            row = self._rows.pop(question_id, None)
+            if row is None:
+                # 题目不在队列中（通常是刚刚取出作答的题），按需重新放回
+                if next_review is None or not self._behind_due_cursor(next_review, question_id):
+                    # 已完全掌握，或之后补货时会被游标再次加载
+                    return
+                row = {'id': question_id}
+            row.update(level=level, last_reviewed=last_reviewed, next_review=next_review)
+            if next_review is None:
+                return
+            self._rows[question_id] = row
+            heapq.heappush(self._heap, (next_review, question_id))
+
+    def refill(self, now=None):
+        """从数据库补货一批到期题目和新题"""
+        now = now or datetime.now()
+        with self._refill_lock:
+            with self._lock:
+                due_cursor, new_cursor = self._due_cursor, self._new_cursor
+                self._rescheduled = {}
+            try:
+                due_rows = self.fetch_due(due_cursor, now, self.batch_size)
+                new_rows = self.fetch_new(new_cursor, self.batch_size)
+            except BaseException:
+                with self._lock:
+                    self._rescheduled = None
+                raise
+            self._random.shuffle(new_rows)
+            with self._lock:
+                # 读库与提交评分并发时读到的可能是评分前的状态，以期间 reschedule 的状态为准
+                rescheduled, self._rescheduled = self._rescheduled or {}, None
+                for row in due_rows:
+                    self._due_cursor = (row['next_review'], row['id'])
+                    self._add_loaded(row, rescheduled)
+                for row in new_rows:
+                    self._new_cursor = max(self._new_cursor, row['id'])
+                    self._add_loaded(row, rescheduled)
+                self._due_more = len(due_rows) >= self.batch_size
+                self._exhausted_at = None if (due_rows or new_rows) else time.monotonic()
+                if due_rows or new_rows:
+                    self._idle_until = None
+
+    def _add_loaded(self, row, rescheduled):
+        """把补货读到的题目放入堆或新题池（调用方持有 _lock）"""
+        if row['id'] in self._rows:
+            return
+        if row['id'] in rescheduled:
+            row = dict(row, **rescheduled[row['id']])
+        if row.get('next_review') is not None:
+            self._rows[row['id']] = row
+            heapq.heappush(self._heap, (row['next_review'], row['id']))
+        elif row['id'] not in rescheduled:
+            self._rows[row['id']] = row
+            self._new_pool.append(row['id'])
+
+    def _pop_ready(self, now, allow_new=True):
+        with self._lock:
+            while self._heap:
+                next_review, qid = self._heap[0]
+                row = self._rows.get(qid)
+                if row is None or row.get('next_review') != next_review:
+                    heapq.heappop(self._heap)  # 过期条目
+                    continue
+                if next_review > now:
+                    break
+                heapq.heappop(self._heap)
+                return self._rows.pop(qid)
+            while allow_new and self._new_pool:
+                qid = self._new_pool.pop()
+                row = self._rows.get(qid)
+                if row is not None and row.get('next_review') is None:
+                    return self._rows.pop(qid)
+            return None
+
+    def _due_pending(self):
+        with self._lock:
+            return self._due_cursor is not None and self._due_more
+
+    def _cursors_started(self):
+        with self._lock:
+            return self._due_cursor is not None or self._new_cursor > 0
+
+    def _behind_due_cursor(self, next_review, question_id):
+        """判断 (next_review, id) 是否已经在游标之前（补货不会再加载到）"""
+        if self._due_cursor is None:
+            return False
+        return (next_review, question_id) <= self._due_cursor
+
+    def _maybe_refill_async(self):
+        with self._lock:
+            if len(self._rows) >= self.low_watermark:
+                return
+            if self._exhausted_at is not None and time.monotonic() - self._exhausted_at < self.idle_interval:
+                return
+            if self._refill_thread is not None and self._refill_thread.is_alive():
+                return
+            self._refill_thread = threading.Thread(target=self._refill_quietly, daemon=True)
+            self._refill_thread.start()
+
+    def _refill_quietly(self):
+        try:
+            self.refill()
+        except Exception as e:
+            print(f"后台补充复习队列失败：{str(e)}")
@@ -0,0 +1,137 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : lookahead.py
+@Author  : admin1
+@Date    : 2026/10/17 21:10
+@Description : 练习取题的预取缓冲（用户作答时在后台备好接下来的几道题）
+"""
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+
+
+class QuestionLookahead:
+    """
+    预取缓冲
+    - fill() 在后台连续取 depth 道题放入缓冲，take() 只读内存，切到下一题不等数据库
+    - 复习队列被整体重置（同步、恢复、删题）后 generation 变化，缓冲中的题可能已删除或重新排期，整体丢弃
+    - 最近取出的题目记下取出时间：之后再取到同一道题时，若其 last_reviewed 早于取出时间，
+      说明是作答结果尚未写入数据库前的旧状态（写后日志未落库、队列从头重扫），跳过以免重复出题；
+      作答后按评分重新排期的题 last_reviewed 晚于取出时间，照常出题
+    """
+
+    def __init__(self, fetch, depth=3, generation=None, recent_size=256):
+        """
+        :param fetch: fetch() -> 下一道题（dict）或 None，会访问数据库
+        :param depth: 预取题数
+        :param generation: generation() -> 复习队列版本号，变化时丢弃缓冲
+        """
+        self.fetch = fetch
+        self.depth = depth
+        self.generation = generation or (lambda: 0)
+        self.recent_size = recent_size
+        self._buffer = deque()
+        self._recent = OrderedDict()  # 题目 id -> 取出时间
+        self._buffer_generation = None
+        self._lock = threading.Lock()
+        self._fill_lock = threading.Lock()  # 同一时间只允许一个预取
+        self._fill_thread = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def take(self):
+        """取出缓冲中的下一道题，不访问数据库；缓冲为空或已过期时返回 None"""
+        with self._lock:
+            if self._buffer_generation != self.generation():
+                self._buffer.clear()
+            if not self._buffer:
+                return None
+            row = self._buffer.popleft()
+            self._remember(row['id'])
+            return row
+
+    def next(self):
+        """取下一道题：优先用缓冲，缓冲为空时同步取一道；随后在后台补满缓冲"""
+        row = self.take()
+        if row is None:
+            row = self._fetch_valid()
+            if row is not None:
+                with self._lock:
+                    self._remember(row['id'])
+        self.fill_async()
+        return row
+
+    def fill(self):
+        """把缓冲补到 depth 道题"""
+        with self._fill_lock:
+            generation = self.generation()
+            with self._lock:
+                if self._buffer_generation != generation:
+                    self._buffer.clear()
+                    self._buffer_generation = generation
+            while len(self) < self.depth:
+                row = self._fetch_valid()
+                if row is None:
+                    return
+                with self._lock:
+                    if self.generation() != generation:
+                        # 取题期间队列被重置，本次取到的都作废
+                        self._buffer.clear()
+                        return
+                    self._buffer.append(row)
+
+    def fill_async(self):
+        """在后台线程补满缓冲（已在补或缓冲已满时不做事）"""
+        with self._lock:
+            if len(self._buffer) >= self.depth and self._buffer_generation == self.generation():
+                return
+            if self._fill_thread is not None and self._fill_thread.is_alive():
+                return
+            self._fill_thread = threading.Thread(target=self._fill_quietly, name="question-lookahead", daemon=True)
+            self._fill_thread.start()
+
+    def discard(self, question_id):
+        """题目已作答或被改动，从缓冲中移除"""
+        with self._lock:
+            self._buffer = deque(row for row in self._buffer if row['id'] != question_id)
+
+    def clear(self):
+        with self._lock:
+            self._buffer.clear()
+            self._recent.clear()
+
+    def _fetch_valid(self):
+        """从复习队列取题，跳过缓冲中已有的和刚取出过的旧状态题目"""
+        skipped = set()
+        while True:
+            row = self.fetch()
+            if row is None or not self._is_duplicate(row):
+                return row
+            if row['id'] in skipped:
+                # 队列已从头重扫一轮，剩下的都是重复题
+                return None
+            skipped.add(row['id'])
+
+    def _is_duplicate(self, row):
+        with self._lock:
+            if any(buffered['id'] == row['id'] for buffered in self._buffer):
+                return True
+            taken_at = self._recent.get(row['id'])
+        if taken_at is None:
+            return False
+        last_reviewed = row.get('last_reviewed')
+        return last_reviewed is None or last_reviewed < taken_at
+
+    def _remember(self, question_id):
+        self._recent.pop(question_id, None)
+        self._recent[question_id] = datetime.now()
+        while len(self._recent) > self.recent_size:
+            self._recent.popitem(last=False)
+
+    def _fill_quietly(self):
+        try:
+            self.fill()
+        except Exception as e:
+            print(f"预取题目失败：{str(e)}")
@@ -0,0 +1,38 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : normalize.py
+@Author  : admin1
+@Date    : 2026/10/17 11:10
+@Description : 题目文本归一化与去重哈希
+"""
+import hashlib
+import re
+import unicodedata
+
+# NFKC 不处理的中文标点，统一映射为半角
+_PUNCT_TABLE = str.maketrans({
+    '。': '.', '、': ',', '·': '.',
+    '“': '"', '”': '"', '‘': "'", '’': "'",
+    '「': '"', '」': '"', '『': '"', '』': '"',
+    '《': '<', '》': '>', '〈': '<', '〉': '>',
+    '【': '[', '】': ']', '〔': '[', '〕': ']',
+    '—': '-', '–': '-', '～': '~', '…': '...',
+})
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_question_text(text):
+    """
+    题目去重用的归一化文本
+    - NFKC：全角字母/数字/标点转半角（如 ？→?、，→,）
+    - 中文标点映射为对应半角标点
+    - 忽略大小写，连续空白合并为一个空格并去掉首尾空白
+    """
+    text = unicodedata.normalize('NFKC', text or '')
+    text = text.translate(_PUNCT_TABLE).casefold()
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+def question_hash(text):
+    """归一化题目文本的 SHA-1（40 位十六进制），对应 questions.question_hash"""
+    return hashlib.sha1(normalize_question_text(text).encode('utf-8')).hexdigest()
@@ -0,0 +1,284 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : query_stats.py
+@Author  : admin1
+@Date    : 2026/10/17 22:00
+@Description : 数据库调用耗时统计（按方法/语句的耗时直方图、行数与字节数、慢查询日志）
+"""
+import bisect
+import functools
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# 直方图桶上界（毫秒），最后一个桶收纳更慢的调用
+BUCKET_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_WHITESPACE = re.compile(r"\s+")
+_PLACEHOLDER_LIST = re.compile(r"%s(?:\s*,\s*%s)+")
+
+
+@functools.lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """语句统计键：压缩空白，IN 列表等连续占位符折叠为一个，同一语句不因参数个数不同而分散"""
+    return _PLACEHOLDER_LIST.sub("%s, ...", _WHITESPACE.sub(" ", sql).strip())
+
+
+def args_shape(args, max_items=8):
+    """参数形状（类型与长度），慢查询日志只记录形状，不记录参数值"""
+    if args is None:
+        return None
+
+    def shape(value):
+        if isinstance(value, (str, bytes)):
+            return f"{type(value).__name__}({len(value)})"
+        if isinstance(value, (list, tuple, set)):
+            return f"{type(value).__name__}[{len(value)}]"
+        return type(value).__name__
+
+    if isinstance(args, dict):
+        return {key: shape(value) for key, value in list(args.items())[:max_items]}
+    if not isinstance(args, (list, tuple)):
+        return type(args).__name__  # executemany 的生成器等，不展开
+    items = [shape(value) for value in list(args)[:max_items]]
+    if len(args) > max_items:
+        items.append(f"...共 {len(args)} 个")
+    return items
+
+
+def _row_bytes(row):
+    """行中文本/二进制列的字节数（近似，只计 str/bytes 长度）"""
+    values = row.values() if isinstance(row, dict) else row
+    return sum(len(value) for value in values if isinstance(value, (str, bytes)))
+
+
+class _Histogram:
+    __slots__ = ('count', 'errors', 'total', 'max', 'rows', 'bytes', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+
+    def percentile(self, fraction):
+        """按桶估算的分位数（返回所在桶的上界，毫秒）"""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return BUCKET_BOUNDS_MS[i] if i < len(BUCKET_BOUNDS_MS) else self.max * 1000
+        return self.max * 1000
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'total_ms': self.total * 1000,
+            'avg_ms': self.total * 1000 / self.count if self.count else 0.0,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': self.max * 1000,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'buckets': dict(zip([str(b) for b in BUCKET_BOUNDS_MS] + ['+inf'], self.buckets)),
+        }
+
+
+class QueryStats:
+    """
+    数据库调用统计
+    - 方法级（QuestionDB 的公开方法）与语句级（每条 SQL，按 normalize_sql 归并）分别记录耗时直方图
+    - 语句级额外记录返回行数和文本字节数、出错次数
+    - 超过 slow_ms 的语句和出错的语句记入慢查询日志（SQL + 参数形状），最多保留 slow_log_size 条
+    每次记录只做一次加锁和几次加法，可以常开
+    """
+
+    def __init__(self, slow_ms=200, slow_log_size=200, enabled=True):
+        self.slow_ms = slow_ms
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._methods = {}
+        self._statements = {}
+        self._slow_log = deque(maxlen=slow_log_size)
+        self.started_at = datetime.now()
+
+    def _histogram(self, table, key):
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = _Histogram()
+        return histogram
+
+    def _add(self, histogram, seconds, error):
+        histogram.count += 1
+        histogram.total += seconds
+        if seconds > histogram.max:
+            histogram.max = seconds
+        histogram.buckets[bisect.bisect_left(BUCKET_BOUNDS_MS, seconds * 1000)] += 1
+        if error:
+            histogram.errors += 1
+
+    def record_method(self, name, seconds, error=False):
+        with self._lock:
+            self._add(self._histogram(self._methods, name), seconds, error)
+
+    def record_statement(self, sql, seconds, args=None, error=None):
+        key = normalize_sql(sql)
+        with self._lock:
+            self._add(self._histogram(self._statements, key), seconds, error is not None)
+        if error is not None or seconds * 1000 >= self.slow_ms:
+            entry = {
+                'at': datetime.now().isoformat(timespec='milliseconds'),
+                'ms': round(seconds * 1000, 3),
+                'sql': key,
+                'args': args_shape(args),
+                'thread': threading.current_thread().name,
+            }
+            if error is not None:
+                entry['error'] = f"{type(error).__name__}: {error}"
+            with self._lock:
+                self._slow_log.append(entry)
+        return key
+
+    def record_rows(self, key, rows):
+        """把取回的行计入语句的行数/字节数"""
+        if not rows:
+            return
+        size = sum(_row_bytes(row) for row in rows)
+        with self._lock:
+            histogram = self._statements.get(key)
+            if histogram is not None:
+                histogram.rows += len(rows)
+                histogram.bytes += size
+
+    def snapshot(self):
+        """当前统计（可直接 JSON 序列化），方法和语句按总耗时降序"""
+        with self._lock:
+            methods = {name: h.to_dict() for name, h in self._methods.items()}
+            statements = {sql: h.to_dict() for sql, h in self._statements.items()}
+            slow_log = list(self._slow_log)
+
+        def ordered(table):
+            return [dict(name=name, **stats)
+                    for name, stats in sorted(table.items(), key=lambda item: -item[1]['total_ms'])]
+
+        return {
+            'since': self.started_at.isoformat(timespec='seconds'),
+            'slow_ms': self.slow_ms,
+            'methods': ordered(methods),
+            'statements': ordered(statements),
+            'slow_log': slow_log,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+            self._statements.clear()
+            self._slow_log.clear()
+            self.started_at = datetime.now()
+
+
+class InstrumentedCursor:
+    """游标代理：记录 execute/executemany 耗时，fetch 的行数和字节数计入最近一条语句"""
+
+    def __init__(self, raw, stats):
+        self._raw = raw
+        self._stats = stats
+        self._key = None
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def _timed(self, method, sql, args):
+        started = time.perf_counter()
+        try:
+            result = method(sql, args)
+        except Exception as e:
+            self._key = self._stats.record_statement(sql, time.perf_counter() - started, args, error=e)
+            raise
+        self._key = self._stats.record_statement(sql, time.perf_counter() - started, args)
+        return result
+
+    def execute(self, sql, args=None):
+        return self._timed(self._raw.execute, sql, args)
+
+    def executemany(self, sql, seq_of_args):
+        return self._timed(self._raw.executemany, sql, seq_of_args)
+
+    def fetchone(self):
+        row = self._raw.fetchone()
+        if row is not None:
+            self._stats.record_rows(self._key, (row,))
+        return row
+
+    def fetchmany(self, size):
+        rows = self._raw.fetchmany(size)
+        self._stats.record_rows(self._key, rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._raw.fetchall()
+        self._stats.record_rows(self._key, rows)
+        return rows
+
+
+class InstrumentedConnection:
+    """连接代理：cursor() 返回计时游标，其余属性透传"""
+
+    def __init__(self, raw, stats):
+        self._raw = raw
+        self._stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._raw.cursor(*args, **kwargs)
+        if not self._stats.enabled:
+            return cursor
+        return InstrumentedCursor(cursor, self._stats)
+
+
+def instrument_methods(exclude=()):
+    """
+    类装饰器：类中定义的公开方法调用耗时记入实例的 query_stats（不存在或未启用时不记录）
+    :param exclude: 不记录的方法名（只读内存指标之类的方法）
+    """
+    def wrap(name, fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            stats = self.__dict__.get('query_stats')
+            if stats is None or not stats.enabled:
+                return fn(self, *args, **kwargs)
+            started = time.perf_counter()
+            try:
+                result = fn(self, *args, **kwargs)
+            except Exception:
+                stats.record_method(name, time.perf_counter() - started, error=True)
+                raise
+            stats.record_method(name, time.perf_counter() - started)
+            return result
+        return wrapper
+
+    def decorate(cls):
+        for name, value in list(vars(cls).items()):
+            if name.startswith('_') or name in exclude or not callable(value):
+                continue
+            if isinstance(value, (staticmethod, classmethod)):
+                continue
+            setattr(cls, name, wrap(name, value))
+        return cls
+
+    return decorate
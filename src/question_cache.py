@@ -0,0 +1,108 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : question_cache.py
+@Author  : admin1
+@Date    : 2026/10/17 20:10
+@Description : 题目行的 LRU 读穿缓存（按内存字节数淘汰）
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+
+def estimate_row_bytes(row):
+    """行 dict 的大致内存占用（dict 本身 + 各列值，列名是共享的字符串不计）"""
+    return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row.values())
+
+
+class QuestionCache:
+    """
+    题目行缓存，键为题目 id
+    - 总大小超过 max_bytes 时淘汰最久未使用的行
+    - get_many() 返回命中的行和未命中的 id，调用方一次查询补齐后 put_many()
+    - 题目被改动时调用 invalidate()；每次失效递增版本号，查询开始后发生过失效的结果不写入缓存，
+      避免把查询期间被改掉的旧数据放回缓存
+    - 返回行的浅拷贝，调用方修改不影响缓存
+    """
+
+    def __init__(self, max_bytes=32 << 20):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._rows = OrderedDict()  # id -> (row, 字节数)，最近使用的在末尾
+        self._bytes = 0
+        self.generation = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._rows)
+
+    def get(self, question_id):
+        found, _ = self.get_many((question_id,))
+        return found.get(question_id)
+
+    def get_many(self, question_ids):
+        """:return: ({id: row}, [未命中的 id])"""
+        found, missing = {}, []
+        with self._lock:
+            for question_id in question_ids:
+                entry = self._rows.get(question_id)
+                if entry is None:
+                    missing.append(question_id)
+                else:
+                    self._rows.move_to_end(question_id)
+                    found[question_id] = dict(entry[0])
+            self._stats['hits'] += len(found)
+            self._stats['misses'] += len(missing)
+        return found, missing
+
+    def put_many(self, rows, generation):
+        """
+        写入查询结果
+        :param generation: 查询开始前读取的 self.generation，之后发生过失效时不写入
+        """
+        with self._lock:
+            if generation != self.generation:
+                return
+            for row in rows:
+                size = estimate_row_bytes(row)
+                if size > self.max_bytes:
+                    continue
+                old = self._rows.pop(row['id'], None)
+                if old is not None:
+                    self._bytes -= old[1]
+                self._rows[row['id']] = (dict(row), size)
+                self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, size) = self._rows.popitem(last=False)
+                self._bytes -= size
+                self._stats['evictions'] += 1
+
+    def invalidate(self, question_ids):
+        """题目被改动或删除后移除其缓存"""
+        with self._lock:
+            self.generation += 1
+            for question_id in question_ids:
+                entry = self._rows.pop(question_id, None)
+                if entry is not None:
+                    self._bytes -= entry[1]
+                    self._stats['invalidations'] += 1
+
+    def clear(self):
+        """题库被整体改动（同步、恢复）后清空"""
+        with self._lock:
+            self.generation += 1
+            self._stats['invalidations'] += len(self._rows)
+            self._rows.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """命中/未命中/淘汰/失效次数及当前占用"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._rows)
+            stats['bytes'] = self._bytes
+            stats['max_bytes'] = self.max_bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
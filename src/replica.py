@@ -0,0 +1,315 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : replica.py
+@Author  : admin1
+@Date    : 2026/10/17 18:10
+@Description : 题库离线副本（本地 SQLite 镜像服务器题库与用户复习状态，按水位增量同步）
+"""
+import threading
+from datetime import datetime, timedelta
+
+from src.database import QuestionDB
+from src.db_pool import PoolTimeoutError
+
+VALID_DIFFICULTIES = ("简单", "中等", "困难")
+EPOCH = datetime(1970, 1, 2)  # 早于任何 TIMESTAMP 值的水位
+
+
+class ReplicaSync:
+    """
+    离线副本同步
+    - local 为本地副本（QuestionDB + SQLiteBackend），所有读取都走本地
+    - 服务器上的 questions / user_question_state 按 updated_at 水位增量拉取，
+      删除的题目按 question_tombstones.deleted_at 水位拉取后在本地删除
+    - 用户和答题记录只增不改，按 id 水位拉取；答题记录按幂等键去重，本机提交过的不会重复
+    - 每次从水位往前多拉 overlap 秒，避免服务器上晚提交的事务因时间戳早于水位而漏掉
+    - 水位与数据在本地同一事务中写入；后台线程每 interval 秒同步一次，服务器不可用时下次再试
+    """
+
+    def __init__(self, local, remote_backend, interval=60, batch_size=1000, overlap=60):
+        """
+        :param local: 本地副本 QuestionDB
+        :param remote_backend: 服务器的存储后端，首次同步/推送时才建立连接
+        """
+        self.local = local
+        self.remote_backend = remote_backend
+        self.interval = interval
+        self.batch_size = batch_size
+        self.overlap = timedelta(seconds=overlap)
+        self.user_ids = set()  # 在本机登录过、需要同步复习状态的用户
+
+        self._remote = None
+        self._remote_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+        self.local.pool.run(lambda conn: conn.cursor().execute('''
+        CREATE TABLE IF NOT EXISTS sync_watermarks (
+            name VARCHAR(64) PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+        '''))
+
+    # --------------------
+    # 服务器连接
+    # --------------------
+    def remote(self):
+        """服务器 QuestionDB，首次使用时连接"""
+        with self._remote_lock:
+            if self._remote is None:
+                self._remote = QuestionDB(max_connections=2, backend=self.remote_backend)
+            return self._remote
+
+    def is_transient_error(self, exc):
+        """服务器连不上/超时等临时性错误"""
+        return isinstance(exc, PoolTimeoutError) or self.remote_backend.is_transient(exc)
+
+    def push(self, reviews):
+        """把本地提交的答题记录写到服务器（格式同 QuestionDB.save_review_records，需带幂等键）"""
+        return self.remote().save_review_records(reviews)
+
+    # --------------------
+    # 后台同步
+    # --------------------
+    def start(self):
+        """启动后台同步线程；已同步过时立即在后台同步一次"""
+        self._thread = threading.Thread(target=self._run, name="replica-sync", daemon=True)
+        self._thread.start()
+        if self.has_synced():
+            self.request_sync()
+
+    def request_sync(self):
+        """让后台线程立即同步一次"""
+        self._wake.set()
+
+    def track_user(self, user_id):
+        """开始同步该用户的复习状态和答题记录"""
+        if user_id and user_id not in self.user_ids:
+            self.user_ids.add(user_id)
+            self.request_sync()
+
+    def close(self):
+        self._stopped = True
+        self._wake.set()
+        if self._thread:
+            self._thread.join(5)
+        with self._remote_lock:
+            if self._remote is not None:
+                self._remote.close()
+                self._remote = None
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopped:
+                return
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"离线副本同步失败：{str(e)}")
+
+    def has_synced(self):
+        return self._get_watermark('questions') is not None
+
+    def sync(self):
+        """从服务器拉取一次增量，返回新变更的行数"""
+        with self._sync_lock:
+            remote = self.remote()
+            changed = self._sync_users(remote)
+            # 先删后改：被删题目的去重哈希可能已被新题使用
+            changed += self._pull_by_time(remote, 'tombstones', '''
+            SELECT question_id, deleted_at FROM question_tombstones
+            ''', 'deleted_at', 'question_id', self._apply_tombstones)
+            changed += self._pull_by_time(remote, 'questions', '''
+            SELECT id, question, answer, category, difficulty, level, last_reviewed, next_review,
+                   created_at, question_hash, updated_at
+            FROM questions
+            ''', 'updated_at', 'id', self._apply_questions)
+            for user_id in list(self.user_ids):
+                changed += self._pull_by_time(remote, f'user_state:{user_id}', '''
+                SELECT user_id, question_id, level, last_reviewed, next_review, updated_at
+                FROM user_question_state WHERE user_id = %s
+                ''', 'updated_at', 'question_id', self._apply_user_states, (user_id,))
+                changed += self._sync_user_reviews(remote, user_id)
+            if changed:
+                self.local.invalidate_snapshot()
+                self.local.question_cache.clear()
+                self.local.reset_due_queues()
+            return changed
+
+    # --------------------
+    # 水位
+    # --------------------
+    def _get_watermark(self, name):
+        row = self.local._query_one("SELECT value FROM sync_watermarks WHERE name = %s", (name,))
+        return row['value'] if row else None
+
+    def _set_watermark(self, cursor, name, value):
+        backend = self.local.backend
+        cursor.execute(f'''
+        INSERT INTO sync_watermarks (name, value) VALUES (%s, %s)
+        {backend.on_conflict(('name',))} value = {backend.excluded('value')}
+        ''', (name, value))
+
+    def _pull_by_time(self, remote, name, select_sql, time_column, key_column, apply, args=()):
+        """
+        按 (time_column, key_column) 游标分批拉取水位之后的行，每批与新水位在本地同一事务中写入
+        apply(cursor, rows) 返回因依赖尚未同步而跳过的行，水位不越过这些行，下次重新拉取
+        """
+        watermark = self._get_watermark(name)
+        since = datetime.fromisoformat(watermark) if watermark else EPOCH
+        where = "AND" if "WHERE" in select_sql else "WHERE"
+        after, changed = None, 0
+        while True:
+            if after is None:
+                condition, cond_args = f"{time_column} >= %s", (max(since - self.overlap, EPOCH),)
+            else:
+                condition = f"({time_column} > %s OR ({time_column} = %s AND {key_column} > %s))"
+                cond_args = (after[0], after[0], after[1])
+            rows = remote._query_all(f'''
+            {select_sql} {where} {condition}
+            ORDER BY {time_column}, {key_column}
+            LIMIT %s
+            ''', tuple(args) + cond_args + (self.batch_size,))
+            if not rows:
+                return changed
+
+            def work(conn):
+                conn.begin()
+                cursor = conn.cursor()
+                skipped = apply(cursor, rows)
+                newest = rows[-1][time_column]
+                if skipped:
+                    newest = min(newest, min(row[time_column] for row in skipped))
+                if newest > since:
+                    self._set_watermark(cursor, name, newest.isoformat(" ", "seconds"))
+                conn.commit()
+
+            self.local.pool.run(work)
+            changed += sum(1 for row in rows if row[time_column] > since)
+            if len(rows) < self.batch_size:
+                return changed
+            after = (rows[-1][time_column], rows[-1][key_column])
+
+    # --------------------
+    # 各表的增量写入
+    # --------------------
+    def _sync_users(self, remote):
+        """用户只增不改，按 id 拉取（离线登录需要密码哈希）"""
+        changed = 0
+        while True:
+            after_id = self.local._query_one("SELECT COALESCE(MAX(id), 0) AS max_id FROM users")['max_id']
+            rows = remote._query_all('''
+            SELECT id, username, password_hash, created_at FROM users
+            WHERE id > %s ORDER BY id LIMIT %s
+            ''', (after_id, self.batch_size))
+            if rows:
+                self.local.pool.run(lambda conn: conn.cursor().executemany(f'''
+                {self.local.backend.insert_ignore} INTO users (id, username, password_hash, created_at)
+                VALUES (%s, %s, %s, %s)
+                ''', [(r['id'], r['username'], r['password_hash'], r['created_at']) for r in rows]))
+            changed += len(rows)
+            if len(rows) < self.batch_size:
+                return changed
+
+    def _apply_tombstones(self, cursor, rows):
+        # 与 QuestionDB.delete_question 相同：答题记录随题目级联删除，删除后在同一事务中重算涉及的日汇总
+        question_ids = [row['question_id'] for row in rows]
+        cursor.execute(f'''
+        SELECT DISTINCT COALESCE(user_id, 0), DATE(reviewed_at) FROM review_records
+        WHERE question_id IN ({", ".join(["%s"] * len(question_ids))})
+        ''', tuple(question_ids))
+        rollup_keys = [tuple(row) for row in cursor.fetchall()]
+        cursor.executemany("DELETE FROM questions WHERE id = %s", [(question_id,) for question_id in question_ids])
+        self.local._rebuild_rollup_days(cursor, rollup_keys)
+        for row in rows:
+            self.local.search_index.remove(row['question_id'])
+        return []
+
+    def _apply_questions(self, cursor, rows):
+        backend = self.local.backend
+        columns = ('question', 'answer', 'category', 'difficulty', 'level', 'last_reviewed', 'next_review',
+                   'created_at', 'updated_at')
+        assignments = ", ".join(f"{column} = {backend.excluded(column)}" for column in columns)
+        # 先不带去重哈希写入再补哈希：同一批里改题和新题可能暂时撞上唯一键
+        cursor.executemany(f'''
+        INSERT INTO questions (id, {", ".join(columns)}) VALUES (%s, {", ".join(["%s"] * len(columns))})
+        {backend.on_conflict(('id',))} {assignments}, question_hash = NULL
+        ''', [
+            (r['id'], r['question'], r['answer'], r['category'],
+             r['difficulty'] if r['difficulty'] in VALID_DIFFICULTIES else None,
+             r['level'], r['last_reviewed'], r['next_review'], r['created_at'], r['updated_at'])
+            for r in rows
+        ])
+        cursor.executemany(f"{backend.update_ignore} questions SET question_hash = %s WHERE id = %s",
+                           [(r['question_hash'], r['id']) for r in rows if r['question_hash']])
+        if self.local.search_index.ready:
+            for r in rows:
+                self.local.search_index.add(r['id'], r['question'], r['answer'], r['category'], r['difficulty'])
+        return []
+
+    def _apply_user_states(self, cursor, rows):
+        backend = self.local.backend
+        skipped = []
+        for r in rows:
+            # 题目还没同步到本地时跳过，下次同步重新拉取
+            cursor.execute(f'''
+            INSERT INTO user_question_state (user_id, question_id, level, last_reviewed, next_review, updated_at)
+            SELECT %s, %s, %s, %s, %s, %s
+            WHERE EXISTS (SELECT 1 FROM questions WHERE id = %s)
+            {backend.on_conflict(('user_id', 'question_id'))}
+                level = {backend.excluded('level')},
+                last_reviewed = {backend.excluded('last_reviewed')},
+                next_review = {backend.excluded('next_review')},
+                updated_at = {backend.excluded('updated_at')}
+            ''', (r['user_id'], r['question_id'], r['level'], r['last_reviewed'], r['next_review'],
+                  r['updated_at'], r['question_id']))
+            if not cursor.rowcount:
+                skipped.append(r)
+        return skipped
+
+    def _sync_user_reviews(self, remote, user_id):
+        """
+        拉取用户在其他设备上的答题记录（回顾/统计用），不改变复习状态（状态以服务器为准）
+        本机提交的记录按幂等键跳过；服务器上没有幂等键的记录用服务器 id 生成一个
+        """
+        name = f'reviews:{user_id}'
+        changed = 0
+        while True:
+            after_id = int(self._get_watermark(name) or 0)
+            rows = remote._query_all('''
+            SELECT id, question_id, user_answer, rating, reviewed_at, user_id, duration_seconds, client_key
+            FROM review_records
+            WHERE user_id = %s AND id > %s
+            ORDER BY id
+            LIMIT %s
+            ''', (user_id, after_id, self.batch_size))
+            if not rows:
+                return changed
+
+            def work(conn):
+                conn.begin()
+                cursor = conn.cursor()
+                saved = []
+                for r in rows:
+                    cursor.execute(f'''
+                    {self.local.backend.insert_ignore} INTO review_records
+                        (question_id, user_answer, rating, reviewed_at, user_id, duration_seconds, client_key)
+                    SELECT %s, %s, %s, %s, %s, %s, %s
+                    WHERE EXISTS (SELECT 1 FROM questions WHERE id = %s)
+                    ''', (r['question_id'], r['user_answer'], r['rating'], r['reviewed_at'], r['user_id'],
+                          r['duration_seconds'], r['client_key'] or f"server-{r['id']}", r['question_id']))
+                    if cursor.rowcount:
+                        saved.append((r['question_id'], r['rating'], r['user_id'], r['duration_seconds'],
+                                      r['reviewed_at'].date()))
+                if saved:
+                    self.local._update_review_rollup(conn, self.local._rollup_rows(saved))
+                self._set_watermark(cursor, name, str(rows[-1]['id']))
+                conn.commit()
+                return len(saved)
+
+            changed += self.local.pool.run(work)
+            if len(rows) < self.batch_size:
+                return changed
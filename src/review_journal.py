@@ -0,0 +1,223 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : review_journal.py
+@Author  : admin1
+@Date    : 2026/10/17 17:05
+@Description : 答题记录写后日志（先追加到本地日志立即返回，后台线程批量写入数据库）
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from itertools import islice
+
+
+class ReviewJournal:
+    """
+    答题记录的追加式本地日志
+    - append() 写入一行 JSON 即返回，fsync 由后台线程每 sync_interval 秒合并执行一次
+    - 后台线程按 batch_size 批量调用 flush_fn(entries) 写入数据库，成功后推进检查点
+    - 每条记录带唯一 key（数据库幂等键），崩溃后按检查点重放也不会重复写入
+    - 临时性错误（数据库断开/超时）按指数退避重试；其他错误逐条定位，写不进去的条目转存到 .failed 文件
+    - 日志中的条目全部写入后，文件超过 compact_bytes 时清空
+    """
+
+    def __init__(self, path, flush_fn, is_transient=None, batch_size=200, sync_interval=0.05, max_backoff=30,
+                 compact_bytes=1 << 20):
+        """
+        :param flush_fn: flush_fn(entries) 把一批条目写入数据库，失败时抛异常
+        :param is_transient: is_transient(exc) 判断异常是否值得原样重试
+        """
+        self.path = path
+        self.checkpoint_path = path + ".ckpt"
+        self.failed_path = path + ".failed"
+        self.flush_fn = flush_fn
+        self.is_transient = is_transient or (lambda exc: False)
+        self.batch_size = batch_size
+        self.sync_interval = sync_interval
+        self.max_backoff = max_backoff
+        self.compact_bytes = compact_bytes
+
+        self._cond = threading.Condition()
+        self._pending = deque()  # [(entry, 该条目在日志文件中的结束偏移)]
+        self._file = None
+        self._offset = 0  # 日志文件当前长度
+        self._dirty = False  # 有未 fsync 的写入
+        self._stopping = False
+        self._thread = None
+        self._backoff = 0
+        self._retry_at = 0.0
+
+    # --------------------
+    # 启动/关闭
+    # --------------------
+    def start(self):
+        """重放未写入数据库的条目并启动后台线程"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._replay()
+        self._file = open(self.path, "ab")
+        self._thread = threading.Thread(target=self._run, name="review-journal", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout=10):
+        """尽量写完剩余条目后停止后台线程，返回仍未写入数据库的条目数"""
+        with self._cond:
+            if self._file is None:
+                return len(self._pending)
+            self._stopping = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout)
+        with self._cond:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+            remaining = len(self._pending)
+        if remaining:
+            print(f"{remaining} 条答题记录尚未写入数据库，下次启动时补写")
+        return remaining
+
+    # --------------------
+    # 写入
+    # --------------------
+    def append(self, question_id, user_answer, rating, user_id=None, duration_seconds=None):
+        """追加一条答题记录，返回其幂等键"""
+        entry = {
+            "key": uuid.uuid4().hex,
+            "question_id": question_id,
+            "user_answer": user_answer,
+            "rating": rating,
+            "user_id": user_id,
+            "duration_seconds": duration_seconds,
+            "reviewed_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._cond:
+            if self._file is None:
+                raise RuntimeError("答题日志未启动")
+            self._file.write(line)
+            self._file.flush()
+            self._offset += len(line)
+            self._pending.append((entry, self._offset))
+            self._dirty = True
+            self._cond.notify()
+        return entry["key"]
+
+    def pending_count(self):
+        """尚未写入数据库的条目数"""
+        with self._cond:
+            return len(self._pending)
+
+    # --------------------
+    # 内部方法
+    # --------------------
+    def _replay(self):
+        """从检查点读取未写入的条目；末尾写了一半的行（崩溃时）直接截掉"""
+        if not os.path.exists(self.path):
+            return
+        size = os.path.getsize(self.path)
+        start = self._read_checkpoint()
+        if start > size:  # 清空日志后、写检查点前崩溃
+            start = 0
+        end = start
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                end += len(line)
+                self._pending.append((entry, end))
+        if end < size:
+            with open(self.path, "r+b") as f:
+                f.truncate(end)
+        self._offset = end
+        if self._pending:
+            print(f"发现 {len(self._pending)} 条未写入数据库的答题记录，正在补写")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopping and not (self._pending and self._batch_ready()):
+                    self._cond.wait(self.sync_interval)
+                stopping = self._stopping
+                dirty, self._dirty = self._dirty, False
+                batch = []
+                if self._pending and (stopping or self._batch_ready()):
+                    batch = list(islice(self._pending, self.batch_size))
+            if dirty:
+                os.fsync(self._file.fileno())
+            flushed = self._flush(batch) if batch else False
+            if stopping and not flushed:
+                return
+
+    def _batch_ready(self):
+        """不在失败退避期内"""
+        return time.monotonic() >= self._retry_at
+
+    def _flush(self, batch):
+        """写入一批条目，返回是否有进展"""
+        try:
+            self.flush_fn([entry for entry, _ in batch])
+        except Exception as e:
+            if self.is_transient(e):
+                self._delay_retry(e)
+                return False
+            # 整批失败但不是临时性错误：逐条写入，定位无法写入的条目
+            for item in batch:
+                try:
+                    self.flush_fn([item[0]])
+                except Exception as item_error:
+                    if self.is_transient(item_error):
+                        self._delay_retry(item_error)
+                        return False
+                    self._dead_letter(item[0], item_error)
+                self._done([item])
+            return True
+        self._done(batch)
+        self._backoff = 0
+        return True
+
+    def _delay_retry(self, error):
+        self._backoff = min(max(self._backoff * 2, 0.5), self.max_backoff)
+        self._retry_at = time.monotonic() + self._backoff
+        print(f"答题记录写入数据库失败，{self._backoff:.1f} 秒后重试：{str(error)}")
+
+    def _done(self, items):
+        """移除已写入的条目并推进检查点，日志全部写完且过大时清空"""
+        with self._cond:
+            for _ in items:
+                self._pending.popleft()
+            checkpoint = items[-1][1]
+            if not self._pending and self._offset >= self.compact_bytes:
+                self._file.flush()
+                self._file.truncate(0)
+                self._offset = 0
+                checkpoint = 0
+        self._write_checkpoint(checkpoint)
+
+    def _dead_letter(self, entry, error):
+        """无法写入数据库的条目转存到 .failed 文件，便于人工处理"""
+        print(f"答题记录无法写入数据库，已转存到 {self.failed_path}：{str(error)}")
+        with open(self.failed_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({**entry, "error": str(error)}, ensure_ascii=False) + "\n")
+
+    def _read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _write_checkpoint(self, offset):
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(str(offset))
+        os.replace(tmp_path, self.checkpoint_path)
@@ -10,20 +10,33 @@ from datetime import datetime, timedelta
 
 class ReviewScheduler:
     interval = [0, 1, 3, 5, 7]  # 问题重复算法参数:天
+    max_level = 5
 
     @staticmethod
-    def update_question_level(current_level, rating):
-        """根据自评分更新掌握级别"""
+    def level_delta(rating):
+        """自评分对应的级别变化"""
         # 调整规则
         # - 评分 4-5：升级
         # - 评分 3：保持
         # - 评分 1-2：降级
+        if rating is None:
+            return 0
         if rating >= 4:  # 很好
-            return min(5, current_level + 1)
+            return 1
         elif rating <= 2:  # 差
-            return max(0, current_level - 1)
+            return -1
         else:  # 一般
-            return current_level
+            return 0
+
+    @staticmethod
+    def update_question_level(current_level, rating):
+        """根据自评分更新掌握级别"""
+        return min(ReviewScheduler.max_level, max(0, current_level + ReviewScheduler.level_delta(rating)))
+
+    @staticmethod
+    def review_times(reviewed_at):
+        """各掌握级别对应的下次复习时间（下标为级别），完全掌握的级别不在列表中"""
+        return [reviewed_at + timedelta(days=days) for days in ReviewScheduler.interval]
 
     @staticmethod
     def calculate_next_review(level):
@@ -0,0 +1,214 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : search.py
+@Author  : admin1
+@Date    : 2026/10/17 15:10
+@Description : 题库全文检索（进程内倒排索引 + BM25 排序）
+"""
+import bisect
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+
+from src.normalize import normalize_question_text
+
+# 连续的中日韩字符按二元组切分（与 MySQL ngram_token_size=2 一致），其余按字母数字单词切分
+_TOKEN_RE = re.compile(r'[㐀-鿿豈-﫿]+|[0-9a-z_]+')
+_CJK_RE = re.compile(r'[㐀-鿿豈-﫿]')
+
+# 字段权重：题目和分类命中比答案命中更重要
+FIELD_WEIGHTS = (('question', 3), ('category', 2), ('answer', 1))
+
+
+def tokenize(text):
+    """归一化后切词：中文二元组 + 英文/数字单词"""
+    tokens = []
+    for run in _TOKEN_RE.findall(normalize_question_text(text)):
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+class SearchIndex:
+    """
+    进程内倒排索引，BM25 打分
+    - 候选集只由区分度高的词（文档频率低于 candidate_df_ratio）的倒排表合并产生，
+      高频词只对候选文档加分，避免"什么""如何"之类的词拖慢检索
+    - 查询里全是高频词时，只取最稀有词按单词得分排序后的前 fallback_candidates 篇作为候选
+      （得分排序结果按词缓存），命中总数为该词的文档频率
+    - 查询的最后一个英文词按前缀展开，支持边输入边搜索
+    """
+
+    def __init__(self, k1=1.2, b=0.75, candidate_df_ratio=0.05, fallback_candidates=2000,
+                 max_prefix_expansions=20):
+        self.k1 = k1
+        self.b = b
+        self.candidate_df_ratio = candidate_df_ratio
+        self.fallback_candidates = fallback_candidates
+        self.max_prefix_expansions = max_prefix_expansions
+
+        self._lock = threading.RLock()
+        self._postings = {}  # term -> {doc_id: 加权词频}
+        self._doc_len = {}  # doc_id -> 加权文档长度
+        self._doc_terms = {}  # doc_id -> 该文档的词集合（删除时使用）
+        self._doc_meta = {}  # doc_id -> (category, difficulty)，用于过滤
+        self._total_len = 0
+        self._ascii_terms = []  # 已排序的英文词表，用于前缀展开
+        self._ascii_dirty = False
+        self._impact_cache = {}  # term -> 按单词得分降序的 doc_id 列表
+        self.max_doc_id = 0  # 已索引的最大题目 id，用于增量同步
+        self.ready = False  # 全量构建完成后置为 True
+
+    def __len__(self):
+        with self._lock:
+            return len(self._doc_len)
+
+    def add(self, doc_id, question, answer='', category='', difficulty=''):
+        """添加或替换一道题目"""
+        weighted = Counter()
+        fields = {'question': question, 'answer': answer, 'category': category}
+        for field, weight in FIELD_WEIGHTS:
+            for term in tokenize(fields[field] or ''):
+                weighted[term] += weight
+        with self._lock:
+            if doc_id in self._doc_len:
+                self._remove_locked(doc_id)
+            for term, tf in weighted.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    if term.isascii():
+                        self._ascii_dirty = True
+                postings[doc_id] = tf
+                self._impact_cache.pop(term, None)
+            length = sum(weighted.values())
+            self._doc_len[doc_id] = length
+            self._doc_terms[doc_id] = tuple(weighted)
+            self._doc_meta[doc_id] = (category, difficulty)
+            self._total_len += length
+            self.max_doc_id = max(self.max_doc_id, doc_id)
+
+    def remove(self, doc_id):
+        """删除一道题目"""
+        with self._lock:
+            if doc_id in self._doc_len:
+                self._remove_locked(doc_id)
+
+    def search(self, query, filters=None, limit=20, offset=0):
+        """
+        检索
+        :param filters: {'category': ..., 'difficulty': ...}，值为 None 或缺省表示不过滤
+        :return: (按得分降序的 [(doc_id, score)], 命中总数)
+        """
+        query_terms = tokenize(query)
+        if not query_terms:
+            return [], 0
+        filters = {k: v for k, v in (filters or {}).items() if v}
+        with self._lock:
+            doc_count = len(self._doc_len)
+            if not doc_count:
+                return [], 0
+            terms = self._expand_terms(query_terms)
+            postings = [(term, self._postings[term]) for term in terms if term in self._postings]
+            if not postings:
+                return [], 0
+            avgdl = self._total_len / doc_count
+
+            # 候选集：区分度高的词的倒排表；都很常见时退回到最稀有词得分最高的一批文档
+            postings.sort(key=lambda item: len(item[1]))
+            max_df = max(1, int(doc_count * self.candidate_df_ratio))
+            selective = [p for _, p in postings if len(p) <= max_df]
+            total = None
+            if selective:
+                candidates = set()
+                for p in selective:
+                    candidates.update(p)
+                if filters:
+                    candidates = {d for d in candidates if self._match_filters(d, filters)}
+            else:
+                rarest_term, rarest = postings[0]
+                wanted = max(self.fallback_candidates, offset + limit)
+                candidates = []
+                for doc_id in self._impact_order(rarest_term, rarest, avgdl):
+                    if not filters or self._match_filters(doc_id, filters):
+                        candidates.append(doc_id)
+                        if len(candidates) >= wanted:
+                            break
+                total = len(rarest) if not filters else None
+
+            scores = dict.fromkeys(candidates, 0.0)
+            for term, p in postings:
+                df = len(p)
+                idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+                # 候选较少时逐个查倒排表，否则遍历倒排表
+                if len(scores) < df:
+                    items = ((d, p[d]) for d in scores if d in p)
+                else:
+                    items = ((d, tf) for d, tf in p.items() if d in scores)
+                for doc_id, tf in items:
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_len[doc_id] / avgdl)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        top = heapq.nlargest(offset + limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return top[offset:offset + limit], total if total is not None else len(scores)
+
+    # --------------------
+    # 内部方法
+    # --------------------
+    def _remove_locked(self, doc_id):
+        for term in self._doc_terms.pop(doc_id, ()):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                self._impact_cache.pop(term, None)
+                if not postings:
+                    del self._postings[term]
+                    if term.isascii():
+                        self._ascii_dirty = True
+        self._total_len -= self._doc_len.pop(doc_id, 0)
+        self._doc_meta.pop(doc_id, None)
+
+    def _impact_order(self, term, postings, avgdl):
+        """该词倒排表按单词 BM25 得分（与 idf 无关的部分）降序排列，结果缓存到词变化为止"""
+        order = self._impact_cache.get(term)
+        if order is None:
+            def impact(doc_id):
+                tf = postings[doc_id]
+                norm = self.k1 * (1 - self.b + self.b * self._doc_len[doc_id] / avgdl)
+                return tf / (tf + norm)
+
+            order = sorted(postings, key=impact, reverse=True)
+            self._impact_cache[term] = order
+        return order
+
+    def _expand_terms(self, query_terms):
+        """去重并把最后一个英文词按前缀展开"""
+        terms = list(dict.fromkeys(query_terms))
+        last = query_terms[-1]
+        if last.isascii() and last not in self._postings:
+            if self._ascii_dirty:
+                self._ascii_terms = sorted(t for t in self._postings if t.isascii())
+                self._ascii_dirty = False
+            start = bisect.bisect_left(self._ascii_terms, last)
+            expansions = []
+            for term in self._ascii_terms[start:start + self.max_prefix_expansions]:
+                if not term.startswith(last):
+                    break
+                expansions.append(term)
+            terms.remove(last)
+            terms.extend(expansions)
+        return terms
+
+    def _match_filters(self, doc_id, filters):
+        category, difficulty = self._doc_meta.get(doc_id, (None, None))
+        if 'category' in filters and category != filters['category']:
+            return False
+        if 'difficulty' in filters and difficulty != filters['difficulty']:
+            return False
+        return True
@@ -0,0 +1,257 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : snapshot.py
+@Author  : admin1
+@Date    : 2026/10/17 19:30
+@Description : 题库二进制快照（列式存储 + mmap 按需读取，启动时不必逐行载入题库）
+"""
+import bisect
+import json
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+
+MAGIC = b"ITQS"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sII")  # magic, 格式版本, 元数据长度
+_ALIGN = 8
+
+# (段名, array 类型码)；文本列为 偏移数组(n+1 个) + UTF-8 拼接块
+_SECTIONS = (
+    ("id", "q"),
+    ("level", "b"),
+    ("difficulty", "B"),  # 难度编码，0 表示 NULL
+    ("category", "I"),  # 分类编码，0 表示 NULL
+    ("question_offsets", "Q"),
+    ("question_text", "B"),
+    ("answer_offsets", "Q"),
+    ("answer_text", "B"),
+)
+
+
+class SnapshotError(Exception):
+    """快照文件损坏或版本不兼容"""
+
+
+def _read_fingerprint(cursor):
+    cursor.execute("SELECT COUNT(*), MAX(id), MAX(updated_at) FROM questions")
+    count, max_id, updated_at = cursor.fetchone()
+    # SQLite 的聚合结果不经过类型转换，是字符串；str(datetime) 与之格式相同
+    return [count, max_id or 0, str(updated_at) if updated_at is not None else None]
+
+
+def question_fingerprint(db):
+    """题库指纹：题目数、最大 id、最后修改时间，任一变化说明快照已过期"""
+    return db.pool.run(lambda conn: _read_fingerprint(conn.cursor()))
+
+
+def write_snapshot(db, path, chunk_rows=5000):
+    """
+    把题库按 id 升序流式写成快照文件（先写临时文件再改名）
+    文本块边读边写入临时文件，内存中只保留定长列
+    :return: 写入的题目数
+    """
+    ids, levels, difficulties, categories = array("q"), array("b"), array("B"), array("I")
+    offsets = {"question": array("Q", [0]), "answer": array("Q", [0])}
+    category_codes, difficulty_codes = {}, {}
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    blobs = {field: tempfile.TemporaryFile(dir=directory) for field in offsets}
+
+    def encode(codes, value):
+        if value is None:
+            return 0
+        return codes.setdefault(value, len(codes) + 1)
+
+    def work(conn):
+        # 指纹与数据在同一个只读快照中读取，两者一致
+        db.backend.begin_snapshot(conn)
+        cursor = db.backend.stream_cursor(conn)
+        try:
+            fingerprint = _read_fingerprint(cursor)
+            cursor.execute("SELECT id, level, difficulty, category, question, answer FROM questions ORDER BY id")
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    return fingerprint
+                for question_id, level, difficulty, category, question, answer in rows:
+                    ids.append(question_id)
+                    levels.append(level or 0)
+                    difficulties.append(encode(difficulty_codes, difficulty))
+                    categories.append(encode(category_codes, category))
+                    for field, text in (("question", question), ("answer", answer)):
+                        data = (text or "").encode("utf-8")
+                        blobs[field].write(data)
+                        offsets[field].append(offsets[field][-1] + len(data))
+        finally:
+            cursor.close()
+            conn.rollback()
+
+    try:
+        fingerprint = db.pool.run(work)
+        columns = {
+            "id": ids, "level": levels, "difficulty": difficulties, "category": categories,
+            "question_offsets": offsets["question"], "question_text": blobs["question"],
+            "answer_offsets": offsets["answer"], "answer_text": blobs["answer"],
+        }
+        _write_file(path, fingerprint, len(ids), category_codes, difficulty_codes, columns)
+    finally:
+        for blob in blobs.values():
+            blob.close()
+    return len(ids)
+
+
+def _write_file(path, fingerprint, count, category_codes, difficulty_codes, columns):
+    def size_of(data):
+        return len(data) * data.itemsize if isinstance(data, array) else data.seek(0, os.SEEK_END)
+
+    # 段偏移相对于数据区起点，数据区从头部之后按 8 字节对齐开始
+    sections, position = {}, 0
+    for name, typecode in _SECTIONS:
+        size = size_of(columns[name])
+        sections[name] = [position, size, typecode]
+        position += size + (-size) % _ALIGN
+    meta = json.dumps({
+        "count": count,
+        "fingerprint": fingerprint,
+        "categories": sorted(category_codes, key=category_codes.get),
+        "difficulties": sorted(difficulty_codes, key=difficulty_codes.get),
+        "sections": sections,
+    }, ensure_ascii=False).encode("utf-8")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(meta)) + meta
+        f.write(header + b"\0" * ((-len(header)) % _ALIGN))
+        for name, _ in _SECTIONS:
+            data = columns[name]
+            if isinstance(data, array):
+                data.tofile(f)
+            else:
+                data.seek(0)
+                while True:
+                    chunk = data.read(1 << 20)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+            f.write(b"\0" * ((-sections[name][1]) % _ALIGN))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class QuestionSnapshot:
+    """
+    只读的题库快照
+    - 打开时只解析头部，各列通过 mmap 上的 memoryview 直接访问，由操作系统按需分页载入
+    - 按 id 二分定位；行 dict 只在取出某一行时才构建
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # 空文件
+                raise SnapshotError(f"快照文件为空：{path}")
+        self._view = memoryview(self._mm)
+        self._columns = {}
+        try:
+            magic, version, meta_len = _HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC:
+                raise SnapshotError(f"不是题库快照文件：{path}")
+            if version != FORMAT_VERSION:
+                raise SnapshotError(f"快照格式版本 {version} 与当前程序（{FORMAT_VERSION}）不一致")
+            meta = json.loads(self._mm[_HEADER.size:_HEADER.size + meta_len])
+            base = _HEADER.size + meta_len
+            base += (-base) % _ALIGN
+            for name, (offset, size, typecode) in meta["sections"].items():
+                if base + offset + size > len(self._mm):
+                    raise SnapshotError(f"快照文件不完整：{path}")
+                self._columns[name] = self._view[base + offset:base + offset + size].cast(typecode)
+        except (SnapshotError, struct.error, ValueError, KeyError) as e:
+            self.close()
+            if isinstance(e, SnapshotError):
+                raise
+            raise SnapshotError(f"快照文件损坏：{str(e)}")
+        self.count = meta["count"]
+        self.fingerprint = meta["fingerprint"]
+        self.categories = [None] + meta["categories"]
+        self.difficulties = [None] + meta["difficulties"]
+        self._category_codes = {name: code for code, name in enumerate(self.categories) if code}
+        self._difficulty_codes = {name: code for code, name in enumerate(self.difficulties) if code}
+        self._ids = self._columns["id"]
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        """立即解除映射，只能在确定没有其他线程使用该快照时调用；否则丢弃引用，由垃圾回收释放"""
+        # memoryview 全部释放后才能关闭 mmap
+        for view in self._columns.values():
+            view.release()
+        self._columns = {}
+        self._ids = None
+        self._view.release()
+        self._mm.close()
+
+    def position(self, question_id):
+        """题目在快照中的下标，不存在时返回 None"""
+        i = bisect.bisect_left(self._ids, question_id)
+        return i if i < self.count and self._ids[i] == question_id else None
+
+    def _text(self, field, i, max_chars=None):
+        offsets = self._columns[f"{field}_offsets"]
+        start, end = offsets[i], offsets[i + 1]
+        if max_chars is not None:
+            end = min(end, start + max_chars * 4)  # UTF-8 每个字符最多 4 字节
+        text = self._columns[f"{field}_text"][start:end].tobytes().decode("utf-8", errors="ignore")
+        return text[:max_chars] if max_chars is not None else text
+
+    def row(self, i, max_chars=None, with_answer=False):
+        """第 i 行的 dict（id/question/category/difficulty/level，可选 answer）"""
+        row = {
+            'id': self._ids[i],
+            'question': self._text("question", i, max_chars),
+            'category': self.categories[self._columns["category"][i]],
+            'difficulty': self.difficulties[self._columns["difficulty"][i]],
+            'level': self._columns["level"][i],
+        }
+        if with_answer:
+            row['answer'] = self._text("answer", i)
+        return row
+
+    def rows_by_ids(self, question_ids):
+        """按给定 id 取行，快照中没有的 id 跳过"""
+        rows = {}
+        for question_id in question_ids:
+            i = self.position(question_id)
+            if i is not None:
+                rows[question_id] = self.row(i)
+        return rows
+
+    def page(self, after_id=None, filters=None, limit=100, max_chars=120):
+        """与 QuestionDB.page_questions 相同的 id 倒序游标分页"""
+        end = self.count if after_id is None else bisect.bisect_left(self._ids, after_id)
+        wanted = []
+        for column, codes in (("category", self._category_codes), ("difficulty", self._difficulty_codes)):
+            value = (filters or {}).get(column)
+            if value:
+                if value not in codes:
+                    return []
+                wanted.append((self._columns[column], codes[value]))
+        rows = []
+        for i in range(end - 1, -1, -1):
+            if all(column[i] == code for column, code in wanted):
+                rows.append(self.row(i, max_chars))
+                if len(rows) >= limit:
+                    break
+        return rows
+
+    def iter_documents(self, after_id=0):
+        """按 id 升序逐题产出 (id, question, answer, category, difficulty)，用于构建检索索引"""
+        categories, difficulties = self._columns["category"], self._columns["difficulty"]
+        for i in range(bisect.bisect_right(self._ids, after_id), self.count):
+            yield (self._ids[i], self._text("question", i), self._text("answer", i),
+                   self.categories[categories[i]], self.difficulties[difficulties[i]])
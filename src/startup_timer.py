@@ -0,0 +1,47 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : startup_timer.py
+@Author  : admin1
+@Date    : 2026/10/17 21:40
+@Description : 启动耗时记录（各阶段相对进程启动的时间点，输出启动耗时报告）
+"""
+import threading
+import time
+
+
+class StartupTimer:
+    """
+    记录启动各阶段完成的时间点，可在多个线程中调用 mark()
+    report() 按时间顺序列出各阶段距启动的时间和与上一阶段的间隔
+    """
+
+    def __init__(self, started=None):
+        """:param started: 起点（time.perf_counter()），通常在入口模块最开始取得"""
+        self.started = started if started is not None else time.perf_counter()
+        self._marks = {}
+        self._lock = threading.Lock()
+
+    def mark(self, name):
+        """记录阶段完成，同名阶段只记录第一次"""
+        with self._lock:
+            self._marks.setdefault(name, time.perf_counter() - self.started)
+
+    def has(self, *names):
+        with self._lock:
+            return all(name in self._marks for name in names)
+
+    def elapsed(self, name):
+        """阶段距启动的秒数，未记录时返回 None"""
+        with self._lock:
+            return self._marks.get(name)
+
+    def report(self):
+        """启动耗时报告（多行文本）"""
+        with self._lock:
+            marks = sorted(self._marks.items(), key=lambda item: item[1])
+        lines = ["启动耗时："]
+        previous = 0.0
+        for name, at in marks:
+            lines.append(f"  {name:<16} {at * 1000:8.1f} ms  (+{(at - previous) * 1000:.1f} ms)")
+            previous = at
+        return "\n".join(lines)
@@ -0,0 +1,606 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : storage.py
+@Author  : admin1
+@Date    : 2026/10/17 16:20
+@Description : 存储后端（MySQL / 嵌入式 SQLite），负责建连、建表及 SQL 方言差异
+"""
+import os
+import re
+import sqlite3
+from datetime import date, datetime
+
+try:
+    import pymysql
+    from pymysql.constants import CLIENT
+    from pymysql.cursors import DictCursor
+except ImportError:  # 只使用 SQLite 时可以不安装 PyMySQL
+    pymysql = None
+
+    class DictCursor:
+        """占位：传给 SQLite 连接的 cursor() 时返回 dict 行"""
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data",
+                                   "interview_trainer.db")
+
+# 表结构版本（备份清单中记录，恢复时检查），改动表结构时加一
+SCHEMA_VERSION = 1
+
+# 值得重试的 MySQL 错误：连不上/连接断开/锁等待超时/死锁
+TRANSIENT_ERROR_CODES = {2003, 2006, 2013, 2055, 1205, 1213}
+
+
+class StorageBackend:
+    """
+    存储后端接口
+    QuestionDB 通过连接池借出 connect() 创建的连接执行 SQL（%s 占位符、conn.begin()/commit()、
+    conn.cursor(DictCursor) 返回 dict 行），方言差异由以下属性和方法提供
+    """
+    name = None
+    insert_ignore = "INSERT IGNORE"  # 唯一键冲突时跳过
+    update_ignore = "UPDATE IGNORE"
+    supports_fulltext = False  # 是否有 MATCH ... AGAINST 全文索引
+    now_sql = "CURRENT_TIMESTAMP"  # 数据库服务器的当前本地时间
+    auto_initialize = False  # 连接后是否自动建表
+    max_connections = None  # 连接数上限，None 表示由连接池决定
+
+    def connect(self):
+        """新建一条连接"""
+        raise NotImplementedError
+
+    def ping(self, conn):
+        """检测连接可用，失败时抛异常"""
+
+    def is_transient(self, exc):
+        """异常是否值得换连接重试"""
+        return False
+
+    def create_schema(self, conn):
+        """建表（已存在时跳过）"""
+        raise NotImplementedError
+
+    def upgrade_schema(self, conn):
+        """为旧库补齐列和索引"""
+
+    def on_conflict(self, keys):
+        """upsert 语句中主键/唯一键冲突时的更新子句开头"""
+        raise NotImplementedError
+
+    def excluded(self, column):
+        """upsert 更新子句中引用待插入行的列值"""
+        raise NotImplementedError
+
+    def update_returning(self, cursor, table, assignments, column, expr, where, args):
+        """
+        执行 UPDATE table SET assignments, column = expr WHERE where，并在同一条语句中取回 column 的新值
+        :param args: 依次为 assignments、expr、where 中的参数
+        :return: 新值，没有匹配行时返回 None
+        """
+        raise NotImplementedError
+
+    def is_missing_fulltext_index(self, exc):
+        """异常是否因为缺少全文索引"""
+        return False
+
+    def begin_snapshot(self, conn):
+        """开始只读事务，之后的查询读同一时刻的一致快照，用 conn.rollback() 结束"""
+        raise NotImplementedError
+
+    def stream_cursor(self, conn):
+        """流式游标：fetchmany() 逐批取 tuple 行，结果集不整体载入内存"""
+        return conn.cursor()
+
+
+class MySQLBackend(StorageBackend):
+    name = "mysql"
+    supports_fulltext = True
+
+    def __init__(self, config):
+        if pymysql is None:
+            raise RuntimeError("使用 MySQL 存储需要安装 PyMySQL")
+        self.config = config
+
+    def connect(self):
+        """新建一条连接；使用自动提交，需要事务的写操作显式 begin()"""
+        config = dict(self.config)
+        # rowcount 返回匹配行数而不是实际改变的行数（update_returning 据此判断是否命中）
+        config['client_flag'] = config.get('client_flag', 0) | CLIENT.FOUND_ROWS
+        conn = pymysql.connect(**config)
+        conn.autocommit(True)
+        return conn
+
+    def ping(self, conn):
+        conn.ping(reconnect=False)
+
+    def is_transient(self, exc):
+        if isinstance(exc, (pymysql.err.OperationalError, pymysql.err.InterfaceError)):
+            code = exc.args[0] if exc.args else None
+            return code in TRANSIENT_ERROR_CODES or isinstance(exc, pymysql.err.InterfaceError)
+        return False
+
+    def on_conflict(self, keys):
+        return "ON DUPLICATE KEY UPDATE"
+
+    def excluded(self, column):
+        return f"VALUES({column})"
+
+    def update_returning(self, cursor, table, assignments, column, expr, where, args):
+        # LAST_INSERT_ID(expr) 把新值放进 OK 包的 insert_id，不需要再查询一次
+        cursor.execute(f"UPDATE {table} SET {assignments}, {column} = LAST_INSERT_ID({expr}) WHERE {where}", args)
+        return cursor.lastrowid if cursor.rowcount else None
+
+    def is_missing_fulltext_index(self, exc):
+        # 1191: 找不到匹配的全文索引
+        return isinstance(exc, pymysql.MySQLError) and bool(exc.args) and exc.args[0] == 1191
+
+    def begin_snapshot(self, conn):
+        conn.cursor().execute("START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY")
+
+    def stream_cursor(self, conn):
+        # 服务端游标：结果集留在服务器，按需逐批读取
+        return conn.cursor(pymysql.cursors.SSCursor)
+
+    def create_schema(self, conn):
+        """建库建表"""
+        cursor = conn.cursor()
+        # 执行初始化
+        # 1. 创建数据库
+        cursor.execute(
+            "CREATE DATABASE IF NOT EXISTS interview_trainer DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci"
+        )
+        # 2. 选择数据库
+        cursor.execute("USE interview_trainer")
+        # 3. 创建questions表
+        cursor.execute("""
+                CREATE TABLE IF NOT EXISTS questions (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    question TEXT NOT NULL,
+                    answer TEXT,
+                    category VARCHAR(100),
+                    difficulty ENUM('简单','中等','困难'),
+                    level TINYINT DEFAULT 0 COMMENT '掌握程度(0-5)',
+                    last_reviewed DATETIME,
+                    next_review DATETIME,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    question_hash CHAR(40) COMMENT '归一化题目文本的SHA-1，用于去重',
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '增量同步水位',
+                    UNIQUE KEY uq_question_hash (question_hash),
+                    INDEX idx_updated_at (updated_at),
+                    INDEX idx_category (category),
+                    INDEX idx_difficulty (difficulty),
+                    INDEX idx_next_review (next_review),
+                    FULLTEXT INDEX ft_question_search (question, answer, category) WITH PARSER ngram
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+                """)
+        # 4. 创建review_records表
+        cursor.execute("""
+                CREATE TABLE IF NOT EXISTS review_records (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    question_id INT NOT NULL,
+                    user_answer TEXT,
+                    rating TINYINT COMMENT '用户自评掌握程度(1-5)',
+                    reviewed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    user_id INT,
+                    duration_seconds INT COMMENT '答题用时(秒)',
+                    client_key CHAR(32) COMMENT '客户端幂等键（写后日志条目的 key）',
+                    UNIQUE KEY uq_client_key (client_key),
+                    INDEX idx_user_reviewed (user_id, reviewed_at, question_id, rating, duration_seconds),
+                    INDEX idx_reviewed_at (reviewed_at),
+                    FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE,
+                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+                """)
+        # 5.创建user表
+        cursor.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    username VARCHAR(150) NOT NULL UNIQUE,
+                    password_hash VARCHAR(255) NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+                """)
+        # 6.创建用户复习状态表（每个用户独立的掌握程度与复习计划）
+        cursor.execute("""
+                CREATE TABLE IF NOT EXISTS user_question_state (
+                    user_id INT NOT NULL,
+                    question_id INT NOT NULL,
+                    level TINYINT NOT NULL DEFAULT 0 COMMENT '掌握程度(0-5)',
+                    last_reviewed DATETIME,
+                    next_review DATETIME,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '增量同步水位',
+                    PRIMARY KEY (user_id, question_id),
+                    INDEX idx_user_next_review (user_id, next_review),
+                    INDEX idx_user_updated (user_id, updated_at),
+                    INDEX idx_question (question_id),
+                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+                    FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+                """)
+        # 7.创建答题日汇总表（随答题记录增量维护，统计页直接读取）
+        cursor.execute("""
+                CREATE TABLE IF NOT EXISTS review_daily_stats (
+                    user_id INT NOT NULL DEFAULT 0 COMMENT '0 表示未登录用户',
+                    day DATE NOT NULL,
+                    category VARCHAR(100) NOT NULL,
+                    difficulty VARCHAR(10) NOT NULL,
+                    review_count INT NOT NULL DEFAULT 0,
+                    duration_count INT NOT NULL DEFAULT 0 COMMENT '有用时的记录数',
+                    total_seconds BIGINT NOT NULL DEFAULT 0,
+                    rating_count INT NOT NULL DEFAULT 0 COMMENT '有评分的记录数',
+                    rating_sum BIGINT NOT NULL DEFAULT 0,
+                    min_seconds INT,
+                    max_seconds INT,
+                    PRIMARY KEY (user_id, day, category, difficulty)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+                """)
+        # 8.创建题目删除记录表（离线副本据此删除本地题目）
+        cursor.execute("""
+                CREATE TABLE IF NOT EXISTS question_tombstones (
+                    question_id INT PRIMARY KEY,
+                    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                    INDEX idx_deleted_at (deleted_at)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+                """)
+
+    def upgrade_schema(self, conn):
+        """为旧库补齐新增的列及统计/回顾/检索所需的索引"""
+        cursor = conn.cursor()
+        columns = [
+            ('questions', 'question_hash',
+             "ALTER TABLE questions ADD COLUMN question_hash CHAR(40) COMMENT '归一化题目文本的SHA-1，用于去重'"),
+            ('review_records', 'client_key',
+             "ALTER TABLE review_records ADD COLUMN client_key CHAR(32) COMMENT '客户端幂等键（写后日志条目的 key）'"),
+            ('questions', 'updated_at',
+             "ALTER TABLE questions ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP "
+             "ON UPDATE CURRENT_TIMESTAMP COMMENT '增量同步水位'"),
+            ('user_question_state', 'updated_at',
+             "ALTER TABLE user_question_state ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP "
+             "ON UPDATE CURRENT_TIMESTAMP COMMENT '增量同步水位'"),
+        ]
+        for table, column, ddl in columns:
+            if not self._column_exists(cursor, table, column):
+                cursor.execute(ddl)
+        indexes = [
+            ('questions', 'uq_question_hash',
+             "ALTER TABLE questions ADD UNIQUE KEY uq_question_hash (question_hash)"),
+            ('review_records', 'uq_client_key',
+             "ALTER TABLE review_records ADD UNIQUE KEY uq_client_key (client_key)"),
+            ('questions', 'idx_updated_at',
+             "ALTER TABLE questions ADD INDEX idx_updated_at (updated_at)"),
+            ('user_question_state', 'idx_user_updated',
+             "ALTER TABLE user_question_state ADD INDEX idx_user_updated (user_id, updated_at)"),
+            ('review_records', 'idx_user_reviewed',
+             "ALTER TABLE review_records ADD INDEX idx_user_reviewed "
+             "(user_id, reviewed_at, question_id, rating, duration_seconds)"),
+            ('review_records', 'idx_reviewed_at',
+             "ALTER TABLE review_records ADD INDEX idx_reviewed_at (reviewed_at)"),
+            ('questions', 'ft_question_search',
+             "ALTER TABLE questions ADD FULLTEXT INDEX ft_question_search (question, answer, category) "
+             "WITH PARSER ngram"),
+        ]
+        for table, index, ddl in indexes:
+            if not self._index_exists(cursor, table, index):
+                cursor.execute(ddl)
+
+    @staticmethod
+    def _column_exists(cursor, table, column):
+        cursor.execute('''
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        ''', (table, column))
+        return cursor.fetchone()[0] > 0
+
+    @staticmethod
+    def _index_exists(cursor, table, index):
+        cursor.execute('''
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        ''', (table, index))
+        return cursor.fetchone()[0] > 0
+
+
+# --------------------
+# SQLite
+# --------------------
+# 日期时间按 MySQL DATETIME 的格式存为文本，字符串比较与时间先后一致
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" ", "seconds"))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_converter("DATETIME", lambda raw: datetime.fromisoformat(raw.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda raw: datetime.fromisoformat(raw.decode()))
+sqlite3.register_converter("DATE", lambda raw: date.fromisoformat(raw.decode()))
+
+_PLACEHOLDER_RE = re.compile(r'%s|%%')
+
+
+class _SQLiteCursor:
+    """把 %s 占位符转换为 ?，cursor(DictCursor) 时返回 dict 行"""
+    _sql_cache = {}
+
+    def __init__(self, raw, as_dict):
+        self._raw = raw
+        self._as_dict = as_dict
+
+    @classmethod
+    def _translate(cls, sql):
+        translated = cls._sql_cache.get(sql)
+        if translated is None:
+            translated = _PLACEHOLDER_RE.sub(lambda m: '?' if m.group() == '%s' else '%', sql)
+            cls._sql_cache[sql] = translated
+        return translated
+
+    def execute(self, sql, args=None):
+        self._raw.execute(self._translate(sql), tuple(args) if args is not None else ())
+        return self._raw.rowcount
+
+    def executemany(self, sql, seq_of_args):
+        self._raw.executemany(self._translate(sql), seq_of_args)
+        return self._raw.rowcount
+
+    def _row(self, row):
+        if row is None or not self._as_dict:
+            return row
+        return dict(zip([column[0] for column in self._raw.description], row))
+
+    def fetchone(self):
+        return self._row(self._raw.fetchone())
+
+    def fetchmany(self, size):
+        rows = self._raw.fetchmany(size)
+        if not self._as_dict:
+            return rows
+        columns = [column[0] for column in self._raw.description]
+        return [dict(zip(columns, row)) for row in rows]
+
+    def fetchall(self):
+        rows = self._raw.fetchall()
+        if not self._as_dict:
+            return rows
+        columns = [column[0] for column in self._raw.description]
+        return [dict(zip(columns, row)) for row in rows]
+
+    @property
+    def description(self):
+        return self._raw.description
+
+    @property
+    def rowcount(self):
+        return self._raw.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._raw.lastrowid
+
+    def close(self):
+        self._raw.close()
+
+
+class _SQLiteConnection:
+    """sqlite3 连接的包装，提供与 pymysql 连接一致的 begin()/commit()/rollback()/cursor()"""
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def cursor(self, cursor_class=None):
+        return _SQLiteCursor(self.raw.cursor(), as_dict=cursor_class is not None)
+
+    def begin(self):
+        # 立即取得写锁，避免读后写时升级锁失败
+        self.raw.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        self.raw.close()
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    嵌入式 SQLite 存储（单机单用户部署、本地开发与性能测试）
+    WAL 模式下读写互不阻塞，写操作由 SQLite 串行化
+    """
+    name = "sqlite"
+    insert_ignore = "INSERT OR IGNORE"
+    update_ignore = "UPDATE OR IGNORE"
+    now_sql = "datetime('now', 'localtime')"
+    auto_initialize = True
+
+    PRAGMAS = (
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL",  # WAL 下 NORMAL 不会损坏数据库，只可能丢失最后的事务
+        "PRAGMA foreign_keys = ON",
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA cache_size = -65536",  # 64MB 页缓存
+        "PRAGMA mmap_size = 268435456",  # 256MB 内存映射读
+    )
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH, busy_timeout=5):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        if path == ":memory:":
+            self.max_connections = 1  # 内存库每条连接都是独立的库
+
+    def connect(self):
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        raw = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                              detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        for pragma in self.PRAGMAS:
+            raw.execute(pragma)
+        return _SQLiteConnection(raw)
+
+    def is_transient(self, exc):
+        # 等待写锁超时
+        return isinstance(exc, sqlite3.OperationalError) and "locked" in str(exc)
+
+    def on_conflict(self, keys):
+        return f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET"
+
+    def excluded(self, column):
+        return f"excluded.{column}"
+
+    def update_returning(self, cursor, table, assignments, column, expr, where, args):
+        cursor.execute(f"UPDATE {table} SET {assignments}, {column} = {expr} WHERE {where} RETURNING {column}", args)
+        rows = cursor.fetchall()
+        return rows[0][0] if rows else None
+
+    def begin_snapshot(self, conn):
+        # 延迟事务：第一次读取时取得 WAL 快照，不阻塞写入
+        conn.raw.execute("BEGIN")
+
+    def create_schema(self, conn):
+        """建表，索引与 MySQL 版本一一对应（全文检索使用进程内索引）"""
+        conn.raw.executescript("""
+        CREATE TABLE IF NOT EXISTS questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            question TEXT NOT NULL,
+            answer TEXT,
+            category VARCHAR(100),
+            difficulty TEXT CHECK (difficulty IN ('简单','中等','困难')),
+            level INTEGER DEFAULT 0,
+            last_reviewed DATETIME,
+            next_review DATETIME,
+            created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+            question_hash CHAR(40),
+            updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_question_hash ON questions (question_hash);
+        CREATE INDEX IF NOT EXISTS idx_category ON questions (category);
+        CREATE INDEX IF NOT EXISTS idx_difficulty ON questions (difficulty);
+        CREATE INDEX IF NOT EXISTS idx_next_review ON questions (next_review);
+
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username VARCHAR(150) NOT NULL UNIQUE,
+            password_hash VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+        );
+
+        CREATE TABLE IF NOT EXISTS review_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            question_id INTEGER NOT NULL REFERENCES questions(id) ON DELETE CASCADE,
+            user_answer TEXT,
+            rating INTEGER,
+            reviewed_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+            user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+            duration_seconds INTEGER,
+            client_key CHAR(32)
+        );
+        CREATE INDEX IF NOT EXISTS idx_user_reviewed
+            ON review_records (user_id, reviewed_at, question_id, rating, duration_seconds);
+        CREATE INDEX IF NOT EXISTS idx_reviewed_at ON review_records (reviewed_at);
+        CREATE INDEX IF NOT EXISTS idx_review_question ON review_records (question_id);
+
+        CREATE TABLE IF NOT EXISTS user_question_state (
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            question_id INTEGER NOT NULL REFERENCES questions(id) ON DELETE CASCADE,
+            level INTEGER NOT NULL DEFAULT 0,
+            last_reviewed DATETIME,
+            next_review DATETIME,
+            updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+            PRIMARY KEY (user_id, question_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_user_next_review ON user_question_state (user_id, next_review);
+        CREATE INDEX IF NOT EXISTS idx_question ON user_question_state (question_id);
+
+        CREATE TABLE IF NOT EXISTS review_daily_stats (
+            user_id INTEGER NOT NULL DEFAULT 0,
+            day DATE NOT NULL,
+            category VARCHAR(100) NOT NULL,
+            difficulty VARCHAR(10) NOT NULL,
+            review_count INTEGER NOT NULL DEFAULT 0,
+            duration_count INTEGER NOT NULL DEFAULT 0,
+            total_seconds INTEGER NOT NULL DEFAULT 0,
+            rating_count INTEGER NOT NULL DEFAULT 0,
+            rating_sum INTEGER NOT NULL DEFAULT 0,
+            min_seconds INTEGER,
+            max_seconds INTEGER,
+            PRIMARY KEY (user_id, day, category, difficulty)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS question_tombstones (
+            question_id INTEGER PRIMARY KEY,
+            deleted_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+        );
+        CREATE INDEX IF NOT EXISTS idx_deleted_at ON question_tombstones (deleted_at);
+        """)
+
+    def upgrade_schema(self, conn):
+        """为旧库补齐新增的列，并创建依赖这些列的索引和触发器"""
+        columns = [
+            ('review_records', 'client_key', "CHAR(32)"),
+            ('questions', 'updated_at', "TIMESTAMP"),
+            ('user_question_state', 'updated_at', "TIMESTAMP"),
+        ]
+        for table, column, column_type in columns:
+            existing = {row[1] for row in conn.raw.execute(f"PRAGMA table_info({table})")}
+            if column not in existing:
+                conn.raw.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+        conn.raw.executescript("""
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_client_key ON review_records (client_key);
+        CREATE INDEX IF NOT EXISTS idx_updated_at ON questions (updated_at);
+        CREATE INDEX IF NOT EXISTS idx_user_updated ON user_question_state (user_id, updated_at);
+
+        -- 旧库补列后没有默认值：回填已有行，新插入的行由触发器补上
+        UPDATE questions SET updated_at = datetime('now', 'localtime') WHERE updated_at IS NULL;
+        UPDATE user_question_state SET updated_at = datetime('now', 'localtime') WHERE updated_at IS NULL;
+        CREATE TRIGGER IF NOT EXISTS trg_questions_inserted_at AFTER INSERT ON questions
+        FOR EACH ROW WHEN NEW.updated_at IS NULL
+        BEGIN
+            UPDATE questions SET updated_at = datetime('now', 'localtime') WHERE id = NEW.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_user_state_inserted_at AFTER INSERT ON user_question_state
+        FOR EACH ROW WHEN NEW.updated_at IS NULL
+        BEGIN
+            UPDATE user_question_state SET updated_at = datetime('now', 'localtime')
+            WHERE user_id = NEW.user_id AND question_id = NEW.question_id;
+        END;
+
+        -- 相当于 MySQL 的 ON UPDATE CURRENT_TIMESTAMP；显式写入 updated_at 时（同步副本）保留写入的值
+        CREATE TRIGGER IF NOT EXISTS trg_questions_updated_at AFTER UPDATE ON questions
+        FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+        BEGIN
+            UPDATE questions SET updated_at = datetime('now', 'localtime') WHERE id = NEW.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_user_state_updated_at AFTER UPDATE ON user_question_state
+        FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+        BEGIN
+            UPDATE user_question_state SET updated_at = datetime('now', 'localtime')
+            WHERE user_id = NEW.user_id AND question_id = NEW.question_id;
+        END;
+        """)
+        # 更新统计信息，帮助查询规划器选择索引
+        conn.raw.execute("PRAGMA optimize")
+
+
+def configured_replica_path():
+    """config/db_config.py 中配置的离线副本路径（REPLICA_PATH），仅在使用 MySQL 时生效"""
+    try:
+        from config import db_config
+    except ImportError:
+        return None
+    if getattr(db_config, 'DB_BACKEND', 'mysql') != 'mysql':
+        return None
+    return getattr(db_config, 'REPLICA_PATH', None)
+
+
+def create_backend():
+    """
+    按 config/db_config.py 选择存储后端
+    - DB_BACKEND = 'mysql'（默认）：使用 DB_CONFIG 连接 MySQL
+    - DB_BACKEND = 'sqlite'：使用 SQLITE_PATH 指定的数据库文件（默认 data/interview_trainer.db）
+    没有 config/db_config.py 时使用 SQLite
+    """
+    try:
+        from config import db_config
+    except ImportError:
+        return SQLiteBackend()
+    backend = getattr(db_config, 'DB_BACKEND', 'mysql')
+    if backend == 'sqlite':
+        return SQLiteBackend(getattr(db_config, 'SQLITE_PATH', DEFAULT_SQLITE_PATH))
+    if backend == 'mysql':
+        return MySQLBackend(db_config.DB_CONFIG)
+    raise ValueError(f"未知的存储后端：{backend}")
@@ -0,0 +1,167 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : task_runner.py
+@Author  : admin1
+@Date    : 2026/10/17 20:40
+@Description : 界面后台任务执行器（线程池执行耗时调用，结果回到界面主线程回调）
+"""
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class Task:
+    """一次提交的后台任务；cancel() 后其结果被丢弃，不再回调"""
+    __slots__ = ('key', 'cancelled')
+
+    def __init__(self, key):
+        self.key = key
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TaskRunner:
+    """
+    后台任务执行器
+    - 固定大小的线程池执行数据库等耗时调用，界面主线程只负责提交和回调
+    - 回调经结果队列由 after() 定时轮询在主线程执行，每次轮询最多占用 frame_budget 秒，
+      大量结果同时返回也不会卡住界面；没有进行中的任务时停止轮询
+    - 同一 key 提交新任务时取消旧任务（如被新输入取代的搜索）：尚未开始的不再执行，已在执行的结果丢弃
+    - on_busy(n) 在进行中的任务数变化时回调，用于显示加载状态
+    submit()/cancel_all()/shutdown() 只能在界面主线程调用
+    """
+
+    def __init__(self, after, max_workers=4, poll_interval=16, frame_budget=0.008, on_busy=None, on_error=None):
+        """
+        :param after: after(ms, callback)，如 Tk 控件的 after 方法
+        :param on_error: on_error(exc) 任务未指定 on_error 时的默认错误处理
+        """
+        self._after = after
+        self.poll_interval = poll_interval
+        self.frame_budget = frame_budget
+        self.on_busy = on_busy
+        self.on_error = on_error
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ui-task")
+        self._results = queue.SimpleQueue()
+        self._latest = {}  # key -> 该 key 最新的任务
+        self._pending = 0
+        self._polling = False
+        self._closed = False
+        self._futures = set()  # 尚未结束的工作线程任务，shutdown() 据此等待
+        self._futures_lock = threading.Lock()
+
+    @property
+    def pending(self):
+        """进行中的任务数"""
+        return self._pending
+
+    def submit(self, fn, *args, key=None, on_done=None, on_error=None, **kwargs):
+        """
+        在后台线程执行 fn(*args, **kwargs)，成功后在主线程回调 on_done(result)，失败回调 on_error(exc)
+        :return: Task
+        """
+        if self._closed:
+            raise RuntimeError("任务执行器已关闭")
+        task = Task(key)
+        if key is not None:
+            previous = self._latest.get(key)
+            if previous is not None:
+                previous.cancel()
+            self._latest[key] = task
+        self._set_pending(self._pending + 1)
+        future = self._executor.submit(self._run, task, fn, args, kwargs, on_done, on_error)
+        with self._futures_lock:
+            self._futures.add(future)
+        future.add_done_callback(self._forget)
+        if not self._polling:
+            self._polling = True
+            self._after(self.poll_interval, self._poll)
+        return task
+
+    def cancel(self, key):
+        """取消该 key 进行中的任务"""
+        task = self._latest.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    def cancel_all(self):
+        """取消所有带 key 的任务（如登出时）"""
+        for task in self._latest.values():
+            task.cancel()
+        self._latest.clear()
+
+    def shutdown(self, timeout=0):
+        """
+        停止接收任务，未开始的任务不再执行，之后不再回调
+        :param timeout: 最多等待已在执行的任务结束的秒数，None 为一直等待
+        :return: 所有任务是否都已结束（超时返回 False）
+        """
+        self._closed = True
+        self.cancel_all()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._futures_lock:
+            futures = list(self._futures)
+        if not futures:
+            return True
+        if timeout == 0:
+            return all(future.done() for future in futures)
+        return not wait(futures, timeout).not_done
+
+    def _forget(self, future):
+        with self._futures_lock:
+            self._futures.discard(future)
+
+    def _run(self, task, fn, args, kwargs, on_done, on_error):
+        """工作线程：执行任务并把结果放入队列"""
+        if task.cancelled:
+            self._results.put((task, None, None, None, None))
+            return
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._results.put((task, False, e, None, on_error))
+        else:
+            self._results.put((task, True, result, on_done, None))
+
+    def _poll(self):
+        """主线程：在时间预算内处理已完成的任务"""
+        deadline = time.perf_counter() + self.frame_budget
+        finished = 0
+        while time.perf_counter() < deadline:
+            try:
+                task, ok, value, on_done, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            finished += 1
+            if task.key is not None and self._latest.get(task.key) is task:
+                del self._latest[task.key]
+            if task.cancelled or self._closed:
+                continue
+            try:
+                if ok:
+                    if on_done is not None:
+                        on_done(value)
+                else:
+                    handler = on_error or self.on_error
+                    if handler is not None:
+                        handler(value)
+            except Exception:
+                traceback.print_exc()
+        if finished:
+            self._set_pending(self._pending - finished)
+        if self._closed or (not self._pending and self._results.empty()):
+            self._polling = False
+            return
+        self._after(self.poll_interval, self._poll)
+
+    def _set_pending(self, count):
+        self._pending = count
+        if self.on_busy is not None and not self._closed:
+            try:
+                self.on_busy(count)
+            except Exception:
+                traceback.print_exc()
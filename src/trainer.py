@@ -5,29 +5,165 @@
 @Date    : 2025/8/18 13:59
 @Description : 练习逻辑实现
 """
+import os
+import threading
+from datetime import datetime
+
 from src.database import QuestionDB
+from src.lookahead import QuestionLookahead
+from src.replica import ReplicaSync
+from src.review_journal import ReviewJournal
+from src.storage import SQLiteBackend, create_backend
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+DEFAULT_JOURNAL_PATH = os.path.join(DATA_DIR, "review_journal.log")
+DEFAULT_SNAPSHOT_PATH = os.path.join(DATA_DIR, "questions.snap")
 
 
 class InterviewTrainer:
-    def __init__(self):
-        self.db = QuestionDB()
+    def __init__(self, write_behind=False, journal_path=DEFAULT_JOURNAL_PATH, replica_path=None,
+                 snapshot_path=None, prefetch_depth=0, db=None, track_session=True):
+        """
+        :param write_behind: 为 True 时答题记录先写入本地日志立即返回，后台批量写入数据库
+        :param replica_path: 离线副本（SQLite 文件）路径；指定时所有读取走本地副本，
+                             答题记录经写后日志先写副本再推送到服务器（强制启用 write_behind）
+        :param snapshot_path: 题库快照路径；快照有效时直接 mmap 打开，否则在后台重新生成供下次启动使用
+        :param prefetch_depth: 练习时在后台预取的题数，为 0 时每次取题直接访问复习队列
+        :param db: 使用已创建的 QuestionDB（如基准测试的临时库），与 replica_path 不能同时指定
+        :param track_session: 是否在 session_records 中记录本次提交的答题记录（常驻的 HTTP 服务不记录）
+        """
         self.session_records = []
+        self.track_session = track_session
+        self.prefetch_depth = prefetch_depth
+        self._lookaheads = {}  # user_id -> QuestionLookahead
+        self._lookaheads_lock = threading.Lock()
+        self.journal = None
+        self.replica = None
+        if replica_path:
+            self.db = QuestionDB(backend=SQLiteBackend(replica_path))
+            self.replica = ReplicaSync(self.db, create_backend())
+            if not self.replica.has_synced():
+                # 首次使用需要先拉一份完整题库，之后的同步都在后台进行
+                try:
+                    self.replica.sync()
+                except Exception as e:
+                    print(f"离线副本首次同步失败：{str(e)}")
+            self.replica.start()
+            write_behind = True
+        else:
+            self.db = db or QuestionDB()
+        if write_behind:
+            self.journal = ReviewJournal(journal_path, self._flush_journal, is_transient=self._is_transient_error)
+            self.journal.start()
+        if snapshot_path and not self.db.open_snapshot(snapshot_path):
+            threading.Thread(target=self._refresh_snapshot, args=(snapshot_path,), name="question-snapshot",
+                             daemon=True).start()
+
+    def _refresh_snapshot(self, path):
+        """重新生成题库快照并启用（生成期间题库又被改动时指纹不符，不会启用）"""
+        try:
+            count = self.db.write_snapshot(path)
+            if self.db.open_snapshot(path):
+                print(f"题库快照已生成，共 {count} 道题")
+        except Exception as e:
+            print(f"生成题库快照失败：{str(e)}")
 
     def initialize_database(self):
         """初始化数据库"""
         self.db.initialize_database()
 
-    def get_next_question(self):
-        """获取下一个练习题目"""
-        return self.db.get_question_fro_review()
+    def verify_user(self, username, password):
+        """校验登录，成功后开始同步该用户的复习进度"""
+        user = self.db.verify_user(username, password)
+        if user and self.replica:
+            self.replica.track_user(user['id'])
+        return user
+
+    def create_user(self, username, password):
+        """注册用户；使用离线副本时在服务器上注册后同步到本地"""
+        if not self.replica:
+            return self.db.create_user(username, password)
+        user_id = self.replica.remote().create_user(username, password)
+        if user_id:
+            self.replica.sync()
+        return user_id
+
+    def get_next_question(self, user_id=None):
+        """获取下一个练习题目，指定user_id时按该用户的复习进度选题"""
+        if user_id and self.replica:
+            self.replica.track_user(user_id)
+        if self.prefetch_depth:
+            return self._lookahead(user_id).next()
+        return self.db.get_question_fro_review(user_id=user_id)
+
+    def take_prefetched_question(self, user_id=None):
+        """
+        取出已预取的下一题，不访问数据库，可在界面线程调用；没有可用的预取题目时返回 None，
+        此时应在后台调用 get_next_question()
+        """
+        if not self.prefetch_depth:
+            return None
+        lookahead = self._lookahead(user_id)
+        row = lookahead.take()
+        lookahead.fill_async()
+        return row
+
+    def prefetch_questions(self, user_id=None):
+        """在后台把该用户的预取缓冲补满（如登录后、作答期间）"""
+        if self.prefetch_depth:
+            self._lookahead(user_id).fill_async()
+
+    def _lookahead(self, user_id):
+        with self._lookaheads_lock:
+            lookahead = self._lookaheads.get(user_id)
+            if lookahead is None:
+                lookahead = QuestionLookahead(lambda: self.db.get_question_fro_review(user_id=user_id),
+                                              depth=self.prefetch_depth,
+                                              generation=lambda: self.db.due_generation)
+                self._lookaheads[user_id] = lookahead
+            return lookahead
 
     def submit_answer(self, question_id, user_answer, rating, user_id=None, duration_seconds=None):
-        """提交答案并更新复习状态"""
-        record_id = self.db.save_review_record(question_id, user_answer, rating, user_id=user_id,duration_seconds=duration_seconds)
+        """提交答案并更新复习状态；启用写后日志时返回日志条目的幂等键"""
+        if self.journal:
+            record_id = self.journal.append(question_id, user_answer, rating, user_id=user_id,
+                                            duration_seconds=duration_seconds)
+        else:
+            record_id = self.db.save_review_record(question_id, user_answer, rating, user_id=user_id,duration_seconds=duration_seconds)
         if record_id:
-            self.session_records.append(record_id)
+            if self.track_session:
+                self.session_records.append(record_id)
+            if self.prefetch_depth:
+                self._lookahead(user_id).discard(question_id)
         return record_id
 
+    def submit_answers(self, answers):
+        """
+        批量提交答案，整批在一个事务中提交
+        :param answers: [(question_id, user_answer, rating, user_id, duration_seconds), ...]
+        """
+        record_ids = self.db.save_review_records(answers)
+        if self.track_session:
+            self.session_records.extend(record_ids)
+        return record_ids
+
+    def _flush_journal(self, entries):
+        """
+        把写后日志中的条目批量写入数据库
+        使用离线副本时先写副本（本地立即可见），再推送到服务器；两边都按幂等键去重，重试不会重复
+        """
+        reviews = [
+            (e['question_id'], e['user_answer'], e['rating'], e['user_id'], e['duration_seconds'],
+             datetime.fromisoformat(e['reviewed_at']), e['key'])
+            for e in entries
+        ]
+        self.db.save_review_records(reviews)
+        if self.replica:
+            self.replica.push(reviews)
+
+    def _is_transient_error(self, exc):
+        return self.db.is_transient_error(exc) or bool(self.replica and self.replica.is_transient_error(exc))
+
     def get_session_summary(self):
         """获取本次训练摘要"""
         return {
@@ -39,8 +175,28 @@ class InterviewTrainer:
         return self.db.get_review_status(user_id=user_id)
 
     def add_question(self, question, answer='', category='', difficulty='中等'):
-        """添加新题目"""
-        return self.db.add_question(question, answer, category, difficulty)
+        """添加新题目（使用离线副本时写入服务器后同步到本地）"""
+        if not self.replica:
+            return self.db.add_question(question, answer, category, difficulty)
+        question_id = self.replica.remote().add_question(question, answer, category, difficulty)
+        self.replica.sync()
+        return question_id
+
+    def add_questions_bulk(self, rows):
+        """批量添加题目，rows 为 (question, answer, category, difficulty) 列表"""
+        if not self.replica:
+            return self.db.add_questions_bulk(rows)
+        result = self.replica.remote().add_questions_bulk(rows)
+        self.replica.sync()
+        return result
+
+    def question_hashes(self):
+        """已有题目的去重哈希集合"""
+        return self.db.get_question_hashes()
+
+    def search_questions(self, query, filters=None, limit=50, offset=0):
+        """题库全文检索"""
+        return self.db.search_questions(query, filters=filters, limit=limit, offset=offset)
 
     def question_exists(self, question):
         """检查题目是否已存在"""
@@ -48,4 +204,8 @@ class InterviewTrainer:
 
     def close(self):
         """关闭资源"""
+        if self.journal:
+            self.journal.close()
+        if self.replica:
+            self.replica.close()
         self.db.close()
@@ -0,0 +1,331 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : web_api.py
+@Author  : admin1
+@Date    : 2026/10/17 23:50
+@Description : 训练器 HTTP API（Flask）：登录、取题、提交、统计、检索、题库分页、导入、导出与备份
+用法：python -m src.web_api [--host 0.0.0.0] [--port 5000]      # 开发/单进程多线程
+      gunicorn -w 4 -k gthread --threads 64 "src.web_api:create_app()"   # 多进程部署
+"""
+import argparse
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from functools import wraps
+
+from flask import Flask, Response, g, jsonify, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+
+from src.trainer import InterviewTrainer
+
+TOKEN_MAX_AGE = 7 * 24 * 3600  # 登录令牌有效期（秒）
+TOKEN_SALT = "interview-trainer-api"
+DEFAULT_POOL_SIZE = 10  # 每个工作进程的连接池大小
+MAX_PAGE_SIZE = 200
+MAX_FAILED_DETAILS = 100  # 导入结果中最多返回的失败行明细
+STREAM_CHUNK_BYTES = 1 << 20
+
+
+class ApiError(Exception):
+    """请求错误，以 {"error": message} 和对应状态码返回"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class _JSONProvider(DefaultJSONProvider):
+    """日期时间输出 ISO 格式，Decimal（MySQL 聚合结果）输出数字"""
+    ensure_ascii = False
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, (datetime, date)):
+            return o.isoformat()
+        if isinstance(o, Decimal):
+            return float(o)
+        return DefaultJSONProvider.default(o)
+
+
+def _int_arg(name, default=None, minimum=None, maximum=None):
+    value = request.args.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ApiError(f"参数 {name} 应为整数")
+    if minimum is not None:
+        value = max(minimum, value)
+    if maximum is not None:
+        value = min(maximum, value)
+    return value
+
+
+def _filters():
+    return {key: request.args.get(key) for key in ("category", "difficulty") if request.args.get(key)}
+
+
+def _cacheable(payload):
+    """
+    可缓存的 GET 响应：按响应体生成 ETag，请求带 If-None-Match 且未变化时返回 304（省去传输和客户端解析）
+    内容与用户相关，只允许客户端私有缓存，每次使用前重新验证
+    """
+    response = jsonify(payload)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+def _tar_stream(directory, prefix, chunk_bytes=STREAM_CHUNK_BYTES):
+    """把目录中的文件逐块生成为 tar 流（不在内存或磁盘上生成完整的 tar 文件）"""
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        info = tarfile.TarInfo(f"{prefix}/{name}")
+        info.size = os.path.getsize(path)
+        info.mtime = int(os.path.getmtime(path))
+        yield info.tobuf(format=tarfile.PAX_FORMAT)
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_bytes)
+                if not chunk:
+                    break
+                yield chunk
+        if info.size % tarfile.BLOCKSIZE:
+            yield b"\0" * (tarfile.BLOCKSIZE - info.size % tarfile.BLOCKSIZE)
+    yield b"\0" * (2 * tarfile.BLOCKSIZE)
+
+
+def create_app(trainer=None, secret_key=None, admins=None, pool_size=DEFAULT_POOL_SIZE):
+    """
+    创建 API 应用
+    - 无会话状态：登录返回签名令牌（Authorization: Bearer <token>），任一工作进程都能校验，
+      多进程部署时各进程必须使用相同的 secret_key（环境变量 TRAINER_API_SECRET）
+    - 每个工作进程一个 InterviewTrainer，首个请求时创建（fork 之后），请求线程共用它的连接池
+    :param trainer: 使用已创建的 InterviewTrainer（测试时传入临时库）
+    :param admins: 可以导入题目、导出题库和备份的用户名，默认取环境变量 TRAINER_API_ADMINS（逗号分隔）
+    :param pool_size: 自建 InterviewTrainer 时每个进程的连接数
+    """
+    app = Flask(__name__)
+    app.json = _JSONProvider(app)
+    secret_key = secret_key or os.environ.get("TRAINER_API_SECRET")
+    if not secret_key:
+        secret_key = os.urandom(32).hex()
+        print("未设置 TRAINER_API_SECRET，使用随机密钥：令牌在重启后失效，且不能在多个进程间通用")
+    app.config["SECRET_KEY"] = secret_key
+    if admins is None:
+        admins = [name.strip() for name in os.environ.get("TRAINER_API_ADMINS", "").split(",") if name.strip()]
+    admins = set(admins)
+    serializer = URLSafeTimedSerializer(secret_key, salt=TOKEN_SALT)
+    state = {'trainer': trainer}
+    state_lock = threading.Lock()
+
+    def get_trainer():
+        if state['trainer'] is None:
+            with state_lock:
+                if state['trainer'] is None:
+                    from src.database import QuestionDB
+                    state['trainer'] = InterviewTrainer(db=QuestionDB(max_connections=pool_size),
+                                                        track_session=False)
+        return state['trainer']
+
+    app.extensions["interview_trainer"] = get_trainer
+
+    def login_required(admin=False):
+        def decorate(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+                if scheme.lower() != "bearer" or not token:
+                    raise ApiError("未登录", 401)
+                try:
+                    g.user = serializer.loads(token, max_age=TOKEN_MAX_AGE)
+                except SignatureExpired:
+                    raise ApiError("登录已过期", 401)
+                except BadSignature:
+                    raise ApiError("令牌无效", 401)
+                if admin and g.user['username'] not in admins:
+                    raise ApiError("需要管理员权限", 403)
+                return view(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    @app.errorhandler(ApiError)
+    def handle_api_error(e):
+        return jsonify(error=e.message), e.status
+
+    @app.errorhandler(Exception)
+    def handle_unexpected(e):
+        from werkzeug.exceptions import HTTPException
+        if isinstance(e, HTTPException):
+            return jsonify(error=e.description), e.code
+        trainer = state['trainer']
+        if trainer is not None and trainer.db.is_transient_error(e):
+            return jsonify(error="数据库暂时不可用，请稍后重试"), 503
+        print(f"处理请求失败：{str(e)}")
+        return jsonify(error="服务器内部错误"), 500
+
+    # --------------------
+    # 登录
+    # --------------------
+    @app.post("/api/login")
+    def login():
+        body = request.get_json(silent=True) or {}
+        username, password = body.get("username"), body.get("password")
+        if not username or not password:
+            raise ApiError("缺少用户名或密码")
+        user = get_trainer().verify_user(username, password)
+        if not user:
+            raise ApiError("用户名或密码错误", 401)
+        token = serializer.dumps({'id': user['id'], 'username': user['username']})
+        return jsonify(token=token, user=user, expires_in=TOKEN_MAX_AGE)
+
+    # --------------------
+    # 练习
+    # --------------------
+    @app.get("/api/next-question")
+    @login_required()
+    def next_question():
+        response = jsonify(question=get_trainer().get_next_question(g.user['id']))
+        response.cache_control.no_store = True
+        return response
+
+    @app.post("/api/answers")
+    @login_required()
+    def submit_answer():
+        body = request.get_json(silent=True) or {}
+        try:
+            question_id = int(body["question_id"])
+            rating = int(body["rating"])
+            duration = body.get("duration_seconds")
+            duration = int(duration) if duration is not None else None
+        except (KeyError, TypeError, ValueError):
+            raise ApiError("需要整数 question_id、rating（1-5），duration_seconds 可选")
+        if not 1 <= rating <= 5:
+            raise ApiError("rating 应在 1-5 之间")
+        record_id = get_trainer().submit_answer(question_id, body.get("user_answer") or "", rating,
+                                                user_id=g.user['id'], duration_seconds=duration)
+        if not record_id:
+            raise ApiError("保存答题记录失败", 503)
+        return jsonify(record_id=record_id), 201
+
+    @app.get("/api/stats")
+    @login_required()
+    def stats():
+        return _cacheable(get_trainer().get_overall_stats(user_id=g.user['id']))
+
+    # --------------------
+    # 题库
+    # --------------------
+    @app.get("/api/questions")
+    @login_required()
+    def page_questions():
+        limit = _int_arg("limit", 50, 1, MAX_PAGE_SIZE)
+        rows = get_trainer().db.page_questions(after_id=_int_arg("after_id"), filters=_filters(), limit=limit)
+        next_after_id = rows[-1]['id'] if len(rows) == limit else None
+        return _cacheable({'items': rows, 'next_after_id': next_after_id})
+
+    @app.get("/api/questions/<int:question_id>")
+    @login_required()
+    def get_question(question_id):
+        row = get_trainer().db.get_question(question_id)
+        if row is None:
+            raise ApiError("题目不存在", 404)
+        return _cacheable(row)
+
+    @app.get("/api/search")
+    @login_required()
+    def search():
+        rows = get_trainer().search_questions(request.args.get("q", ""), filters=_filters(),
+                                              limit=_int_arg("limit", 50, 1, MAX_PAGE_SIZE),
+                                              offset=_int_arg("offset", 0, 0))
+        return _cacheable({'items': rows})
+
+    @app.post("/api/import")
+    @login_required(admin=True)
+    def import_questions():
+        from data.import_questions import ImportJob
+
+        upload = request.files.get("file")
+        if upload is None:
+            raise ApiError("请以 multipart 字段 file 上传 CSV 文件")
+        work_dir = tempfile.mkdtemp(prefix="api_import_")
+        try:
+            path = os.path.join(work_dir, "upload.csv")
+            upload.save(path)
+            result = ImportJob(path, trainer=get_trainer()).run()
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return jsonify(
+            imported=result['imported'],
+            skipped=result['skipped'],
+            failed=result['failed'],
+            failed_details=result['failed_details'][:MAX_FAILED_DETAILS],
+        )
+
+    @app.get("/api/export/questions")
+    @login_required(admin=True)
+    def export_questions():
+        """完整题库导出为 NDJSON（每行一道题），逐批读取、边读边发"""
+        db = get_trainer().db
+
+        def generate():
+            for row in db.iter_questions():
+                yield app.json.dumps(row) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson",
+                        headers={"Content-Disposition": "attachment; filename=questions.ndjson"})
+
+    @app.get("/api/backup")
+    @login_required(admin=True)
+    def backup():
+        """
+        全库备份（与 python -m data.backup_db backup 相同的格式），以 tar 流下载
+        备份先流式写入临时目录，再逐块发送，发送完或客户端断开后删除临时目录
+        """
+        from src.backup import backup_database
+
+        work_dir = tempfile.mkdtemp(prefix="api_backup_")
+        name = f"backup_{datetime.now():%Y%m%d_%H%M%S}"
+        try:
+            manifest = backup_database(get_trainer().db, os.path.join(work_dir, name))
+        except Exception:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+
+        def generate():
+            try:
+                yield from _tar_stream(os.path.join(work_dir, name), name)
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+        return Response(generate(), mimetype="application/x-tar",
+                        headers={"Content-Disposition": f"attachment; filename={name}.tar",
+                                 "X-Backup-Rows": str(sum(t['rows'] for t in manifest['tables']))})
+
+    @app.get("/api/health")
+    def health():
+        trainer = state['trainer']
+        return jsonify(status="ok", pool=trainer.db.pool_metrics() if trainer else {})
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="面试训练器 HTTP API（开发服务器）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE, help="连接池大小")
+    args = parser.parse_args(argv)
+    create_app(pool_size=args.pool_size).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : conftest.py
+@Author  : admin1
+@Date    : 2026/10/18 01:10
+@Description : 测试公共配置（把项目根目录加入导入路径，直接运行 pytest 时也能导入 src/data）
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
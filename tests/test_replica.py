@@ -0,0 +1,52 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : test_replica.py
+@Author  : admin1
+@Date    : 2026/10/18 02:10
+@Description : 离线副本同步测试（服务器与本地副本都用临时 SQLite 库）
+"""
+import os
+
+import pytest
+
+from src.database import QuestionDB
+from src.replica import ReplicaSync
+from src.storage import SQLiteBackend
+
+
+@pytest.fixture
+def server(tmp_path):
+    db = QuestionDB(backend=SQLiteBackend(os.path.join(tmp_path, "server.db")))
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def replica(tmp_path, server):
+    local = QuestionDB(backend=SQLiteBackend(os.path.join(tmp_path, "replica.db")))
+    sync = ReplicaSync(local, SQLiteBackend(server.backend.path), overlap=0)
+    yield sync
+    sync.close()
+    local.close()
+
+
+def test_tombstone_rebuilds_replica_rollup(server, replica):
+    server.add_questions_bulk([(f"题目{i}", f"答案{i}", "MySQL", "中等") for i in range(5)])
+    user_id = server.create_user("learner", "pw")
+    question_ids = [row['id'] for row in server.page_questions(limit=5)]
+    server.save_review_records([
+        (question_id, "", rating, user_id, 10 * rating)
+        for question_id, rating in zip(question_ids * 2, (1, 2, 3, 4, 5, 5, 4, 3, 2, 1))
+    ])
+    replica.track_user(user_id)
+    replica.sync()
+    local = replica.local
+    assert local.get_review_status(user_id)['total_reviews'] == 10
+
+    assert server.delete_question(question_ids[0])
+    replica.sync()
+    assert local.get_question(question_ids[0]) is None
+    status = local.get_review_status(user_id)
+    assert status['total_reviews'] == 8
+    assert status == local.get_review_status(user_id, use_rollup=False)
+    assert local.get_review_status() == local.get_review_status(use_rollup=False)
@@ -0,0 +1,142 @@
+"""
+# -*- coding: utf-8 -*-
+@File    : test_web_api.py
+@Author  : admin1
+@Date    : 2026/10/18 01:10
+@Description : HTTP API 测试（Flask 测试客户端 + 临时 SQLite 库）
+"""
+import io
+import json
+import os
+import tarfile
+
+import pytest
+
+from src.database import QuestionDB
+from src.storage import SQLiteBackend
+from src.trainer import InterviewTrainer
+from src.web_api import create_app
+
+
+@pytest.fixture
+def trainer(tmp_path):
+    db = QuestionDB(backend=SQLiteBackend(os.path.join(tmp_path, "api.db")))
+    db.add_questions_bulk([(f"题目{i} 事务与锁", f"答案{i}", "MySQL", "中等") for i in range(30)])
+    db.create_user("admin", "pw")
+    db.create_user("learner", "pw")
+    trainer = InterviewTrainer(db=db, track_session=False)
+    yield trainer
+    trainer.close()
+
+
+@pytest.fixture
+def client(trainer):
+    return create_app(trainer=trainer, secret_key="test-secret", admins=["admin"]).test_client()
+
+
+def login(client, username, password="pw"):
+    response = client.post("/api/login", json={"username": username, "password": password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json['token']}"}
+
+
+def test_rejects_missing_bad_and_non_admin_tokens(client):
+    assert client.get("/api/stats").status_code == 401
+    assert client.get("/api/stats", headers={"Authorization": "Bearer forged"}).status_code == 401
+    assert client.post("/api/login", json={"username": "learner", "password": "wrong"}).status_code == 401
+    learner = login(client, "learner")
+    assert client.get("/api/backup", headers=learner).status_code == 403
+    assert client.get("/api/export/questions", headers=learner).status_code == 403
+
+
+def test_login_next_question_and_submit(client):
+    headers = login(client, "learner")
+    response = client.get("/api/next-question", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "no-store"
+    question = response.json["question"]
+    assert question["id"]
+
+    invalid = client.post("/api/answers", headers=headers, json={"question_id": question["id"], "rating": 9})
+    assert invalid.status_code == 400
+    missing = client.post("/api/answers", headers=headers, json={"rating": 3})
+    assert missing.status_code == 400
+
+    saved = client.post("/api/answers", headers=headers,
+                        json={"question_id": question["id"], "rating": 4, "duration_seconds": 12})
+    assert saved.status_code == 201
+    assert saved.json["record_id"]
+    stats = client.get("/api/stats", headers=headers).json
+    assert stats["total_reviews"] == 1
+
+
+def test_stats_etag_round_trip(client):
+    headers = login(client, "learner")
+    first = client.get("/api/stats", headers=headers)
+    etag = first.headers["ETag"]
+    assert "no-cache" in first.headers["Cache-Control"]
+    assert client.get("/api/stats", headers=dict(headers, **{"If-None-Match": etag})).status_code == 304
+
+    question = client.get("/api/next-question", headers=headers).json["question"]
+    client.post("/api/answers", headers=headers, json={"question_id": question["id"], "rating": 3})
+    changed = client.get("/api/stats", headers=dict(headers, **{"If-None-Match": etag}))
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_question_pages_etag_and_cursor(client):
+    headers = login(client, "learner")
+    page = client.get("/api/questions?limit=10", headers=headers)
+    assert len(page.json["items"]) == 10
+    after_id = page.json["next_after_id"]
+    assert after_id == page.json["items"][-1]["id"]
+    assert client.get("/api/questions?limit=10",
+                      headers=dict(headers, **{"If-None-Match": page.headers["ETag"]})).status_code == 304
+
+    second = client.get(f"/api/questions?limit=10&after_id={after_id}", headers=headers).json["items"]
+    assert all(row["id"] < after_id for row in second)
+
+    detail = client.get(f"/api/questions/{after_id}", headers=headers)
+    assert detail.json["answer"]
+    assert client.get(f"/api/questions/{after_id}",
+                      headers=dict(headers, **{"If-None-Match": detail.headers["ETag"]})).status_code == 304
+    assert client.get("/api/questions/999999", headers=headers).status_code == 404
+
+
+def test_import_csv(client):
+    headers = login(client, "admin")
+    csv_bytes = ("question,answer,category,difficulty\n"
+                 "新题目,新答案,Go,简单\n"
+                 "题目1 事务与锁,重复,MySQL,中等\n"
+                 ",,,\n").encode("utf-8")
+    response = client.post("/api/import", headers=headers, data={"file": (io.BytesIO(csv_bytes), "q.csv")})
+    assert response.status_code == 200
+    assert (response.json["imported"], response.json["skipped"], response.json["failed"]) == (1, 1, 1)
+    assert client.post("/api/import", headers=headers).status_code == 400
+
+
+def test_export_questions_ndjson(client):
+    headers = login(client, "admin")
+    response = client.get("/api/export/questions", headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(rows) == 30
+    assert [row["id"] for row in rows] == sorted(row["id"] for row in rows)
+    assert rows[0]["answer"] == "答案0"
+
+
+def test_backup_tar_extracts(client, tmp_path):
+    headers = login(client, "admin")
+    response = client.get("/api/backup", headers=headers)
+    assert response.status_code == 200
+    with tarfile.open(fileobj=io.BytesIO(response.data)) as archive:
+        names = archive.getnames()
+        archive.extractall(tmp_path / "restore")
+    prefix = names[0].split("/")[0]
+    assert f"{prefix}/manifest.json" in names
+    manifest = json.loads((tmp_path / "restore" / prefix / "manifest.json").read_text(encoding="utf-8"))
+    tables = {table["name"]: table["rows"] for table in manifest["tables"]}
+    assert tables["questions"] == 30
+    assert tables["users"] == 2
+    assert int(response.headers["X-Backup-Rows"]) == sum(tables.values())